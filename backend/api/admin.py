@@ -0,0 +1,40 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+
+from backend.api.user import get_current_user
+from backend.config import get_settings
+from backend.models.pydantic import User
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+settings = get_settings()
+
+
+async def get_admin_user(current_user: User = Depends(get_current_user)) -> User:
+    if current_user.username not in settings.ADMIN_USERNAMES:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
+
+
+@router.post("/sync")
+async def trigger_sync(
+    request: Request,
+    dry_run: bool = Query(False, description="Report the changes without writing"),
+    incremental: bool = Query(
+        False, description="Only re-evaluate tools in Toolhub's recent changes"
+    ),
+    admin: User = Depends(get_admin_user),
+):
+    """
+    Run a database update now and stream its progress as NDJSON. The sync
+    keeps running if the client disconnects.
+    """
+    scheduler = request.app.state.sync_scheduler
+    if scheduler is None:
+        raise HTTPException(status_code=503, detail="Sync scheduler is not running")
+    try:
+        run = scheduler.trigger(
+            dry_run=dry_run, trigger="admin", incremental=incremental
+        )
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return StreamingResponse(scheduler.progress(run), media_type="application/x-ndjson")
@@ -1,23 +1,161 @@
+import asyncio
+import json
+import os
 import re
-from functools import lru_cache
+import time
+from pathlib import Path
 
 import httpx
 import yaml
 from fastapi import APIRouter
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 
 from backend.config import get_settings
+from backend.utils import ToolhubClient, get_logger
+from backend.validation import Validator, compile_field_validators
 
 router = APIRouter(prefix="/schema", tags=["schema"])
 
 settings = get_settings()
+logger = get_logger(__name__)
+
+# Retry delay after a failed refresh, so an unreachable Toolhub isn't hit
+# on every request while the stale copy is served.
+REFRESH_RETRY_SECONDS = 60
+
+
+class SchemaCache:
+    """
+    Holds the cleaned Toolhub schema together with its serialized JSON body.
+
+    The schema is fetched off the request path and refreshed once it is older
+    than the TTL; until the refresh finishes, the previous copy is served. The
+    last good copy is written to disk so a restart doesn't need Toolhub.
+    """
+
+    def __init__(self, client: ToolhubClient, ttl: float, path: Path):
+        self.client = client
+        self.ttl = ttl
+        self.path = path
+        self.schema: dict | None = None
+        self.body: bytes | None = None
+        self.validators: dict[str, Validator] | None = None
+        self.fetched_at = 0.0
+        self._retry_at = 0.0
+        self._refresh_task: asyncio.Task | None = None
+
+    def _set(
+        self,
+        schema: dict,
+        body: bytes,
+        fetched_at: float,
+        validators: dict[str, Validator] | None = None,
+    ) -> None:
+        self.schema = schema
+        self.body = body
+        self.fetched_at = fetched_at
+        self.validators = validators or compile_field_validators(schema)
+
+    def load_from_disk(self) -> bool:
+        """Load the persisted copy, treating it as fetched at its mtime."""
+        try:
+            body = self.path.read_bytes()
+            schema = json.loads(body)
+        except FileNotFoundError:
+            return False
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Ignoring unreadable schema cache {self.path}: {e}")
+            return False
+        age = max(0.0, time.time() - self.path.stat().st_mtime)
+        self._set(schema, body, time.monotonic() - age)
+        logger.info(f"Loaded Toolhub schema from {self.path} ({age:.0f}s old)")
+        return True
+
+    def _persist(self, body: bytes) -> None:
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp_path.write_bytes(body)
+        os.replace(tmp_path, self.path)
+
+    async def refresh(self) -> None:
+        """Fetch, clean and store the schema. Errors propagate to the caller."""
+        yaml_text = await self.client.get_schema()
+        schema, validators = await asyncio.to_thread(parse_and_compile, yaml_text)
+        body = json.dumps(schema, ensure_ascii=False, separators=(",", ":")).encode()
+        self._set(schema, body, time.monotonic(), validators)
+        try:
+            await asyncio.to_thread(self._persist, body)
+        except OSError as e:
+            logger.warning(f"Could not persist schema cache to {self.path}: {e}")
+        logger.info("Toolhub schema refreshed")
+
+    async def _run_refresh(self) -> None:
+        try:
+            await self.refresh()
+        except Exception:
+            self._retry_at = time.monotonic() + REFRESH_RETRY_SECONDS
+            raise
+        finally:
+            self._refresh_task = None
+
+    def refresh_in_background(self) -> asyncio.Task:
+        """Start a refresh unless one is already running, and return it."""
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._run_refresh())
+            self._refresh_task.add_done_callback(self._log_failure)
+        return self._refresh_task
+
+    def _log_failure(self, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Toolhub schema refresh failed: {task.exception()!r}")
+
+    def _refresh_if_stale(self) -> None:
+        now = time.monotonic()
+        if now - self.fetched_at > self.ttl and now >= self._retry_at:
+            self.refresh_in_background()
+
+    async def ensure_loaded(self) -> None:
+        if self.body is None:
+            await asyncio.shield(self.refresh_in_background())
+        else:
+            self._refresh_if_stale()
+
+    async def get_body(self) -> bytes:
+        await self.ensure_loaded()
+        return self.body
+
+    async def get_schema(self) -> dict:
+        await self.ensure_loaded()
+        return self.schema
+
+    def get_validators_nowait(self) -> dict[str, Validator] | None:
+        """
+        Return the compiled field validators without waiting on Toolhub.
+        Returns None, and starts a refresh, if no schema is loaded yet.
+        """
+        if self.validators is None:
+            if time.monotonic() >= self._retry_at:
+                self.refresh_in_background()
+        else:
+            self._refresh_if_stale()
+        return self.validators
+
+    async def close(self) -> None:
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+
+
+schema_cache = SchemaCache(
+    ToolhubClient(settings.TOOLHUB_API_BASE_URL),
+    ttl=settings.SCHEMA_CACHE_TTL_SECONDS,
+    path=Path(settings.SCHEMA_CACHE_PATH),
+)
 
 
 @router.get("")
 async def get_toolhub_schema():
     try:
-        schemas = fetch_and_parse_schema()
-        return JSONResponse(content=schemas)
+        body = await schema_cache.get_body()
+        return Response(content=body, media_type="application/json")
     except httpx.HTTPStatusError as e:
         return JSONResponse(
             content={"error": f"HTTP error: {e.response.status_code}"},
@@ -34,54 +172,66 @@ async def get_toolhub_schema():
         )
 
 
-@lru_cache(maxsize=1)
-def fetch_and_parse_schema():
-    url = f"{settings.TOOLHUB_API_BASE_URL}/schema/"
-    with httpx.Client() as client:
-        response = client.get(url)
-        response.raise_for_status()
-        yaml_content = yaml.safe_load(response.text)
-        full_schema = yaml_content.get("components", {}).get("schemas", {})
-        return clean_schema(full_schema)
+def parse_schema(yaml_text: str) -> dict:
+    yaml_content = yaml.safe_load(yaml_text)
+    full_schema = yaml_content.get("components", {}).get("schemas", {})
+    return clean_schema(full_schema)
+
+
+def parse_and_compile(yaml_text: str) -> tuple[dict, dict[str, Validator]]:
+    schema = parse_schema(yaml_text)
+    return schema, compile_field_validators(schema)
 
 
 def clean_schema(full_schema):
-    def get_referenced_schemas(schema, all_schemas):
+    def direct_references(schema):
+        references = set()
+        stack = [schema]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, dict):
+                for key, value in node.items():
+                    if key == "$ref" and isinstance(value, str):
+                        references.add(value.split("/")[-1])
+                    elif isinstance(value, (dict, list)):
+                        stack.append(value)
+            elif isinstance(node, list):
+                stack.extend(node)
+        return references
+
+    def get_referenced_schemas(root, all_schemas):
+        # Each named schema is scanned once; the visited set also makes
+        # cyclic references terminate.
         referenced = set()
-        if isinstance(schema, dict):
-            for key, value in schema.items():
-                if key == "$ref" and isinstance(value, str):
-                    ref = value.split("/")[-1]
-                    referenced.add(ref)
-                    referenced.update(
-                        get_referenced_schemas(all_schemas.get(ref, {}), all_schemas)
-                    )
-                elif isinstance(value, (dict, list)):
-                    referenced.update(get_referenced_schemas(value, all_schemas))
-        elif isinstance(schema, list):
-            for item in schema:
-                referenced.update(get_referenced_schemas(item, all_schemas))
+        pending = list(direct_references(root))
+        while pending:
+            name = pending.pop()
+            if name in referenced:
+                continue
+            referenced.add(name)
+            pending.extend(direct_references(all_schemas.get(name, {})))
         return referenced
 
     def adjust_references(schema):
         if isinstance(schema, dict):
-            for key, value in schema.items():
-                if key == "$ref" and isinstance(value, str):
-                    schema[key] = re.sub(r"^#/components/schemas/", "#/schemas/", value)
-                elif isinstance(value, (dict, list)):
-                    adjust_references(value)
-        elif isinstance(schema, list):
-            for item in schema:
-                adjust_references(item)
+            return {
+                key: (
+                    re.sub(r"^#/components/schemas/", "#/schemas/", value)
+                    if key == "$ref" and isinstance(value, str)
+                    else adjust_references(value)
+                )
+                for key, value in schema.items()
+            }
+        if isinstance(schema, list):
+            return [adjust_references(item) for item in schema]
+        return schema
 
     cleaned = {"schemas": {}}
     annotations = full_schema.get("Annotations", {})
     cleaned["schemas"]["Annotations"] = annotations
 
     referenced = get_referenced_schemas(annotations, full_schema)
-    for schema in referenced:
+    for schema in sorted(referenced):
         cleaned["schemas"][schema] = full_schema.get(schema, {})
 
-    adjust_references(cleaned)
-
-    return cleaned
+    return adjust_references(cleaned)
@@ -1,27 +1,56 @@
 import random
-from datetime import datetime, timedelta
-from typing import Optional
+from datetime import UTC, datetime, timedelta
+from typing import Any, Awaitable, Callable, Optional
 
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Response,
+)
 from tortoise.contrib.fastapi import HTTPNotFoundError
 from tortoise.expressions import F, Q
 from tortoise.transactions import atomic
 
+from backend.api.schema import schema_cache
 from backend.api.user import get_current_user, get_user_token
 from backend.config import get_settings
+from backend.exceptions import IdempotencyKeyError, InvalidSubmissionError
+from backend.idempotency import IdempotencyStore, request_fingerprint
 from backend.models.pydantic import (
+    TaskBatchItemResult,
+    TaskBatchResponse,
+    TaskBatchSubmission,
     TaskSchema,
     TaskSubmission,
     ToolhubSubmission,
     ToolSchema,
 )
-from backend.models.tortoise import CompletedTask, Task, Tool, User
-from backend.utils import ToolhubClient, get_logger, prepare_toolhub_submission
+from backend.models.tortoise import CompletedTask, Task, Tool, ToolhubOutbox, User
+from backend.outbox import OutboxWorker, enqueue_submission, enqueue_submissions
+from backend.sync import ToolResyncer
+from backend.utils import (
+    ToolhubClient,
+    get_logger,
+    merge_toolhub_submissions,
+    prepare_toolhub_submission,
+)
+from backend.validation import SchemaValidationError
 
 router = APIRouter(prefix="/tasks", tags=["tasks"])
 settings = get_settings()
 logger = get_logger(__name__)
 toolhub_client = ToolhubClient(settings.TOOLHUB_API_BASE_URL)
+idempotency_store = IdempotencyStore(
+    max_entries=settings.IDEMPOTENCY_MAX_KEYS, ttl=settings.IDEMPOTENCY_TTL_SECONDS
+)
+
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+# Fields whose submissions also update the tool row directly
+REPORT_FIELDS = ("deprecated", "experimental")
 
 
 @router.get(
@@ -44,17 +73,180 @@ async def get_tasks(
     return tasks
 
 
+@router.post("/batch", response_model=TaskBatchResponse)
+async def submit_tasks_batch(
+    batch: TaskBatchSubmission,
+    background_tasks: BackgroundTasks,
+    response: Response,
+    current_user: User = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
+    """
+    Record several task submissions in one transaction. Items that fail
+    validation or repeat an existing contribution are reported per item and
+    don't affect the others.
+    """
+    return await run_idempotent(
+        idempotency_key,
+        current_user,
+        request_fingerprint("batch", batch.model_dump_json()),
+        lambda: record_batch_submission(batch, background_tasks, current_user),
+        response,
+    )
+
+
+@atomic("default")
+async def record_batch_submission(
+    batch: TaskBatchSubmission,
+    background_tasks: BackgroundTasks,
+    current_user: User,
+) -> TaskBatchResponse:
+    items = batch.submissions
+    logger.info(f"Received batch of {len(items)} submissions")
+    results: list[TaskBatchItemResult | None] = [None] * len(items)
+    accepted = []
+    seen_keys = set()
+
+    for i, item in enumerate(items):
+        try:
+            validate_submission(item)
+            key = (item.tool_name, item.field, completion_time(item.completed_date))
+        except (InvalidSubmissionError, ValueError) as e:
+            detail = e.detail if isinstance(e, InvalidSubmissionError) else str(e)
+            results[i] = TaskBatchItemResult(
+                task_id=item.task_id, status="invalid", detail=detail
+            )
+            continue
+        if key in seen_keys:
+            results[i] = TaskBatchItemResult(
+                task_id=item.task_id,
+                status="duplicate",
+                detail="Repeated within the batch",
+            )
+            continue
+        seen_keys.add(key)
+        accepted.append((i, item, key))
+
+    try:
+        if accepted:
+            tool_names = {item.tool_name for _, item, _ in accepted}
+            existing = await CompletedTask.filter(
+                user=current_user.username,
+                tool_name__in=tool_names,
+                field__in={item.field for _, item, _ in accepted},
+            ).values_list("tool_name", "field", "completed_date")
+            existing_keys = {
+                (name, field, completion_time(date)) for name, field, date in existing
+            }
+            new = []
+            for i, item, key in accepted:
+                if key in existing_keys:
+                    results[i] = TaskBatchItemResult(
+                        task_id=item.task_id,
+                        status="duplicate",
+                        detail="Submission already recorded",
+                    )
+                else:
+                    new.append((i, item, key))
+            accepted = new
+
+        if accepted:
+            await CompletedTask.bulk_create(
+                [
+                    CompletedTask(
+                        tool_name=item.tool_name,
+                        tool_title=item.tool_title,
+                        field=item.field,
+                        user=current_user.username,
+                        completed_date=item.completed_date,
+                    )
+                    for _, item, _ in accepted
+                ]
+            )
+            # Bulk inserts don't return primary keys; read them back by the
+            # unique key instead.
+            created = await CompletedTask.filter(
+                user=current_user.username,
+                tool_name__in={item.tool_name for _, item, _ in accepted},
+                field__in={item.field for _, item, _ in accepted},
+            ).values_list("id", "tool_name", "field", "completed_date")
+            created_ids = {
+                (name, field, completion_time(date)): pk
+                for pk, name, field, date in created
+            }
+
+            reports: dict[tuple[str, Any], set[str]] = {}
+            for _, item, _ in accepted:
+                if item.field in REPORT_FIELDS:
+                    reports.setdefault((item.field, item.value), set()).add(
+                        item.tool_name
+                    )
+            for (field, value), names in reports.items():
+                await Tool.filter(name__in=names).update(**{field: value})
+                logger.info(f"Updated {field}={value} for tools: {sorted(names)}")
+
+            await enqueue_submissions(
+                [
+                    (item.tool_name, await prepare_toolhub_submission(item))
+                    for _, item, _ in accepted
+                ],
+                current_user.id,
+                coalesce_window=settings.OUTBOX_COALESCE_WINDOW_SECONDS,
+            )
+            background_tasks.add_task(outbox_worker.wake)
+
+            deleted_count = await Task.filter(
+                id__in=[item.task_id for _, item, _ in accepted]
+            ).delete()
+            logger.info(f"Deleted {deleted_count} tasks for batch submission")
+
+            for i, item, key in accepted:
+                results[i] = TaskBatchItemResult(
+                    task_id=item.task_id,
+                    status="recorded",
+                    completed_task_id=created_ids.get(key),
+                )
+
+        return TaskBatchResponse(results=results, recorded=len(accepted))
+
+    except Exception as e:
+        logger.error(f"Error processing batch submission: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=422, detail=f"Error processing submission: {str(e)}"
+        )
+
+
 @router.post("/{task_id}")
-@atomic()
 async def submit_task(
     task_id: int,
     submission: TaskSubmission,
     background_tasks: BackgroundTasks,
+    response: Response,
     current_user: User = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
 ):
+    return await run_idempotent(
+        idempotency_key,
+        current_user,
+        request_fingerprint(task_id, submission.model_dump_json()),
+        lambda: record_task_submission(
+            task_id, submission, background_tasks, current_user
+        ),
+        response,
+    )
+
+
+@atomic("default")
+async def record_task_submission(
+    task_id: int,
+    submission: TaskSubmission,
+    background_tasks: BackgroundTasks,
+    current_user: User,
+) -> dict:
     logger.info(f"Received submission for task {task_id}: {submission}")
+    validate_submission(submission)
     try:
-        is_report = submission.field in ["deprecated", "experimental"]
+        is_report = submission.field in REPORT_FIELDS
 
         tool = await Tool.get_or_none(name=submission.tool_name)
         if not tool:
@@ -78,12 +270,14 @@ async def submit_task(
             logger.info(f"Updated Tool: {submission.tool_name}")
 
         toolhub_data = await prepare_toolhub_submission(submission)
-        background_tasks.add_task(
-            submit_to_toolhub,
+        await enqueue_submission(
             submission.tool_name,
             toolhub_data,
             current_user.id,
+            coalesce_window=settings.OUTBOX_COALESCE_WINDOW_SECONDS,
         )
+        # Runs after the response is sent, i.e. after the transaction commits.
+        background_tasks.add_task(outbox_worker.wake)
 
         deleted_count = await Task.filter(id=task_id).delete()
         if deleted_count:
@@ -107,6 +301,66 @@ async def submit_task(
         )
 
 
+async def run_idempotent(
+    idempotency_key: Optional[str],
+    current_user: User,
+    fingerprint: str,
+    handler: Callable[[], Awaitable[Any]],
+    response: Response,
+) -> Any:
+    """
+    Run a submission handler at most once per Idempotency-Key and user.
+    Replays return the stored result and set the Idempotent-Replayed header.
+    """
+    if idempotency_key is None:
+        return await handler()
+    if not 0 < len(idempotency_key) <= MAX_IDEMPOTENCY_KEY_LENGTH:
+        raise IdempotencyKeyError(
+            f"Idempotency-Key must be 1-{MAX_IDEMPOTENCY_KEY_LENGTH} characters"
+        )
+    result, replayed = await idempotency_store.run(
+        f"{current_user.id}:{idempotency_key}", fingerprint, handler
+    )
+    if replayed:
+        logger.info(f"Replayed response for Idempotency-Key {idempotency_key}")
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
+
+
+def validate_submission(submission: TaskSubmission) -> None:
+    """
+    Check the submitted value against the cached Toolhub schema. Skipped
+    when no schema has been loaded yet; Toolhub still validates the PUT.
+    Report fields are written to the tool row, so they must be booleans
+    either way.
+    """
+    if submission.field in REPORT_FIELDS and not isinstance(submission.value, bool):
+        raise InvalidSubmissionError(
+            f"Invalid value for {submission.field}: expected boolean, "
+            f"got {type(submission.value).__name__}"
+        )
+    validators = schema_cache.get_validators_nowait()
+    if validators is None:
+        logger.warning("Toolhub schema not loaded, skipping local validation")
+        return
+    validator = validators.get(submission.field)
+    if validator is None:
+        return
+    try:
+        validator(submission.value)
+    except SchemaValidationError as e:
+        raise InvalidSubmissionError(f"Invalid value for {submission.field}: {e}")
+
+
+def completion_time(value: str | datetime) -> datetime:
+    """Normalize a completion date to an aware UTC datetime for comparison."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=UTC)
+    return value.astimezone(UTC)
+
+
 async def get_tasks_from_db(
     field_names: Optional[str] = None,
     tool_names: Optional[str] = None,
@@ -218,6 +472,7 @@ async def submit_to_toolhub(
         )
         logger.info(f"Successfully submitted data to Toolhub for tool: {tool_name}")
         logger.info(f"Toolhub response: {response}")
+        tool_resyncer.schedule(tool_name)
     except HTTPException as e:
         logger.error(
             f"Error submitting data to Toolhub for tool {tool_name}: {e.detail}"
@@ -231,3 +486,15 @@ async def submit_to_toolhub(
             status_code=500,
             detail=f"Internal server error while submitting to Toolhub: {str(e)}",
         )
+
+
+async def deliver_outbox_entries(entries: list[ToolhubOutbox]) -> None:
+    """Send one or more queued submissions by a user for a tool as one PUT."""
+    toolhub_data = merge_toolhub_submissions(
+        [ToolhubSubmission(**entry.payload) for entry in entries]
+    )
+    await submit_to_toolhub(entries[0].tool_name, toolhub_data, entries[0].user_id)
+
+
+outbox_worker = OutboxWorker.from_settings(deliver_outbox_entries, settings)
+tool_resyncer = ToolResyncer.from_settings(toolhub_client, settings)
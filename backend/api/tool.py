@@ -3,11 +3,13 @@ from tortoise.exceptions import OperationalError
 
 from backend.models.pydantic import ToolNamesResponse
 from backend.models.tortoise import Tool
+from backend.replica import read_only
 
 router = APIRouter(prefix="/tools", tags=["tools"])
 
 
 @router.get("", response_model=ToolNamesResponse)
+@read_only
 async def get_tools():
     try:
         tools = await Tool.filter(deprecated=False, experimental=False).values(
@@ -1,7 +1,6 @@
 from datetime import UTC, datetime, timedelta
 from typing import Optional
 
-import httpx
 from fastapi import APIRouter, Cookie, Depends, HTTPException, Query
 from jose import JWTError, jwt
 from tortoise.exceptions import DoesNotExist
@@ -24,18 +23,20 @@ from backend.models.pydantic import (
 )
 from backend.models.tortoise import CompletedTask
 from backend.models.tortoise import User as DBUser
+from backend.replica import read_only
 from backend.security import (
     ALGORITHM,
     decrypt_token,
     encrypt_token,
     refresh_access_token,
 )
-from backend.utils import get_logger
+from backend.utils import ToolhubClient, get_logger
 
 logger = get_logger(__name__)
 
 router = APIRouter(prefix="/user", tags=["users"])
 settings = get_settings()
+toolhub_client = ToolhubClient(settings.TOOLHUB_API_BASE_URL)
 
 
 async def get_current_user(access_token: str = Cookie(None)) -> User:
@@ -59,6 +60,7 @@ async def read_user(current_user: User = Depends(get_current_user)):
 
 
 @router.get("/contributions/leaderboard", response_model=ContributionsResponse)
+@read_only
 async def get_leaderboard_metrics(
     days: Optional[int] = Query(
         None, description="Number of days to consider for the leaderboard"
@@ -140,6 +142,7 @@ async def get_contributions(
 
 
 @router.get("/contributions/{username}", response_model=UserContributionsResponse)
+@read_only
 async def get_user_contributions(
     username: str,
     limit: Optional[int] = Query(
@@ -160,6 +163,7 @@ async def get_user_contributions(
 
 
 @router.get("/contributions", response_model=UserContributionsResponse)
+@read_only
 async def get_all_contributions(
     limit: Optional[int] = Query(
         None, ge=1, description="Maximum number of contributions to return (optional)"
@@ -197,12 +201,7 @@ async def create_or_update_user(user_data: dict, token_response: dict) -> User:
 
 
 async def fetch_user_data(access_token: str) -> dict:
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            f"{settings.TOOLHUB_API_BASE_URL}/user/",
-            headers={"Authorization": f"Bearer {access_token}"},
-        )
-    return response.json()
+    return await toolhub_client.get_user(access_token)
 
 
 async def get_user_token(user_id: str) -> Token:
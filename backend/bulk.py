@@ -0,0 +1,178 @@
+"""
+Batched INSERT and upsert statements for MariaDB/MySQL and SQLite.
+
+Rows are plain tuples in column order, so large loads skip model
+instantiation. Each batch runs as one executemany in its own transaction;
+asyncmy rewrites it into a multi-row INSERT.
+
+Tortoise's bulk_create(on_conflict=...) isn't used because on MySQL it
+emits the `INSERT ... AS alias` form, which MariaDB doesn't support.
+"""
+
+import itertools
+import time
+from datetime import datetime
+from typing import Iterable, Type
+
+from tortoise import Model, connections
+from tortoise.backends.base.client import BaseDBAsyncClient
+from tortoise.transactions import in_transaction
+
+from backend.instrumentation import record_query
+from backend.utils import get_logger
+
+logger = get_logger(__name__)
+
+
+def dialect_of(connection: BaseDBAsyncClient) -> str:
+    return connection.capabilities.dialect
+
+
+def _quote(name: str, dialect: str) -> str:
+    return f"`{name}`" if dialect == "mysql" else f'"{name}"'
+
+
+def insert_sql(
+    model: Type[Model],
+    columns: list[str],
+    dialect: str,
+    ignore_conflicts: bool = False,
+    conflict: list[str] | None = None,
+    update: list[str] | None = None,
+) -> str:
+    """
+    Build a parameterized INSERT for one row. With `update`, rows that clash
+    with the `conflict` key update those columns instead.
+    """
+    table = _quote(model._meta.db_table, dialect)
+    column_sql = ",".join(_quote(column, dialect) for column in columns)
+    placeholder = "%s" if dialect == "mysql" else "?"
+    values = ",".join([placeholder] * len(columns))
+
+    verb = "INSERT"
+    if ignore_conflicts:
+        verb = "INSERT IGNORE" if dialect == "mysql" else "INSERT OR IGNORE"
+    sql = f"{verb} INTO {table} ({column_sql}) VALUES ({values})"
+
+    if update:
+        if dialect == "mysql":
+            assignments = ",".join(
+                f"{_quote(c, dialect)}=VALUES({_quote(c, dialect)})" for c in update
+            )
+            sql += f" ON DUPLICATE KEY UPDATE {assignments}"
+        else:
+            key = ",".join(_quote(column, dialect) for column in conflict or [])
+            assignments = ",".join(
+                f"{_quote(c, dialect)}=excluded.{_quote(c, dialect)}" for c in update
+            )
+            sql += f" ON CONFLICT ({key}) DO UPDATE SET {assignments}"
+    return sql
+
+
+def to_db(value, dialect: str):
+    # Tortoise's SQLite backend stores datetimes as ISO strings.
+    if dialect == "sqlite" and isinstance(value, datetime):
+        return value.isoformat(" ")
+    return value
+
+
+def batched(rows: Iterable[tuple], size: int) -> Iterable[list[tuple]]:
+    rows = iter(rows)
+    while batch := list(itertools.islice(rows, size)):
+        yield batch
+
+
+async def execute_batch(model: Type[Model], sql: str, batch: list[tuple]) -> int:
+    """
+    Run `sql` for a batch of rows in its own transaction. Returns the number
+    of rows the database reports as affected, which Tortoise's execute_many
+    doesn't expose: for INSERT IGNORE, the rows actually inserted. The
+    statement bypasses the instrumented client, so it is recorded here.
+    """
+    async with in_transaction(model._meta.default_connection) as connection:
+        dialect = dialect_of(connection)
+        values = [[to_db(value, dialect) for value in row] for row in batch]
+        async with connection.acquire_connection() as raw_connection:
+            start = time.perf_counter()
+            try:
+                if dialect == "mysql":
+                    async with raw_connection.cursor() as cursor:
+                        await cursor.executemany(sql, values)
+                        return cursor.rowcount
+                cursor = await raw_connection.executemany(sql, values)
+                return cursor.rowcount
+            finally:
+                record_query(sql, time.perf_counter() - start)
+
+
+async def execute_batches(
+    model: Type[Model], sql: str, rows: Iterable[tuple], batch_size: int
+) -> int:
+    """Run `sql` for each batch of rows in its own transaction."""
+    total = 0
+    for batch in batched(rows, batch_size):
+        await execute_batch(model, sql, batch)
+        total += len(batch)
+    return total
+
+
+async def bulk_insert(
+    model: Type[Model],
+    columns: list[str],
+    rows: Iterable[tuple],
+    batch_size: int = 1000,
+    ignore_conflicts: bool = False,
+) -> int:
+    """Insert rows in batches. Returns the number of rows sent."""
+    dialect = dialect_of(connections.get(model._meta.default_connection))
+    sql = insert_sql(model, columns, dialect, ignore_conflicts=ignore_conflicts)
+    return await execute_batches(model, sql, rows, batch_size)
+
+
+async def bulk_upsert(
+    model: Type[Model],
+    columns: list[str],
+    rows: Iterable[tuple],
+    conflict: list[str],
+    update: list[str],
+    batch_size: int = 1000,
+) -> int:
+    """
+    Insert rows in batches, updating `update` on rows whose `conflict` key
+    already exists. Returns the number of rows sent.
+    """
+    dialect = dialect_of(connections.get(model._meta.default_connection))
+    sql = insert_sql(model, columns, dialect, conflict=conflict, update=update)
+    return await execute_batches(model, sql, rows, batch_size)
+
+
+class BulkInserter:
+    """
+    Inserts plain tuples in batches and logs progress. Rows that hit a unique
+    key are ignored; `inserted` counts the rows the database added.
+    """
+
+    def __init__(self, model, columns: list[str], batch_size: int):
+        self.model = model
+        dialect = dialect_of(connections.get(model._meta.default_connection))
+        self.sql = insert_sql(model, columns, dialect, ignore_conflicts=True)
+        self.batch_size = batch_size
+        self.label = model.__name__
+        self.inserted = 0
+
+    async def insert(self, rows: Iterable[tuple]) -> int:
+        """Insert `rows`. Returns the number of rows sent."""
+        total = 0
+        start = time.perf_counter()
+        for chunk in batched(rows, self.batch_size * 20):
+            for batch in batched(chunk, self.batch_size):
+                self.inserted += await execute_batch(self.model, self.sql, batch)
+                total += len(batch)
+            rate = total / (time.perf_counter() - start)
+            logger.info(f"{self.label}: {total:,} rows ({rate:,.0f} rows/s)")
+        elapsed = time.perf_counter() - start
+        logger.info(
+            f"{self.label}: sent {total:,} rows, inserted {self.inserted:,} in "
+            f"{elapsed:.1f}s ({total / max(elapsed, 1e-9):,.0f} rows/s)"
+        )
+        return total
@@ -37,8 +37,71 @@ class Settings(BaseSettings):
     ENVIRONMENT: Literal["dev", "prod"] = "dev"
     LOG_LEVEL: str = "INFO"
     DATABASE_URL: str
+    # Read replica for read-only endpoints, see backend.replica
+    DATABASE_REPLICA_URL: str | None = None
+    REPLICA_MAX_LAG_SECONDS: float = 5.0
+    REPLICA_LAG_CHECK_INTERVAL_SECONDS: float = 5.0
+    # How long a client reads from the primary after writing
+    REPLICA_STICKY_SECONDS: float = 30.0
     TOOLHUB_API_BASE_URL: str = "https://toolhub-demo.wmcloud.org/api"
 
+    # Outbound Toolhub traffic shaping (per worker process)
+    TOOLHUB_RATE_LIMIT: float = 10.0  # requests per second
+    TOOLHUB_RATE_BURST: int = 20
+    TOOLHUB_MAX_IN_FLIGHT: int = 8
+
+    # Toolhub schema cache
+    SCHEMA_CACHE_TTL_SECONDS: int = 60 * 60 * 6
+    SCHEMA_CACHE_PATH: str = "schema_cache.json"
+
+    # Toolhub submission outbox
+    OUTBOX_CONCURRENCY: int = 4
+    OUTBOX_POLL_INTERVAL_SECONDS: float = 5.0
+    OUTBOX_MAX_ATTEMPTS: int = 8
+    OUTBOX_BACKOFF_BASE_SECONDS: float = 5.0
+    OUTBOX_BACKOFF_MAX_SECONDS: float = 60 * 60
+    OUTBOX_LEASE_SECONDS: float = 5 * 60
+    # Submissions by one user to one tool within the window share a PUT
+    OUTBOX_COALESCE_WINDOW_SECONDS: float = 10.0
+    OUTBOX_COALESCE_MAX_BATCH: int = 20
+    # Delivered entries are deleted after this long
+    OUTBOX_DONE_RETENTION_SECONDS: float = 7 * 24 * 60 * 60
+    # How long shutdown waits for deliveries; unfinished ones wait out their lease
+    OUTBOX_SHUTDOWN_TIMEOUT_SECONDS: float = 10.0
+
+    # Idempotency-Key replay store (per worker process)
+    IDEMPOTENCY_MAX_KEYS: int = 10_000
+    IDEMPOTENCY_TTL_SECONDS: int = 60 * 60 * 24
+
+    # Rows per statement in database update bulk writes
+    SYNC_BATCH_SIZE: int = 1000
+    # Tools per Toolhub page fetched by the database update, None for the default
+    SYNC_PAGE_SIZE: int | None = 100
+    # Pages buffered between database update stages
+    SYNC_QUEUE_SIZE: int = 4
+    # In-app scheduled database updates, off when the interval is 0
+    SYNC_INTERVAL_SECONDS: float = 0.0
+    SYNC_JITTER_SECONDS: float = 5 * 60
+    SYNC_LOCK_NAME: str = "toolhunt_sync"
+    SYNC_PROGRESS_INTERVAL_SECONDS: float = 1.0
+    # Incremental updates from the Toolhub recent changes feed between full
+    # updates, off when the interval is 0
+    SYNC_INCREMENTAL_INTERVAL_SECONDS: float = 0.0
+    SYNC_INCREMENTAL_CONCURRENCY: int = 4
+    # Delay of the resync of a tool after a submission to it, off when 0
+    SYNC_TOOL_RESYNC_DELAY_SECONDS: float = 30.0
+
+    # Usernames allowed to use the /admin endpoints
+    ADMIN_USERNAMES: list[str] = []
+
+    # Query instrumentation
+    SLOW_QUERY_THRESHOLD_MS: float = 200.0
+    N_PLUS_ONE_THRESHOLD: int = 10
+
+    # Traffic capture for replay, off unless a path is set
+    TRAFFIC_CAPTURE_PATH: str | None = None
+    TRAFFIC_CAPTURE_SAMPLE_RATE: float = 1.0
+
     # OAuth2 configuration
     TOOLHUB_AUTH_URL: str
     TOOLHUB_TOKEN_URL: str
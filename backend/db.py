@@ -1,4 +1,8 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
 from fastapi import FastAPI
+from tortoise import connections
 from tortoise.contrib.fastapi import RegisterTortoise
 
 from backend.config import get_settings
@@ -14,13 +18,42 @@ TORTOISE_ORM = {
         }
     },
 }
+if settings.DATABASE_REPLICA_URL:
+    TORTOISE_ORM["connections"]["replica"] = settings.DATABASE_REPLICA_URL
+    TORTOISE_ORM["routers"] = ["backend.replica.ReplicaRouter"]
 
 
 def register_tortoise(app: FastAPI) -> RegisterTortoise:
     return RegisterTortoise(
         app,
-        db_url=settings.DATABASE_URL,
-        modules={"models": ["backend.models.tortoise", "aerich.models"]},
+        config=TORTOISE_ORM,
         generate_schemas=False,
         add_exception_handlers=True,
     )
+
+
+@asynccontextmanager
+async def advisory_lock(
+    name: str, connection_name: str = "default"
+) -> AsyncIterator[bool]:
+    """
+    Try to take a MariaDB named lock without waiting, and hold it for the
+    block. Yields whether it was taken. The lock lives on one pooled
+    connection, which is kept out of the pool meanwhile, so it is released
+    if the process dies. Other backends only serve one process, so the lock
+    is always taken there.
+    """
+    client = connections.get(connection_name)
+    if client.capabilities.dialect != "mysql":
+        yield True
+        return
+    async with client.acquire_connection() as connection:
+        async with connection.cursor() as cursor:
+            await cursor.execute("SELECT GET_LOCK(%s, 0)", (name,))
+            (acquired,) = await cursor.fetchone()
+        try:
+            yield acquired == 1
+        finally:
+            if acquired == 1:
+                async with connection.cursor() as cursor:
+                    await cursor.execute("SELECT RELEASE_LOCK(%s)", (name,))
@@ -44,3 +44,21 @@ class InternalServerError(HTTPException):
         super().__init__(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=detail
         )
+
+
+class InvalidSubmissionError(HTTPException):
+    """Raised when a submitted value doesn't match the Toolhub schema."""
+
+    def __init__(self, detail: str = "Invalid submission"):
+        super().__init__(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=detail
+        )
+
+
+class IdempotencyKeyError(HTTPException):
+    """Raised when an Idempotency-Key is invalid or reused for another request."""
+
+    def __init__(self, detail: str = "Invalid Idempotency-Key"):
+        super().__init__(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=detail
+        )
@@ -0,0 +1,95 @@
+"""
+Replays the stored result of a request that carried an Idempotency-Key.
+
+Keys live in a bounded in-process LRU, so duplicates are suppressed per
+worker process. A duplicate that arrives while the first request is still
+running waits for it instead of doing the work again. Failed requests are
+not stored; the next request with the key runs normally.
+"""
+
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+
+from backend.exceptions import IdempotencyKeyError
+
+
+@dataclass
+class _Entry:
+    fingerprint: str
+    result: asyncio.Future = field(
+        default_factory=lambda: asyncio.get_running_loop().create_future()
+    )
+    expires_at: float = float("inf")
+
+
+_FAILED = object()
+
+
+def request_fingerprint(*parts: Any) -> str:
+    return hashlib.sha256("\x1f".join(str(part) for part in parts).encode()).hexdigest()
+
+
+class IdempotencyStore:
+    def __init__(self, max_entries: int = 10_000, ttl: float = 24 * 60 * 60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+
+    def _get(self, key: str) -> _Entry | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _evict(self) -> None:
+        # Oldest completed entries go first. Running requests are kept, since
+        # their duplicates are waiting on them.
+        for key in list(self._entries):
+            if len(self._entries) <= self.max_entries:
+                break
+            if self._entries[key].result.done():
+                del self._entries[key]
+
+    async def run(
+        self,
+        key: str,
+        fingerprint: str,
+        handler: Callable[[], Awaitable[Any]],
+    ) -> tuple[Any, bool]:
+        """
+        Run `handler` once per key. Returns the result and whether it was
+        replayed from an earlier request.
+        """
+        while True:
+            entry = self._get(key)
+            if entry is None:
+                break
+            if entry.fingerprint != fingerprint:
+                raise IdempotencyKeyError(
+                    "Idempotency-Key was already used for a different request"
+                )
+            result = await asyncio.shield(entry.result)
+            if result is not _FAILED:
+                return result, True
+
+        entry = _Entry(fingerprint)
+        self._entries[key] = entry
+        self._evict()
+        try:
+            result = await handler()
+        except BaseException:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+            entry.result.set_result(_FAILED)
+            raise
+        entry.expires_at = time.monotonic() + self.ttl
+        entry.result.set_result(result)
+        return result, False
@@ -0,0 +1,264 @@
+"""
+Counts and times SQL statements issued through Tortoise, and records HTTP
+request metrics.
+
+instrument_tortoise() wraps the execute_* methods of every loaded Tortoise
+client class, including transaction wrappers. Statements are attributed to
+the QueryStats of the current context, which QueryStatsMiddleware sets per
+request and track_queries() sets for scripts. Statements slower than the
+threshold are logged wherever they run.
+"""
+
+import functools
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator
+
+from tortoise import connections
+from tortoise.backends.base.client import BaseDBAsyncClient
+
+from backend.metrics import Gauge, Histogram
+from backend.utils import get_logger
+
+logger = get_logger(__name__)
+
+http_request_seconds = Histogram(
+    "toolhunt_http_request_duration_seconds",
+    "HTTP request latency by method, route template and status code.",
+    labelnames=("method", "route", "status"),
+)
+http_requests_in_flight = Gauge(
+    "toolhunt_http_requests_in_flight",
+    "HTTP requests currently being served.",
+)
+db_pool_connections = Gauge(
+    "toolhunt_db_pool_connections",
+    "Database pool connections by state.",
+    labelnames=("connection", "state"),
+)
+
+EXECUTE_METHODS = (
+    "execute_insert",
+    "execute_many",
+    "execute_query",
+    "execute_query_dict",
+    "execute_script",
+)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*(?:\?|%s)(?:\s*,\s*(?:\?|%s))*\s*\)", re.I)
+_VALUES_LIST = re.compile(r"\bVALUES\s*\([^()]*\)(?:\s*,\s*\([^()]*\))*", re.I | re.S)
+_WHITESPACE = re.compile(r"\s+")
+
+_current_stats: ContextVar["QueryStats | None"] = ContextVar(
+    "current_query_stats", default=None
+)
+# Set while an instrumented call runs, so nested execute_* calls made by the
+# client itself aren't counted twice.
+_in_query: ContextVar[bool] = ContextVar("in_instrumented_query", default=False)
+
+slow_query_seconds = 0.2
+
+
+@functools.lru_cache(maxsize=2048)
+def normalize_sql(query: str) -> str:
+    """Reduce a statement to its shape by replacing literals and value lists."""
+    shape = _STRING.sub("?", query)
+    shape = _NUMBER.sub("?", shape)
+    shape = _IN_LIST.sub("IN (...)", shape)
+    shape = _VALUES_LIST.sub("VALUES (...)", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+@dataclass
+class QueryStats:
+    label: str
+    count: int = 0
+    seconds: float = 0.0
+    shapes: Counter = field(default_factory=Counter)
+
+    def record(self, query: str, elapsed: float) -> None:
+        self.count += 1
+        self.seconds += elapsed
+        self.shapes[normalize_sql(query)] += 1
+
+    def repeated_shapes(self, threshold: int) -> list[tuple[str, int]]:
+        return [(s, n) for s, n in self.shapes.most_common() if n >= threshold]
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.seconds * 1000:.1f};desc="{self.count} queries"'
+
+    def report(self, n_plus_one_threshold: int) -> None:
+        for shape, count in self.repeated_shapes(n_plus_one_threshold):
+            logger.warning(
+                f"Probable N+1 in {self.label}: {count} statements of shape: {shape}"
+            )
+        logger.debug(
+            f"{self.label}: {self.count} queries in {self.seconds * 1000:.1f}ms"
+        )
+
+
+def current_stats() -> QueryStats | None:
+    return _current_stats.get()
+
+
+@contextmanager
+def track_queries(label: str, n_plus_one_threshold: int = 10) -> Iterator[QueryStats]:
+    """Attribute queries in this context to a new QueryStats and report them."""
+    stats = QueryStats(label)
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+        stats.report(n_plus_one_threshold)
+
+
+def record_query(query: str, elapsed: float) -> None:
+    """Attribute a statement to the current QueryStats and log it if slow."""
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record(query, elapsed)
+    if elapsed >= slow_query_seconds:
+        logger.warning(f"Slow query ({elapsed * 1000:.0f}ms): {normalize_sql(query)}")
+
+
+def _wrap(method):
+    @functools.wraps(method)
+    async def instrumented(self, query, *args, **kwargs):
+        if _in_query.get():
+            return await method(self, query, *args, **kwargs)
+        token = _in_query.set(True)
+        start = time.perf_counter()
+        try:
+            return await method(self, query, *args, **kwargs)
+        finally:
+            _in_query.reset(token)
+            record_query(query, time.perf_counter() - start)
+
+    instrumented.__instrumented__ = True
+    return instrumented
+
+
+def _client_classes(cls=BaseDBAsyncClient) -> Iterator[type]:
+    yield cls
+    for subclass in cls.__subclasses__():
+        yield from _client_classes(subclass)
+
+
+def instrument_tortoise(slow_query_ms: float | None = None) -> None:
+    """
+    Wrap the execute methods of all loaded client classes. Call after
+    Tortoise.init(), which imports the backend in use. Safe to call again.
+    """
+    global slow_query_seconds
+    if slow_query_ms is not None:
+        slow_query_seconds = slow_query_ms / 1000
+    for cls in set(_client_classes()):
+        for name in EXECUTE_METHODS:
+            method = cls.__dict__.get(name)
+            if method is not None and not getattr(method, "__instrumented__", False):
+                setattr(cls, name, _wrap(method))
+
+
+class QueryStatsMiddleware:
+    """
+    Tracks the queries of each HTTP request, warns about probable N+1
+    patterns and optionally reports database time in a Server-Timing header.
+    """
+
+    def __init__(self, app, server_timing: bool = False, n_plus_one_threshold=10):
+        self.app = app
+        self.server_timing = server_timing
+        self.n_plus_one_threshold = n_plus_one_threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats(f"{scope['method']} {scope['path']}")
+        token = _current_stats.set(stats)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start" and self.server_timing:
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", stats.server_timing().encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_stats.reset(token)
+            route = scope.get("route")
+            if route is not None:
+                stats.label = f"{scope['method']} {route.path}"
+            stats.report(self.n_plus_one_threshold)
+
+
+class RequestMetricsMiddleware:
+    """
+    Records request latency per route template and the number of requests in
+    flight. Requests that match no route share one label value, so unknown
+    paths can't grow the metric without bound.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_requests_in_flight.dec()
+            route = scope.get("route")
+            http_request_seconds.labels(
+                scope["method"], route.path if route else "unmatched", status
+            ).observe(elapsed)
+
+
+def _pool_size(name: str, state: str) -> float:
+    try:
+        pool = getattr(connections.get(name), "_pool", None)
+    except Exception:
+        return 0
+    if pool is None:
+        return 0
+    if state == "max":
+        return pool.maxsize
+    if state == "idle":
+        return pool.freesize
+    return pool.size - pool.freesize
+
+
+def register_pool_metrics() -> None:
+    """
+    Report pool usage of every Tortoise connection at collection time. Call
+    after Tortoise.init(). Backends without a pool, like sqlite, report zeros.
+    """
+    for name in connections.db_config:
+        for state in ("in_use", "idle", "max"):
+            db_pool_connections.labels(name, state).set_function(
+                functools.partial(_pool_size, name, state)
+            )
@@ -1,14 +1,24 @@
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
 
+import httpx
 from fastapi import APIRouter, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
 
-from backend.api import auth, field, schema, task, tool, user
+from backend.api import admin, auth, field, metrics, schema, task, tool, user
 from backend.config import get_settings
 from backend.db import register_tortoise
-from backend.utils import get_logger, setup_logging
+from backend.instrumentation import (
+    QueryStatsMiddleware,
+    RequestMetricsMiddleware,
+    instrument_tortoise,
+    register_pool_metrics,
+)
+from backend.replica import ReplicaStickinessMiddleware, replica_monitor
+from backend.sync import SyncScheduler
+from backend.traffic import TrafficCaptureMiddleware, TrafficRecorder
+from backend.utils import ToolhubClient, get_logger, setup_logging
 
 settings = get_settings()
 
@@ -19,9 +29,31 @@ logger = get_logger(__name__)
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     logger.info("Starting up...")
+    schema.schema_cache.load_from_disk()
+    schema.schema_cache.refresh_in_background()
     async with register_tortoise(app):
         logger.info("Database registered.")
+        instrument_tortoise(settings.SLOW_QUERY_THRESHOLD_MS)
+        register_pool_metrics()
+        if settings.DATABASE_REPLICA_URL:
+            replica_monitor.start()
+        task.outbox_worker.start()
+        # Scheduled and admin-triggered syncs share one HTTP connection pool.
+        http_client = httpx.AsyncClient()
+        app.state.sync_scheduler = SyncScheduler.from_settings(
+            ToolhubClient(settings.TOOLHUB_API_BASE_URL, http_client=http_client),
+            settings,
+        )
+        app.state.sync_scheduler.start()
         yield
+        await app.state.sync_scheduler.stop()
+        await http_client.aclose()
+        await task.outbox_worker.stop()
+        await task.tool_resyncer.stop()
+        await replica_monitor.stop()
+    await schema.schema_cache.close()
+    if app.state.traffic_recorder is not None:
+        app.state.traffic_recorder.close()
 
 
 def create_app(settings) -> FastAPI:
@@ -29,6 +61,25 @@ def create_app(settings) -> FastAPI:
 
     # Add middleware
     app.add_middleware(SessionMiddleware, secret_key=settings.SECRET_KEY)
+    app.add_middleware(
+        QueryStatsMiddleware,
+        server_timing=settings.ENVIRONMENT == "dev",
+        n_plus_one_threshold=settings.N_PLUS_ONE_THRESHOLD,
+    )
+    app.add_middleware(RequestMetricsMiddleware)
+    app.state.traffic_recorder = None
+    app.state.sync_scheduler = None
+    if settings.DATABASE_REPLICA_URL:
+        app.add_middleware(
+            ReplicaStickinessMiddleware, sticky_seconds=settings.REPLICA_STICKY_SECONDS
+        )
+    if settings.TRAFFIC_CAPTURE_PATH:
+        app.state.traffic_recorder = TrafficRecorder(
+            settings.TRAFFIC_CAPTURE_PATH, settings.TRAFFIC_CAPTURE_SAMPLE_RATE
+        )
+        app.add_middleware(
+            TrafficCaptureMiddleware, recorder=app.state.traffic_recorder
+        )
     # Set all CORS enabled origins
     if settings.all_cors_origins:
         app.add_middleware(
@@ -49,8 +100,10 @@ def create_app(settings) -> FastAPI:
     api_router.include_router(field.router)
     api_router.include_router(tool.router)
     api_router.include_router(schema.router)
+    api_router.include_router(admin.router)
 
     app.include_router(api_router)
+    app.include_router(metrics.router)
 
     return app
 
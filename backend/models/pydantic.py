@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Any, Optional
+from typing import Any, Literal, Optional
 
 from pydantic import BaseModel, Field
 
@@ -55,6 +55,26 @@ class TaskSubmission(BaseModel):
         from_attributes = True
 
 
+class TaskBatchItem(TaskSubmission):
+    task_id: int
+
+
+class TaskBatchSubmission(BaseModel):
+    submissions: list[TaskBatchItem] = Field(..., min_length=1, max_length=50)
+
+
+class TaskBatchItemResult(BaseModel):
+    task_id: int
+    status: Literal["recorded", "invalid", "duplicate"]
+    completed_task_id: Optional[int] = None
+    detail: Optional[str] = None
+
+
+class TaskBatchResponse(BaseModel):
+    results: list[TaskBatchItemResult]
+    recorded: int
+
+
 class ToolhubSubmission(BaseModel):
     wikidata_qid: Optional[str] = Field(None, pattern=r"^Q\d+$", max_length=32)
     audiences: Optional[list[str]] = Field(
@@ -1,3 +1,5 @@
+from enum import Enum
+
 from tortoise import fields, models
 
 
@@ -18,6 +20,8 @@ class Tool(models.Model):
     title = fields.CharField(max_length=255, null=False)
     description = fields.TextField(null=False)
     url = fields.CharField(max_length=2047, null=False)
+    # Hash of the synced content, see backend.sync.ToolhuntTool.fingerprint
+    fingerprint = fields.CharField(max_length=32, null=True)
     last_updated = fields.DatetimeField(auto_now=True)
     deprecated = fields.BooleanField(default=False)
     experimental = fields.BooleanField(default=False)
@@ -57,3 +61,39 @@ class CompletedTask(models.Model):
         table = "completed_task"
         charset = "binary"
         unique_together = ("tool_name", "field", "user", "completed_date")
+
+
+class OutboxStatus(str, Enum):
+    PENDING = "pending"
+    DONE = "done"
+    DEAD = "dead"
+
+
+class ToolhubOutbox(models.Model):
+    id = fields.IntField(pk=True, generated=True)
+    tool_name = fields.CharField(max_length=255, null=False)
+    user_id = fields.CharField(max_length=255, null=False)
+    payload = fields.JSONField()
+    status = fields.CharEnumField(OutboxStatus, default=OutboxStatus.PENDING)
+    attempts = fields.IntField(default=0)
+    next_attempt_at = fields.DatetimeField(null=False)
+    last_error = fields.TextField(null=True)
+    # Delivered on its own, after a merged PUT containing it was rejected
+    isolated = fields.BooleanField(default=False)
+    created_at = fields.DatetimeField(auto_now_add=True)
+    updated_at = fields.DatetimeField(auto_now=True)
+
+    class Meta:
+        table = "toolhub_outbox"
+        indexes = (("status", "next_attempt_at"), ("tool_name", "user_id", "status"))
+
+
+class SyncState(models.Model):
+    """Small named values the database update keeps between runs."""
+
+    key = fields.CharField(max_length=80, pk=True)
+    value = fields.CharField(max_length=255)
+    updated_at = fields.DatetimeField(auto_now=True)
+
+    class Meta:
+        table = "sync_state"
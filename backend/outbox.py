@@ -0,0 +1,402 @@
+"""
+Delivers queued Toolhub submissions from the toolhub_outbox table.
+
+Rows are written in the same transaction as the CompletedTask they belong
+to, so an accepted submission survives restarts and Toolhub outages. Each
+app process runs a worker that claims due rows with a conditional UPDATE,
+which keeps several processes from delivering the same row. A claimed row
+is leased by pushing its next_attempt_at forward; if the process dies
+mid-delivery the row becomes due again once the lease runs out.
+
+Delivered rows are kept for a retention period, then deleted in batches by
+the worker, so the table doesn't grow without bound.
+
+Submissions by the same user to the same tool within the coalescing window
+share a due time and are delivered together as one merged PUT. Rows from
+different users are never merged, since Toolhub attributes an edit to the
+owner of the token used for the PUT. If Toolhub rejects a merged PUT
+outright, its rows are marked isolated and retried one PUT each, so one
+bad value doesn't take the others down with it; only a row rejected on its
+own is moved to the dead letter status.
+"""
+
+import asyncio
+import random
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable
+
+from fastapi import HTTPException
+from tortoise import timezone
+from tortoise.expressions import F
+from tortoise.functions import Count, Min
+
+from backend.metrics import Counter, Gauge
+from backend.models.pydantic import ToolhubSubmission
+from backend.models.tortoise import OutboxStatus, ToolhubOutbox
+from backend.utils import get_logger
+
+logger = get_logger(__name__)
+
+outbox_depth = Gauge(
+    "toolhunt_outbox_depth",
+    "Outbox entries by delivery status.",
+    labelnames=("status",),
+)
+outbox_lag_seconds = Gauge(
+    "toolhunt_outbox_lag_seconds",
+    "Age of the oldest pending outbox entry.",
+)
+outbox_deliveries = Counter(
+    "toolhunt_outbox_deliveries_total",
+    "Outbox delivery attempts by result.",
+    labelnames=("result",),
+)
+outbox_coalesced = Counter(
+    "toolhunt_outbox_coalesced_total",
+    "Outbox entries merged into another entry's Toolhub PUT.",
+)
+
+# Toolhub answers these with a 4xx, but retrying can still succeed.
+RETRYABLE_STATUS_CODES = {408, 409, 423, 425, 429}
+# Delivered rows deleted per statement when pruning
+PRUNE_BATCH_SIZE = 1000
+
+
+async def enqueue_submission(
+    tool_name: str,
+    toolhub_data: ToolhubSubmission,
+    user_id: str,
+    coalesce_window: float = 0.0,
+) -> None:
+    """Queue a submission for delivery. Call inside the caller's transaction."""
+    await enqueue_submissions([(tool_name, toolhub_data)], user_id, coalesce_window)
+
+
+async def enqueue_submissions(
+    submissions: list[tuple[str, ToolhubSubmission]],
+    user_id: str,
+    coalesce_window: float = 0.0,
+) -> None:
+    """
+    Queue a user's submissions for delivery in one INSERT.
+
+    With a coalescing window, each row is due when the window of the user's
+    earliest waiting submission for the same tool closes, so they go out
+    together.
+    """
+    now = timezone.now()
+    default_due = now + timedelta(seconds=coalesce_window)
+    due_by_tool: dict[str, datetime] = {}
+    if coalesce_window > 0:
+        waiting = (
+            await ToolhubOutbox.filter(
+                tool_name__in={tool_name for tool_name, _ in submissions},
+                user_id=user_id,
+                status=OutboxStatus.PENDING,
+                attempts=0,
+                next_attempt_at__gt=now,
+            )
+            .order_by("-next_attempt_at")
+            .values_list("tool_name", "next_attempt_at")
+        )
+        # Ordered latest first, so the earliest due time per tool wins.
+        due_by_tool = dict(waiting)
+
+    await ToolhubOutbox.bulk_create(
+        [
+            ToolhubOutbox(
+                tool_name=tool_name,
+                user_id=user_id,
+                payload=toolhub_data.model_dump(exclude_unset=True),
+                next_attempt_at=due_by_tool.get(tool_name, default_due),
+            )
+            for tool_name, toolhub_data in submissions
+        ]
+    )
+
+
+def is_permanent_failure(error: Exception) -> bool:
+    if isinstance(error, HTTPException):
+        return 400 <= error.status_code < 500 and (
+            error.status_code not in RETRYABLE_STATUS_CODES
+        )
+    return False
+
+
+class OutboxWorker:
+    def __init__(
+        self,
+        deliver: Callable[[list[ToolhubOutbox]], Awaitable[None]],
+        concurrency: int = 4,
+        poll_interval: float = 5.0,
+        max_attempts: int = 8,
+        backoff_base: float = 5.0,
+        backoff_max: float = 3600.0,
+        lease_seconds: float = 300.0,
+        coalesce_window: float = 0.0,
+        max_batch: int = 20,
+        done_retention: float = 7 * 24 * 60 * 60,
+        shutdown_timeout: float = 10.0,
+    ):
+        self.deliver = deliver
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease_seconds = lease_seconds
+        self.coalesce_window = coalesce_window
+        self.max_batch = max_batch
+        self.done_retention = done_retention
+        self.shutdown_timeout = shutdown_timeout
+        self._wakeup = asyncio.Event()
+        self._runner: asyncio.Task | None = None
+        self._metrics_due = 0.0
+        # Running deliveries and the ids of the rows they carry
+        self._in_flight: dict[asyncio.Task, list[int]] = {}
+
+    @classmethod
+    def from_settings(cls, deliver, settings) -> "OutboxWorker":
+        return cls(
+            deliver,
+            concurrency=settings.OUTBOX_CONCURRENCY,
+            poll_interval=settings.OUTBOX_POLL_INTERVAL_SECONDS,
+            max_attempts=settings.OUTBOX_MAX_ATTEMPTS,
+            backoff_base=settings.OUTBOX_BACKOFF_BASE_SECONDS,
+            backoff_max=settings.OUTBOX_BACKOFF_MAX_SECONDS,
+            lease_seconds=settings.OUTBOX_LEASE_SECONDS,
+            coalesce_window=settings.OUTBOX_COALESCE_WINDOW_SECONDS,
+            max_batch=settings.OUTBOX_COALESCE_MAX_BATCH,
+            done_retention=settings.OUTBOX_DONE_RETENTION_SECONDS,
+            shutdown_timeout=settings.OUTBOX_SHUTDOWN_TIMEOUT_SECONDS,
+        )
+
+    def start(self) -> None:
+        if self._runner is None:
+            self._runner = asyncio.create_task(self._run())
+            self._runner.add_done_callback(self._on_runner_exit)
+            logger.info(f"Outbox worker started with concurrency {self.concurrency}")
+
+    def _on_runner_exit(self, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.critical(
+                "Outbox worker stopped unexpectedly, submissions are not "
+                "being delivered",
+                exc_info=task.exception(),
+            )
+
+    async def stop(self) -> None:
+        """
+        Stop claiming new rows and give in-flight deliveries up to
+        `shutdown_timeout` seconds to finish. Deliveries still running then
+        are cancelled; their rows become due again when their lease runs out.
+        """
+        if self._runner is None:
+            return
+        self._runner.cancel()
+        await asyncio.wait([self._runner], timeout=self.shutdown_timeout)
+        self._runner = None
+        if self._in_flight:
+            _, unfinished = await asyncio.wait(
+                self._in_flight.keys(), timeout=self.shutdown_timeout
+            )
+            if unfinished:
+                abandoned = [
+                    entry_id
+                    for task in unfinished
+                    for entry_id in self._in_flight[task]
+                ]
+                for task in unfinished:
+                    task.cancel()
+                logger.warning(
+                    f"Abandoned {len(abandoned)} outbox entries still being "
+                    f"delivered at shutdown, retried after their lease: {abandoned}"
+                )
+        logger.info("Outbox worker stopped")
+
+    def wake(self) -> None:
+        """Check for due rows now instead of at the next poll."""
+        self._wakeup.set()
+
+    def backoff(self, attempts: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                free = self.concurrency - len(self._in_flight)
+                claimed = await self._claim(free) if free > 0 else []
+                for batch in claimed:
+                    task = asyncio.create_task(self._process(batch))
+                    self._in_flight[task] = [entry.id for entry in batch]
+                    task.add_done_callback(self._on_done)
+                if asyncio.get_running_loop().time() >= self._metrics_due:
+                    await self.update_metrics()
+                    await self.prune()
+                    self._metrics_due = (
+                        asyncio.get_running_loop().time() + self.poll_interval
+                    )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Outbox worker error: {e}", exc_info=True)
+                claimed = []
+
+            # Deliveries can all finish while metrics are updated, and
+            # asyncio.wait() rejects an empty set.
+            if claimed and len(claimed) == free and self._in_flight:
+                # Likely more due rows; poll again once a slot frees up.
+                await asyncio.wait(
+                    self._in_flight.keys(), return_when=asyncio.FIRST_COMPLETED
+                )
+                continue
+            # asyncio.timeout rather than wait_for: on Python 3.11, wait_for
+            # can swallow a cancellation that races the wakeup.
+            try:
+                async with asyncio.timeout(self.poll_interval):
+                    await self._wakeup.wait()
+            except TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def _on_done(self, task: asyncio.Task) -> None:
+        self._in_flight.pop(task, None)
+        self._wakeup.set()
+
+    async def _claim(self, limit: int) -> list[list[ToolhubOutbox]]:
+        """Claim due rows for up to `limit` (tool, user) batches."""
+        now = timezone.now()
+        due_rows = (
+            await ToolhubOutbox.filter(
+                status=OutboxStatus.PENDING, next_attempt_at__lte=now
+            )
+            .order_by("next_attempt_at", "id")
+            .limit(limit * self.max_batch)
+            .values("id", "tool_name", "user_id", "isolated")
+        )
+        batches: dict[tuple, list[int]] = {}
+        for row in due_rows:
+            key = (row["tool_name"], row["user_id"])
+            if row["isolated"]:
+                key = (*key, row["id"])
+            if key not in batches and len(batches) >= limit:
+                continue
+            ids = batches.setdefault(key, [])
+            if len(ids) < self.max_batch:
+                ids.append(row["id"])
+        if not batches:
+            return []
+
+        # The lease timestamp doubles as a claim token: only rows still
+        # carrying it after the UPDATE were claimed by this worker.
+        lease_until = now + timedelta(seconds=self.lease_seconds)
+        due_ids = [entry_id for ids in batches.values() for entry_id in ids]
+        updated = await ToolhubOutbox.filter(
+            id__in=due_ids, status=OutboxStatus.PENDING, next_attempt_at__lte=now
+        ).update(next_attempt_at=lease_until, attempts=F("attempts") + 1)
+        if not updated:
+            return []
+        claimed = await ToolhubOutbox.filter(
+            id__in=due_ids, next_attempt_at=lease_until
+        ).order_by("id")
+
+        grouped: dict[tuple, list[ToolhubOutbox]] = {}
+        for entry in claimed:
+            key = (entry.tool_name, entry.user_id)
+            if entry.isolated:
+                key = (*key, entry.id)
+            grouped.setdefault(key, []).append(entry)
+        return list(grouped.values())
+
+    async def _process(self, batch: list[ToolhubOutbox]) -> None:
+        ids = [entry.id for entry in batch]
+        tool_name = batch[0].tool_name
+        attempts = max(entry.attempts for entry in batch)
+        try:
+            await self.deliver(batch)
+        except Exception as e:
+            error = e.detail if isinstance(e, HTTPException) else str(e)
+            if is_permanent_failure(e) and len(batch) > 1:
+                # Any one value may be the bad one; find it by sending each
+                # row alone, right away.
+                await ToolhubOutbox.filter(id__in=ids).update(
+                    isolated=True,
+                    next_attempt_at=timezone.now(),
+                    last_error=str(error),
+                )
+                outbox_deliveries.labels("split").inc()
+                logger.warning(
+                    f"Merged PUT of outbox entries {ids} for tool {tool_name} "
+                    f"was rejected, retrying them one by one: {error}"
+                )
+            elif is_permanent_failure(e) or attempts >= self.max_attempts:
+                await ToolhubOutbox.filter(id__in=ids).update(
+                    status=OutboxStatus.DEAD, last_error=str(error)
+                )
+                outbox_deliveries.labels("dead").inc()
+                logger.error(
+                    f"Outbox entries {ids} for tool {tool_name} moved to "
+                    f"dead letter after {attempts} attempts: {error}"
+                )
+            else:
+                delay = self.backoff(attempts)
+                await ToolhubOutbox.filter(id__in=ids).update(
+                    next_attempt_at=timezone.now() + timedelta(seconds=delay),
+                    last_error=str(error),
+                )
+                outbox_deliveries.labels("retry").inc()
+                logger.warning(
+                    f"Outbox entries {ids} for tool {tool_name} failed "
+                    f"(attempt {attempts}), retrying in {delay:.0f}s: {error}"
+                )
+            return
+
+        await ToolhubOutbox.filter(id__in=ids).update(
+            status=OutboxStatus.DONE, last_error=None
+        )
+        outbox_deliveries.labels("success").inc()
+        outbox_coalesced.inc(len(batch) - 1)
+
+    async def prune(self) -> int:
+        """
+        Delete up to PRUNE_BATCH_SIZE delivered rows older than the retention.
+        A delivered row's next_attempt_at is the end of its last lease, which
+        stands in for the delivery time and is covered by the status index.
+        """
+        cutoff = timezone.now() - timedelta(seconds=self.done_retention)
+        ids = (
+            await ToolhubOutbox.filter(
+                status=OutboxStatus.DONE, next_attempt_at__lt=cutoff
+            )
+            .limit(PRUNE_BATCH_SIZE)
+            .values_list("id", flat=True)
+        )
+        if not ids:
+            return 0
+        deleted = await ToolhubOutbox.filter(id__in=ids).delete()
+        logger.info(f"Pruned {deleted} delivered outbox entries")
+        return deleted
+
+    async def update_metrics(self) -> None:
+        counts = (
+            await ToolhubOutbox.annotate(count=Count("id"))
+            .group_by("status")
+            .values("status", "count")
+        )
+        by_status = {row["status"]: row["count"] for row in counts}
+        for status in OutboxStatus:
+            outbox_depth.labels(status.value).set(
+                by_status.get(status, by_status.get(status.value, 0))
+            )
+
+        oldest = (
+            await ToolhubOutbox.filter(status=OutboxStatus.PENDING)
+            .annotate(oldest=Min("created_at"))
+            .values_list("oldest", flat=True)
+        )
+        if oldest and oldest[0] is not None:
+            lag = (timezone.now() - oldest[0]).total_seconds()
+            outbox_lag_seconds.set(max(0.0, lag))
+        else:
+            outbox_lag_seconds.set(0)
@@ -0,0 +1,213 @@
+"""
+Routes the reads of read-only endpoints to a MariaDB read replica.
+
+With DATABASE_REPLICA_URL set, TORTOISE_ORM gets a "replica" connection and
+ReplicaRouter. Reads go to the replica only inside endpoints wrapped with
+read_only(), outside transactions, and while ReplicaMonitor reports the
+replica within REPLICA_MAX_LAG_SECONDS. Everything else, and every write,
+uses the primary.
+
+A client that just wrote sticks to the primary for REPLICA_STICKY_SECONDS,
+so it reads its own writes: ReplicaStickinessMiddleware sets a short-lived
+cookie on successful writes and pins requests carrying it to the primary.
+"""
+
+import asyncio
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.cookies import SimpleCookie
+from typing import Iterator
+
+from tortoise import connections
+from tortoise.backends.base.client import BaseTransactionWrapper
+
+from backend.config import get_settings
+from backend.metrics import Counter, Gauge
+from backend.utils import get_logger
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+REPLICA_CONNECTION = "replica"
+STICKY_COOKIE = "toolhunt_primary"
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+replica_lag_seconds = Gauge(
+    "toolhunt_replica_lag_seconds",
+    "Replication lag of the read replica, -1 while unknown or broken.",
+)
+replica_routed_reads = Counter(
+    "toolhunt_replica_routed_reads_total",
+    "Reads in read-only endpoints by the connection they went to.",
+    labelnames=("connection",),
+)
+
+_read_only: ContextVar[bool] = ContextVar("read_only", default=False)
+_pinned_to_primary: ContextVar[bool] = ContextVar("pinned_to_primary", default=False)
+
+
+@contextmanager
+def use_replica() -> Iterator[None]:
+    """Let the reads in this block go to the replica when it is usable."""
+    token = _read_only.set(True)
+    try:
+        yield
+    finally:
+        _read_only.reset(token)
+
+
+def read_only(endpoint):
+    """Mark an endpoint as read-only, so its queries may use the replica."""
+
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        with use_replica():
+            return await endpoint(*args, **kwargs)
+
+    return wrapper
+
+
+class ReplicaMonitor:
+    """
+    Polls the replica's lag every `interval` seconds. The replica is usable
+    while its lag is known and at most `max_lag` seconds; until the first
+    check, or after a failed one, reads stay on the primary.
+    """
+
+    def __init__(
+        self,
+        connection_name: str = REPLICA_CONNECTION,
+        max_lag: float = 5.0,
+        interval: float = 5.0,
+    ):
+        self.connection_name = connection_name
+        self.max_lag = max_lag
+        self.interval = interval
+        self.lag: float | None = None
+        self._runner: asyncio.Task | None = None
+
+    @classmethod
+    def from_settings(cls, settings) -> "ReplicaMonitor":
+        return cls(
+            max_lag=settings.REPLICA_MAX_LAG_SECONDS,
+            interval=settings.REPLICA_LAG_CHECK_INTERVAL_SECONDS,
+        )
+
+    @property
+    def usable(self) -> bool:
+        return self.lag is not None and self.lag <= self.max_lag
+
+    def start(self) -> None:
+        if self._runner is None:
+            self._runner = asyncio.create_task(self._run())
+            logger.info(f"Replica monitor started with max lag {self.max_lag}s")
+
+    async def stop(self) -> None:
+        if self._runner is None:
+            return
+        self._runner.cancel()
+        try:
+            await self._runner
+        except asyncio.CancelledError:
+            pass
+        self._runner = None
+
+    async def check(self) -> float | None:
+        """
+        Read the replica's lag in seconds, or None if replication is broken.
+        A server that isn't replicating is never behind. Needs the
+        REPLICA MONITOR (or REPLICATION CLIENT) privilege on MariaDB.
+        """
+        client = connections.get(self.connection_name)
+        if client.capabilities.dialect != "mysql":
+            return 0.0
+        rows = await client.execute_query_dict("SHOW SLAVE STATUS")
+        if not rows:
+            return 0.0
+        lag = rows[0].get("Seconds_Behind_Master")
+        return None if lag is None else float(lag)
+
+    async def _run(self) -> None:
+        while True:
+            was_usable = self.usable
+            try:
+                self.lag = await self.check()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Replica lag check failed: {e}")
+                self.lag = None
+            replica_lag_seconds.set(-1 if self.lag is None else self.lag)
+            if was_usable and not self.usable:
+                logger.warning(f"Replica lag is {self.lag}s, reading from the primary")
+            elif self.usable and not was_usable:
+                logger.info(f"Replica lag is {self.lag}s, reading from the replica")
+            await asyncio.sleep(self.interval)
+
+
+replica_monitor = ReplicaMonitor.from_settings(settings)
+
+
+class ReplicaRouter:
+    """Tortoise router sending allowed reads to the replica."""
+
+    def db_for_read(self, model) -> str | None:
+        if not _read_only.get():
+            return None
+        connection_name = model._meta.default_connection
+        # Reads in a transaction must see its writes.
+        in_transaction = isinstance(
+            connections.get(connection_name), BaseTransactionWrapper
+        )
+        if _pinned_to_primary.get() or in_transaction or not replica_monitor.usable:
+            replica_routed_reads.labels("primary").inc()
+            return None
+        replica_routed_reads.labels(REPLICA_CONNECTION).inc()
+        return REPLICA_CONNECTION
+
+    def db_for_write(self, model) -> str | None:
+        return None
+
+
+class ReplicaStickinessMiddleware:
+    """
+    Pins requests to the primary for `sticky_seconds` after the client's
+    last successful write, so read-only endpoints show it its own writes.
+    """
+
+    def __init__(self, app, sticky_seconds: float = 30.0):
+        self.app = app
+        self.cookie = (
+            f"{STICKY_COOKIE}=1; Max-Age={int(sticky_seconds)}; Path=/; "
+            "HttpOnly; SameSite=Lax"
+        ).encode("latin-1")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        cookie_header = dict(scope["headers"]).get(b"cookie")
+        pinned = bool(
+            cookie_header
+            and STICKY_COOKIE in SimpleCookie(cookie_header.decode("latin-1"))
+        )
+        writes = scope["method"] not in SAFE_METHODS
+
+        async def send_with_cookie(message):
+            if (
+                writes
+                and message["type"] == "http.response.start"
+                and message["status"] < 400
+            ):
+                headers = list(message.get("headers", []))
+                headers.append((b"set-cookie", self.cookie))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = _pinned_to_primary.set(pinned)
+        try:
+            await self.app(scope, receive, send_with_cookie)
+        finally:
+            _pinned_to_primary.reset(token)
@@ -13,13 +13,14 @@ from jose import jwt
 from backend.config import get_settings
 from backend.exceptions import InvalidStateError, InvalidToken, OAuthError
 from backend.models.pydantic import Token
-from backend.utils import get_logger
+from backend.utils import ToolhubClient, get_logger
 
 logger = get_logger(__name__)
 
 ALGORITHM = "HS256"
 settings = get_settings()
 fernet = Fernet(settings.ENCRYPTION_KEY)
+toolhub_client = ToolhubClient(settings.TOOLHUB_API_BASE_URL)
 
 
 # JWT Access Token functions
@@ -63,19 +64,16 @@ async def validate_oauth_state(request: Request, received_state: str) -> None:
 
 async def exchange_code_for_token(code: str) -> Dict[str, str]:
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                settings.TOOLHUB_TOKEN_URL,
-                data={
-                    "grant_type": "authorization_code",
-                    "code": code,
-                    "redirect_uri": settings.REDIRECT_URI,
-                    "client_id": settings.CLIENT_ID,
-                    "client_secret": settings.CLIENT_SECRET,
-                },
-            )
-        response.raise_for_status()
-        return response.json()
+        return await toolhub_client.post_token(
+            settings.TOOLHUB_TOKEN_URL,
+            data={
+                "grant_type": "authorization_code",
+                "code": code,
+                "redirect_uri": settings.REDIRECT_URI,
+                "client_id": settings.CLIENT_ID,
+                "client_secret": settings.CLIENT_SECRET,
+            },
+        )
     except httpx.HTTPError as e:
         logger.error(f"OAuth token exchange error: {str(e)}")
         raise OAuthError("Failed to exchange code for token")
@@ -108,18 +106,16 @@ def get_and_clear_redirect_url(request: Request) -> str:
 
 async def refresh_access_token(refresh_token: str) -> Token:
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                settings.TOOLHUB_TOKEN_URL,
-                data={
-                    "grant_type": "refresh_token",
-                    "refresh_token": refresh_token,
-                    "client_id": settings.CLIENT_ID,
-                    "client_secret": settings.CLIENT_SECRET,
-                },
-            )
-        response.raise_for_status()
-        return Token(**response.json())
+        token_response = await toolhub_client.post_token(
+            settings.TOOLHUB_TOKEN_URL,
+            data={
+                "grant_type": "refresh_token",
+                "refresh_token": refresh_token,
+                "client_id": settings.CLIENT_ID,
+                "client_secret": settings.CLIENT_SECRET,
+            },
+        )
+        return Token(**token_response)
     except httpx.HTTPError as e:
         logger.error(f"OAuth token refresh error: {str(e)}")
         raise OAuthError("Failed to refresh access token")
@@ -0,0 +1,834 @@
+"""
+Updates the tool and task tables from the Toolhub tool list.
+
+Pages are fetched, cleaned and written by three concurrent stages joined by
+bounded queues. Each batch of tools is diffed against stored fingerprints,
+so only new and changed tools and their new tasks are written. Tools and
+tasks missing from the data are deleted once every page has been seen.
+
+run_sync() runs one update. run_incremental_sync() re-evaluates only the
+tools in Toolhub's recent changes feed, for cheap updates between full ones.
+SyncScheduler runs both periodically inside the app, holding a database lock
+so only one process syncs at a time. scripts/update_db.py runs them from the
+command line.
+"""
+
+import asyncio
+import datetime
+import hashlib
+import json
+import os
+import random
+import time
+from contextlib import aclosing, contextmanager
+from dataclasses import asdict, dataclass, field
+
+import httpx
+from tortoise.transactions import in_transaction
+
+from backend.bulk import batched, bulk_insert, bulk_upsert
+from backend.config import get_settings
+from backend.db import advisory_lock
+from backend.instrumentation import current_stats, track_queries
+from backend.metrics import Counter, Histogram
+from backend.models.tortoise import (
+    OutboxStatus,
+    SyncState,
+    Task,
+    Tool,
+    ToolhubOutbox,
+)
+from backend.utils import Priority, ToolhubClient, get_logger, toolhub_response_bytes
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+sync_stage_seconds = Histogram(
+    "toolhunt_sync_stage_duration_seconds",
+    "Duration of database update stages.",
+    labelnames=("stage",),
+    buckets=(0.1, 0.5, 1, 5, 15, 30, 60, 120, 300, 600, 1800),
+)
+sync_runs = Counter(
+    "toolhunt_sync_runs_total",
+    "Database updates by trigger and result.",
+    labelnames=("trigger", "result"),
+)
+
+tool_resyncs = Counter(
+    "toolhunt_tool_resyncs_total",
+    "Single-tool resyncs after a submission, by result.",
+    labelnames=("result",),
+)
+
+recent_changes_unnamed = Counter(
+    "toolhunt_recent_changes_unnamed_total",
+    "Tool and annotation edits in the recent changes feed without a tool name.",
+)
+
+# sync_state key of the newest recent change an incremental sync has applied
+HIGH_WATER_MARK_KEY = "recent_changes_id"
+# Recent changes target types that edit a tool
+TOOL_CHANGE_TYPES = ("tool", "annotations")
+
+
+@dataclass
+class ToolhuntTool:
+    name: str
+    title: str
+    description: str
+    url: str
+    missing_annotations: set[str]
+    deprecated: bool
+    experimental: bool
+
+    @property
+    def is_completed(self):
+        return len(self.missing_annotations) == 0
+
+    @property
+    def fingerprint(self):
+        """A hash of everything a sync writes for this tool and its tasks."""
+        content = json.dumps(
+            [
+                self.title,
+                self.description,
+                self.url,
+                self.deprecated,
+                self.experimental,
+                sorted(self.missing_annotations),
+            ]
+        )
+        return hashlib.blake2b(content.encode(), digest_size=16).hexdigest()
+
+
+def is_deprecated(tool):
+    return tool["annotations"]["deprecated"] is True or tool["deprecated"] is True
+
+
+def is_experimental(tool):
+    return tool["annotations"]["experimental"] is True or tool["experimental"] is True
+
+
+def get_missing_annotations(tool_info, filter_by=settings.active_annotations):
+    missing = set()
+
+    for k, v in tool_info["annotations"].items():
+        value = v or tool_info.get(k, v)
+        if value in (None, [], "") and k in filter_by:
+            missing.add(k)
+
+    return missing
+
+
+def clean_tool_data(tool_data):
+    tools = []
+    for tool in tool_data:
+        missing_annotations = get_missing_annotations(tool)
+        t = ToolhuntTool(
+            name=tool["name"],
+            title=tool["title"],
+            description=tool["description"],
+            url=tool["url"],
+            missing_annotations=missing_annotations,
+            deprecated=is_deprecated(tool),
+            experimental=is_experimental(tool),
+        )
+        if not t.deprecated and not t.experimental and missing_annotations:
+            tools.append(t)
+        else:
+            logger.info(
+                f"Tool {t.name} is deprecated:{t.deprecated}, experimental:{t.experimental}, has {len(t.missing_annotations)} missing annotations. It will not be added to the database."
+            )
+    return tools
+
+
+@dataclass
+class TableChanges:
+    inserted: int = 0
+    updated: int = 0
+    deleted: int = 0
+    unchanged: int = 0
+
+    def __str__(self):
+        return (
+            f"{self.inserted} inserted, {self.updated} updated, "
+            f"{self.deleted} deleted, {self.unchanged} unchanged"
+        )
+
+
+def current_rss_bytes() -> int:
+    """The process's resident set size now, or 0 where /proc isn't available."""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return 0
+    return resident_pages * os.sysconf("SC_PAGE_SIZE")
+
+
+@dataclass
+class PhaseStats:
+    seconds: float = 0.0
+    statements: int = 0
+
+
+@dataclass
+class SyncReport:
+    """What a database update did and what it cost, phase by phase."""
+
+    dry_run: bool = False
+    phases: dict[str, PhaseStats] = field(default_factory=dict)
+    tools: TableChanges = field(default_factory=TableChanges)
+    tasks: TableChanges = field(default_factory=TableChanges)
+    statements: int = 0
+    database_seconds: float = 0.0
+    toolhub_pages: int = 0
+    toolhub_bytes: int = 0
+    # Highest resident set size sampled as phases start and end during the
+    # run; the process's lifetime peak would include everything before it.
+    peak_rss_bytes: int = 0
+
+    @contextmanager
+    def phase(self, name, count_statements=True):
+        """
+        Adds the time spent in the block, and the statements issued, to a phase.
+        Statements are counted for the whole run, so phases that run alongside
+        the load stage must not count them.
+        """
+        stats = current_stats() if count_statements else None
+        statements = stats.count if stats else 0
+        self.sample_rss()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            phase = self.phases.setdefault(name, PhaseStats())
+            phase.seconds += time.perf_counter() - start
+            if stats:
+                phase.statements += stats.count - statements
+            self.sample_rss()
+
+    def sample_rss(self):
+        self.peak_rss_bytes = max(self.peak_rss_bytes, current_rss_bytes())
+
+    def finish(self, stats):
+        self.statements = stats.count
+        self.database_seconds = stats.seconds
+        for name, phase in self.phases.items():
+            sync_stage_seconds.labels(name).observe(phase.seconds)
+            logger.info(
+                f"Phase {name} took {phase.seconds:.2f}s, "
+                f"{phase.statements} statements"
+            )
+
+    def as_dict(self):
+        report = asdict(self)
+        for phase in report["phases"].values():
+            phase["seconds"] = round(phase["seconds"], 3)
+        report["database_seconds"] = round(self.database_seconds, 3)
+        return report
+
+
+async def remove_stale_tools(names):
+    """
+    Deletes tools and their tasks, SYNC_BATCH_SIZE tools per transaction, and
+    logs each batch once it is deleted.
+    """
+    for chunk in batched(names, settings.SYNC_BATCH_SIZE):
+        async with in_transaction("default"):
+            await Task.filter(tool_id__in=chunk).delete()
+            await Tool.filter(name__in=chunk).delete()
+        for name in chunk:
+            logger.info(f"Removed tool: name={name}")
+
+
+async def remove_stale_tasks(stale_tasks):
+    """
+    Deletes tasks given as {(tool_name, field): id}, SYNC_BATCH_SIZE at a time,
+    and logs each batch once it is deleted.
+    """
+    for chunk in batched(sorted(stale_tasks), settings.SYNC_BATCH_SIZE):
+        await Task.filter(id__in=[stale_tasks[key] for key in chunk]).delete()
+        for tool_name, field_name in chunk:
+            logger.info(f"Removed task: tool_name={tool_name}, field={field_name}")
+
+
+class SyncLoader:
+    """
+    Diffs batches of cleaned tools against the database and writes only the
+    changes. Stale tools and tasks, the ones no batch mentioned, are deleted
+    by finish(). With dry_run, the diff is counted but nothing is written.
+    """
+
+    def __init__(self, report=None):
+        self.report = report or SyncReport()
+        self.dry_run = self.report.dry_run
+        self.tools = self.report.tools
+        self.tasks = self.report.tasks
+        self.seen_tools = set()
+        self.desired_tasks = set()
+
+    async def prepare(self, names=None):
+        """
+        Reads the stored fingerprints and task keys, one query each. With
+        `names`, only those tools are diffed, and only they can go stale.
+
+        Also reads the fields of submissions still waiting in the outbox.
+        Toolhub shows them as missing until they are delivered, so no task is
+        added for them meanwhile; otherwise users would be served a task that
+        was already done.
+        """
+        tools, tasks = Tool.all(), Task.all()
+        pending = ToolhubOutbox.filter(status=OutboxStatus.PENDING)
+        if names is not None:
+            tools, tasks = tools.filter(name__in=names), tasks.filter(tool_id__in=names)
+            pending = pending.filter(tool_name__in=names)
+        with self.report.phase("prepare"):
+            self.pending_submissions = {
+                (tool_name, field_name)
+                for tool_name, payload in await pending.values_list(
+                    "tool_name", "payload"
+                )
+                for field_name in payload.keys() - {"comment"}
+            }
+            self.stored = dict(await tools.values_list("name", "fingerprint"))
+            self.existing_tasks = {
+                (tool_id, field_name): task_id
+                for task_id, tool_id, field_name in await tasks.values_list(
+                    "id", "tool_id", "field"
+                )
+            }
+
+    async def write(self, tools):
+        """Writes the new and changed tools in a batch, then their new tasks."""
+        now = datetime.datetime.now(datetime.timezone.utc)
+        with self.report.phase("tools"):
+            changed = []
+            for tool in tools:
+                self.seen_tools.add(tool.name)
+                if tool.name not in self.stored:
+                    self.tools.inserted += 1
+                elif self.stored[tool.name] != tool.fingerprint:
+                    self.tools.updated += 1
+                else:
+                    self.tools.unchanged += 1
+                    continue
+                changed.append(tool)
+
+            if not self.dry_run:
+                await bulk_upsert(
+                    Tool,
+                    [
+                        "name",
+                        "title",
+                        "description",
+                        "url",
+                        "fingerprint",
+                        "last_updated",
+                        "deprecated",
+                        "experimental",
+                    ],
+                    (
+                        (
+                            t.name,
+                            t.title,
+                            t.description,
+                            t.url,
+                            t.fingerprint,
+                            now,
+                            False,
+                            False,
+                        )
+                        for t in changed
+                    ),
+                    conflict=["name"],
+                    update=[
+                        "title",
+                        "description",
+                        "url",
+                        "fingerprint",
+                        "last_updated",
+                    ],
+                    batch_size=settings.SYNC_BATCH_SIZE,
+                )
+
+        with self.report.phase("tasks"):
+            new_tasks = []
+            for tool in tools:
+                for field_name in sorted(tool.missing_annotations):
+                    key = (tool.name, field_name)
+                    self.desired_tasks.add(key)
+                    if (
+                        key not in self.existing_tasks
+                        and key not in self.pending_submissions
+                    ):
+                        new_tasks.append(key)
+            if not self.dry_run:
+                await bulk_insert(
+                    Task,
+                    ["tool_id", "field", "times_attempted", "last_updated"],
+                    (
+                        (tool_name, field_name, 0, now)
+                        for tool_name, field_name in new_tasks
+                    ),
+                    batch_size=settings.SYNC_BATCH_SIZE,
+                    ignore_conflicts=True,
+                )
+            self.tasks.inserted += len(new_tasks)
+
+    async def finish(self):
+        """Deletes the tools and tasks that are not in this sync's data."""
+        with self.report.phase("delete"):
+            stale_tasks = {
+                key: task_id
+                for key, task_id in self.existing_tasks.items()
+                if key not in self.desired_tasks
+            }
+            stale_tools = sorted(self.stored.keys() - self.seen_tools)
+            if not self.dry_run:
+                await remove_stale_tasks(stale_tasks)
+                await remove_stale_tools(stale_tools)
+        self.tasks.deleted = len(stale_tasks)
+        self.tasks.unchanged = len(self.existing_tasks) - len(stale_tasks)
+        self.tools.deleted = len(stale_tools)
+        prefix = "Dry run, would have changed" if self.dry_run else "Changed"
+        logger.info(f"{prefix} tools: {self.tools}")
+        logger.info(f"{prefix} tasks: {self.tasks}")
+
+
+async def load_tools(tools):
+    """Diffs a complete list of cleaned tools against the database and applies it."""
+    loader = SyncLoader()
+    await loader.prepare()
+    for batch in batched(tools, settings.SYNC_BATCH_SIZE):
+        await loader.write(batch)
+    await loader.finish()
+    return loader
+
+
+async def list_pages(tool_data):
+    """Yields a list of raw tools in pages, like ToolhubClient.iter_pages."""
+    for page in batched(tool_data, settings.SYNC_BATCH_SIZE):
+        yield page
+
+
+async def run_stages(pages, loader):
+    """
+    Runs extract, transform and load concurrently, connected by queues of at
+    most SYNC_QUEUE_SIZE pages. A slow stage makes the ones before it wait,
+    so memory stays bounded and the sync takes about as long as its slowest
+    stage. Stale rows are only deleted once every stage has finished.
+    """
+    report = loader.report
+    raw_pages = asyncio.Queue(maxsize=settings.SYNC_QUEUE_SIZE)
+    clean_pages = asyncio.Queue(maxsize=settings.SYNC_QUEUE_SIZE)
+
+    async def extract():
+        pages_iter = aiter(pages)
+        while True:
+            with report.phase("extract", count_statements=False):
+                page = await anext(pages_iter, None)
+            await raw_pages.put(page)
+            if page is None:
+                break
+            report.toolhub_pages += 1
+
+    async def transform():
+        while (page := await raw_pages.get()) is not None:
+            with report.phase("transform", count_statements=False):
+                tools = clean_tool_data(page)
+            await clean_pages.put(tools)
+        await clean_pages.put(None)
+
+    async def load():
+        await loader.prepare()
+        batch = []
+        while (tools := await clean_pages.get()) is not None:
+            batch.extend(tools)
+            while len(batch) >= settings.SYNC_BATCH_SIZE:
+                await loader.write(batch[: settings.SYNC_BATCH_SIZE])
+                batch = batch[settings.SYNC_BATCH_SIZE :]
+        if batch:
+            await loader.write(batch)
+
+    # A failing stage cancels the others, before anything is deleted.
+    async with asyncio.TaskGroup() as stages:
+        stages.create_task(extract())
+        stages.create_task(transform())
+        stages.create_task(load())
+    await loader.finish()
+
+
+async def run_sync(pages, report=None):
+    """
+    Diffs the raw tools in `pages`, an async iterable of lists, against the
+    database and applies the changes. Returns the run report.
+    """
+    report = report or SyncReport()
+    received = toolhub_response_bytes.labels("get_all")
+    bytes_before = received.value
+    with track_queries("sync", settings.N_PLUS_ONE_THRESHOLD) as stats:
+        with report.phase("total"):
+            await run_stages(pages, SyncLoader(report))
+    report.toolhub_bytes = int(received.value - bytes_before)
+    report.finish(stats)
+    logger.info(f"Run report: {json.dumps(report.as_dict())}")
+    return report
+
+
+async def reconcile_tools(names, raw_tools, report=None):
+    """
+    Brings a few tools and their tasks in line with fresh Toolhub records, in
+    one transaction. Names without a usable record in `raw_tools` (gone,
+    deprecated, experimental or complete) are removed with their tasks.
+    """
+    loader = SyncLoader(report)
+    async with in_transaction("default"):
+        await loader.prepare(names)
+        await loader.write(clean_tool_data(raw_tools))
+        await loader.finish()
+    return loader.report
+
+
+async def fetch_tools(toolhub_client, names, concurrency, priority=Priority.BULK):
+    """Fetch the current Toolhub records of `names`, skipping deleted tools."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(name):
+        async with semaphore:
+            try:
+                return await toolhub_client.get(name, priority)
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code == 404:
+                    return []
+                raise
+
+    results = await asyncio.gather(*(fetch(name) for name in names))
+    return [tool for result in results for tool in result]
+
+
+def changed_tool_name(change):
+    """
+    The tool a recent changes entry touched, or None for other content. Tool
+    and annotation edits both target the tool by name.
+    """
+    target = change.get("target") or {}
+    if target.get("type") in TOOL_CHANGE_TYPES:
+        return target.get("name")
+    return None
+
+
+def is_tool_change(change):
+    return (change.get("target") or {}).get("type") in TOOL_CHANGE_TYPES
+
+
+async def read_recent_changes(toolhub_client, high_water_mark, report):
+    """
+    Returns the names of the tools changed after `high_water_mark` and the
+    newest change id, 0 for an empty feed. The feed is newest first, so
+    paging stops at the mark. On the first run, without a mark, only the
+    first page is read.
+
+    Tool edits without a tool name mean the feed's shape isn't the one
+    changed_tool_name() expects. They are logged and counted, and if a page
+    held some but yielded no names, the mark is kept where it was, so the
+    changes aren't skipped for good.
+    """
+    names = set()
+    newest = None
+    hold_mark = False
+    pages = toolhub_client.iter_recent_changes(settings.SYNC_PAGE_SIZE)
+    async with aclosing(pages):
+        async for page in pages:
+            report.toolhub_pages += 1
+            if newest is None and page:
+                newest = page[0]["id"]
+            changes = [
+                change
+                for change in page
+                if high_water_mark is None or change["id"] > high_water_mark
+            ]
+            page_names = set()
+            unnamed = []
+            for change in changes:
+                if name := changed_tool_name(change):
+                    page_names.add(name)
+                elif is_tool_change(change):
+                    unnamed.append(change)
+            if unnamed:
+                recent_changes_unnamed.inc(len(unnamed))
+                logger.warning(
+                    f"{len(unnamed)} tool edits in the recent changes feed have "
+                    f"no tool name, e.g. change {unnamed[0].get('id')} with target "
+                    f"{unnamed[0].get('target')}"
+                )
+                hold_mark = hold_mark or not page_names
+            if high_water_mark is None:
+                break
+            names |= page_names
+            if len(changes) < len(page):
+                break
+    if hold_mark:
+        logger.warning(
+            f"Keeping the recent changes high-water mark at {high_water_mark}"
+        )
+        return names, high_water_mark
+    return names, newest if newest is not None else high_water_mark or 0
+
+
+async def run_incremental_sync(toolhub_client, report=None):
+    """
+    Re-evaluates only the tools edited on Toolhub since the last run, found
+    in the recent changes feed down to the high-water mark kept in
+    sync_state. The first run only records the mark, since the last full
+    sync covers what came before. The mark moves once the changes are
+    applied, so a failed run is retried from the same point.
+    """
+    report = report or SyncReport()
+    state = await SyncState.get_or_none(key=HIGH_WATER_MARK_KEY)
+    high_water_mark = int(state.value) if state else None
+    received = [
+        toolhub_response_bytes.labels(operation)
+        for operation in ("get_recent_changes", "get")
+    ]
+    bytes_before = sum(counter.value for counter in received)
+    with track_queries("incremental_sync", settings.N_PLUS_ONE_THRESHOLD) as stats:
+        with report.phase("total"):
+            with report.phase("extract", count_statements=False):
+                names, newest = await read_recent_changes(
+                    toolhub_client, high_water_mark, report
+                )
+                names = sorted(names)
+                raw_tools = await fetch_tools(
+                    toolhub_client, names, settings.SYNC_INCREMENTAL_CONCURRENCY
+                )
+            if names:
+                await reconcile_tools(names, raw_tools, report)
+            if newest != high_water_mark and not report.dry_run:
+                await SyncState.update_or_create(
+                    defaults={"value": str(newest)}, key=HIGH_WATER_MARK_KEY
+                )
+    report.toolhub_bytes = int(
+        sum(counter.value for counter in received) - bytes_before
+    )
+    report.finish(stats)
+    if high_water_mark is None:
+        if newest is not None:
+            logger.info(f"Incremental sync starts after recent change {newest}")
+    else:
+        logger.info(
+            f"Incremental sync re-evaluated {len(names)} tools changed after "
+            f"recent change {high_water_mark}"
+        )
+    logger.info(f"Run report: {json.dumps(report.as_dict())}")
+    return report
+
+
+class ToolResyncer:
+    """
+    Re-evaluates a tool's tasks shortly after a submission to it lands on
+    Toolhub, which may have filled in related fields, or another editor may
+    have. Resyncs are debounced per tool: one waits `delay` seconds and
+    covers every submission to the tool made meanwhile. A delay of 0
+    disables them.
+    """
+
+    def __init__(self, toolhub_client: ToolhubClient, delay: float = 30.0):
+        self.toolhub_client = toolhub_client
+        self.delay = delay
+        self._pending: dict[str, asyncio.Task] = {}
+
+    @classmethod
+    def from_settings(cls, toolhub_client, settings) -> "ToolResyncer":
+        return cls(toolhub_client, delay=settings.SYNC_TOOL_RESYNC_DELAY_SECONDS)
+
+    def schedule(self, tool_name: str) -> None:
+        if self.delay <= 0 or tool_name in self._pending:
+            return
+        self._pending[tool_name] = asyncio.create_task(self._resync_later(tool_name))
+
+    async def stop(self) -> None:
+        """Cancel the resyncs that haven't run yet."""
+        pending = list(self._pending.values())
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.wait(pending)
+        self._pending.clear()
+
+    async def resync(self, tool_name: str) -> SyncReport:
+        raw_tools = await fetch_tools(
+            self.toolhub_client, [tool_name], 1, Priority.BACKGROUND
+        )
+        return await reconcile_tools([tool_name], raw_tools)
+
+    async def _resync_later(self, tool_name: str) -> None:
+        await asyncio.sleep(self.delay)
+        # Submissions from here on need a fetch of their own.
+        del self._pending[tool_name]
+        try:
+            report = await self.resync(tool_name)
+        except Exception as e:
+            tool_resyncs.labels("failed").inc()
+            logger.error(f"Resync of tool {tool_name} failed: {e}", exc_info=True)
+            return
+        tool_resyncs.labels("finished").inc()
+        logger.info(f"Resynced tool {tool_name}, tasks: {report.tasks}")
+
+
+@dataclass
+class SyncRun:
+    task: asyncio.Task
+    report: SyncReport
+
+
+class SyncScheduler:
+    """
+    Runs the database update every `interval` seconds, plus up to `jitter`
+    seconds so replicas started together don't all try at once, and the
+    incremental update every `incremental_interval` seconds. A run only
+    proceeds if it gets the named database lock, so one process syncs at a
+    time. An interval of 0 disables those scheduled runs; trigger() still
+    works.
+    """
+
+    def __init__(
+        self,
+        toolhub_client: ToolhubClient,
+        interval: float = 0.0,
+        jitter: float = 300.0,
+        lock_name: str = "toolhunt_sync",
+        page_size: int | None = None,
+        progress_interval: float = 1.0,
+        incremental_interval: float = 0.0,
+    ):
+        self.toolhub_client = toolhub_client
+        self.interval = interval
+        self.jitter = jitter
+        self.lock_name = lock_name
+        self.page_size = page_size
+        self.progress_interval = progress_interval
+        self.incremental_interval = incremental_interval
+        # The report of the running or most recent sync in this process
+        self.current: SyncReport | None = None
+        self._runners: list[asyncio.Task] = []
+        self._sync: asyncio.Task | None = None
+
+    @classmethod
+    def from_settings(cls, toolhub_client, settings) -> "SyncScheduler":
+        return cls(
+            toolhub_client,
+            interval=settings.SYNC_INTERVAL_SECONDS,
+            jitter=settings.SYNC_JITTER_SECONDS,
+            lock_name=settings.SYNC_LOCK_NAME,
+            page_size=settings.SYNC_PAGE_SIZE,
+            progress_interval=settings.SYNC_PROGRESS_INTERVAL_SECONDS,
+            incremental_interval=settings.SYNC_INCREMENTAL_INTERVAL_SECONDS,
+        )
+
+    @property
+    def running(self) -> bool:
+        return self._sync is not None and not self._sync.done()
+
+    def start(self) -> None:
+        if self._runners:
+            return
+        if self.interval > 0:
+            self._runners.append(
+                asyncio.create_task(self._run(self.interval, self.jitter, False))
+            )
+            logger.info(f"Sync scheduler started with interval {self.interval}s")
+        if self.incremental_interval > 0:
+            self._runners.append(
+                asyncio.create_task(self._run(self.incremental_interval, 0, True))
+            )
+            logger.info(
+                f"Incremental sync scheduled every {self.incremental_interval}s"
+            )
+
+    async def stop(self) -> None:
+        """Stop scheduling and cancel a running sync before it deletes anything."""
+        for task in (*self._runners, self._sync):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+        self._runners = []
+
+    def trigger(
+        self, dry_run: bool = False, trigger: str = "admin", incremental: bool = False
+    ) -> "SyncRun":
+        """
+        Start a sync now. The run's task returns its report, or None if
+        another process held the lock.
+        """
+        if self.running:
+            raise RuntimeError("A sync is already running")
+        report = SyncReport(dry_run=dry_run)
+        self._sync = asyncio.create_task(
+            self._locked_sync(report, trigger, incremental)
+        )
+        return SyncRun(self._sync, report)
+
+    async def progress(self, run: "SyncRun"):
+        """
+        Yields NDJSON lines with the run's report every progress_interval
+        seconds until it ends. Closing the generator leaves the run going.
+        """
+
+        def line(state, **extra):
+            return json.dumps({"state": state, "report": run.report.as_dict(), **extra})
+
+        yield line("started") + "\n"
+        while not run.task.done():
+            await asyncio.wait({run.task}, timeout=self.progress_interval)
+            if not run.task.done():
+                yield line("running") + "\n"
+        if run.task.cancelled():
+            yield line("cancelled") + "\n"
+        elif run.task.exception() is not None:
+            yield line("failed", error=str(run.task.exception())) + "\n"
+        elif run.task.result() is None:
+            yield line("skipped") + "\n"
+        else:
+            yield line("finished") + "\n"
+
+    async def _locked_sync(
+        self, report: SyncReport, trigger: str, incremental: bool
+    ) -> SyncReport | None:
+        async with advisory_lock(self.lock_name) as acquired:
+            if not acquired:
+                logger.info(f"Skipping {trigger} sync, another process is syncing")
+                sync_runs.labels(trigger, "skipped").inc()
+                return None
+            kind = "incremental" if incremental else "full"
+            logger.info(f"Starting {trigger} {kind} sync (dry run: {report.dry_run})")
+            self.current = report
+            try:
+                if incremental:
+                    await run_incremental_sync(self.toolhub_client, report)
+                else:
+                    pages = self.toolhub_client.iter_pages(self.page_size)
+                    await run_sync(pages, report)
+            except Exception as e:
+                logger.error(f"{trigger} sync failed: {e}", exc_info=True)
+                sync_runs.labels(trigger, "failed").inc()
+                raise
+            sync_runs.labels(trigger, "finished").inc()
+            return report
+
+    async def _run(self, interval: float, jitter: float, incremental: bool) -> None:
+        while True:
+            await asyncio.sleep(interval + random.uniform(0, jitter))
+            if self.running:
+                continue
+            try:
+                await self.trigger(trigger="schedule", incremental=incremental).task
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Already logged; try again at the next interval.
+                pass
@@ -0,0 +1,169 @@
+"""
+Opt-in capture of request shapes and timings for replay.
+
+Each request is written as one compact JSON line with the route template,
+an allowlist of query parameters, the submitted field names, the status and
+the duration. Cookies, headers, path parameters and submitted values are
+never written. Sessions are reduced to a salted hash, so bursts by one user
+can be replayed without identifying them. scripts/replay_traffic.py replays
+the log.
+"""
+
+import hashlib
+import json
+import random
+import secrets
+import time
+from http.cookies import SimpleCookie
+from typing import IO
+
+from backend.utils import get_logger
+
+logger = get_logger(__name__)
+
+# Query parameters that shape the work a request does. Everything else is
+# dropped.
+CAPTURED_PARAMS = {"field_names", "tool_names", "limit", "days"}
+MAX_CAPTURED_BODY = 64 * 1024
+
+
+def _submitted_fields(body: bytes) -> dict | None:
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    if isinstance(data.get("submissions"), list):
+        return {
+            "fields": [
+                item.get("field") if isinstance(item, dict) else None
+                for item in data["submissions"]
+            ]
+        }
+    if "field" in data:
+        return {"field": data["field"]}
+    return None
+
+
+class TrafficRecorder:
+    def __init__(self, path: str, sample_rate: float = 1.0):
+        self.path = path
+        self.sample_rate = sample_rate
+        self._salt = secrets.token_bytes(16)
+        self._file: IO[str] | None = None
+
+    def session(self, cookie_header: bytes | None) -> str | None:
+        if not cookie_header:
+            return None
+        cookie = SimpleCookie(cookie_header.decode("latin-1"))
+        token = cookie.get("access_token")
+        if token is None:
+            return None
+        return hashlib.sha256(self._salt + token.value.encode()).hexdigest()[:12]
+
+    def sampled(self, session: str | None) -> bool:
+        if self.sample_rate >= 1:
+            return True
+        # Sample whole sessions, so their bursts stay intact.
+        if session is not None:
+            return int(session, 16) / 16**12 < self.sample_rate
+        return random.random() < self.sample_rate
+
+    def write(self, record: dict) -> None:
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8", buffering=1 << 16)
+            logger.info(f"Capturing traffic to {self.path}")
+        self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class TrafficCaptureMiddleware:
+    """Records each sampled HTTP request to a TrafficRecorder."""
+
+    def __init__(self, app, recorder: TrafficRecorder):
+        self.app = app
+        self.recorder = recorder
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        session = self.recorder.session(headers.get(b"cookie"))
+        if not self.recorder.sampled(session):
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        body = bytearray()
+        capture_body = scope["method"] in ("POST", "PUT")
+
+        async def receive_with_body():
+            message = await receive()
+            if (
+                capture_body
+                and message["type"] == "http.request"
+                and len(body) < MAX_CAPTURED_BODY
+            ):
+                body.extend(message.get("body", b""))
+            return message
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.time()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive_with_body, send_with_status)
+        finally:
+            duration = time.perf_counter() - start
+            # Capturing must never break the request it records.
+            try:
+                self._capture(scope, status, started, duration, session, body)
+            except Exception as e:
+                logger.warning(f"Failed to capture traffic: {e}", exc_info=True)
+
+    def _capture(
+        self,
+        scope,
+        status: int,
+        started: float,
+        duration: float,
+        session: str | None,
+        body: bytearray,
+    ) -> None:
+        route = scope.get("route")
+        if route is None:
+            return
+        record = {
+            "t": round(started, 3),
+            "m": scope["method"],
+            "r": route.path,
+            "s": status,
+            "d": round(duration * 1000, 2),
+        }
+        query = scope.get("query_string", b"").decode("latin-1")
+        if query:
+            params = {
+                key: value
+                for key, _, value in (pair.partition("=") for pair in query.split("&"))
+                if key in CAPTURED_PARAMS
+            }
+            if params:
+                record["q"] = params
+        if session is not None:
+            record["u"] = session
+        if body:
+            fields = _submitted_fields(bytes(body))
+            if fields:
+                record["b"] = fields
+        self.recorder.write(record)
@@ -1,8 +1,17 @@
+import asyncio
+import heapq
+import itertools
 import logging
+import time
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from functools import lru_cache
+from typing import AsyncIterator
 
 import httpx
 from fastapi import HTTPException
 
+from backend.metrics import Counter, Gauge, Histogram
 from backend.models.pydantic import TaskSubmission, ToolhubSubmission
 
 
@@ -20,21 +29,200 @@ def get_logger(name: str) -> logging.Logger:
 logger = get_logger(__name__)
 
 
+class Priority(IntEnum):
+    """Scheduling priority for outbound Toolhub requests, lowest value first."""
+
+    INTERACTIVE = 0
+    BACKGROUND = 1
+    BULK = 2
+
+
+governor_wait_seconds = Histogram(
+    "toolhunt_toolhub_governor_wait_seconds",
+    "Time Toolhub requests spent queued in the governor.",
+    labelnames=("priority",),
+)
+governor_in_flight = Gauge(
+    "toolhunt_toolhub_governor_in_flight",
+    "Toolhub requests currently in flight.",
+)
+governor_queued = Gauge(
+    "toolhunt_toolhub_governor_queued",
+    "Toolhub requests waiting for a governor slot.",
+)
+toolhub_request_seconds = Histogram(
+    "toolhunt_toolhub_request_duration_seconds",
+    "Toolhub request latency by client method, excluding governor wait.",
+    labelnames=("method",),
+)
+toolhub_request_errors = Counter(
+    "toolhunt_toolhub_request_errors_total",
+    "Failed Toolhub requests by client method and error.",
+    labelnames=("method", "error"),
+)
+toolhub_response_bytes = Counter(
+    "toolhunt_toolhub_response_bytes_total",
+    "Response bytes received from Toolhub by client method.",
+    labelnames=("method",),
+)
+
+
+class ToolhubGovernor:
+    """
+    Limits outbound Toolhub traffic with a token bucket and a cap on requests
+    in flight. Waiters are served by priority, then in arrival order, so
+    interactive calls overtake queued sync traffic.
+    """
+
+    def __init__(self, rate: float, burst: int, max_in_flight: int):
+        self.rate = rate
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self.tokens = float(burst)
+        self.in_flight = 0
+        self._updated = time.monotonic()
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+        self._timer: asyncio.TimerHandle | None = None
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _dispatch(self) -> None:
+        self._timer = None
+        while self._waiters and self.in_flight < self.max_in_flight:
+            _, _, waiter = self._waiters[0]
+            if waiter.done():
+                heapq.heappop(self._waiters)
+                continue
+            self._refill()
+            if self.tokens < 1:
+                delay = (1 - self.tokens) / self.rate
+                self._timer = asyncio.get_running_loop().call_later(
+                    delay, self._dispatch
+                )
+                break
+            heapq.heappop(self._waiters)
+            self.tokens -= 1
+            self.in_flight += 1
+            waiter.set_result(None)
+        governor_in_flight.set(self.in_flight)
+        governor_queued.set(len(self._waiters))
+
+    async def acquire(self, priority: Priority = Priority.BACKGROUND) -> None:
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), waiter))
+        started = time.monotonic()
+        if self._timer is None:
+            self._dispatch()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            governor_wait_seconds.labels(priority.name.lower()).observe(
+                time.monotonic() - started
+            )
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        if self._timer is None:
+            self._dispatch()
+        else:
+            governor_in_flight.set(self.in_flight)
+
+    @asynccontextmanager
+    async def slot(
+        self, priority: Priority = Priority.BACKGROUND
+    ) -> AsyncIterator[None]:
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+@lru_cache()
+def get_governor() -> ToolhubGovernor:
+    """Return the process-wide governor shared by all Toolhub clients."""
+    from backend.config import get_settings
+
+    settings = get_settings()
+    return ToolhubGovernor(
+        rate=settings.TOOLHUB_RATE_LIMIT,
+        burst=settings.TOOLHUB_RATE_BURST,
+        max_in_flight=settings.TOOLHUB_MAX_IN_FLIGHT,
+    )
+
+
 class ToolhubClient:
-    def __init__(self, base_url):
+    def __init__(
+        self,
+        base_url,
+        governor: ToolhubGovernor | None = None,
+        http_client: httpx.AsyncClient | None = None,
+    ):
         self.base_url = base_url
         self.headers = {
             "User-Agent": "Toolhunt API",
             "Content-Type": "application/json",
         }
+        self._governor = governor
+        self.http_client = http_client
 
-    async def get(self, tool_name):
+    @property
+    def governor(self) -> ToolhubGovernor:
+        if self._governor is None:
+            self._governor = get_governor()
+        return self._governor
+
+    @asynccontextmanager
+    async def _client(self) -> AsyncIterator[httpx.AsyncClient]:
+        """The shared HTTP client if there is one, else a new one per call."""
+        if self.http_client is not None:
+            yield self.http_client
+        else:
+            async with httpx.AsyncClient() as client:
+                yield client
+
+    async def _request(
+        self,
+        client: httpx.AsyncClient,
+        method: str,
+        url: str,
+        priority: Priority,
+        operation: str,
+        **kwargs,
+    ) -> httpx.Response:
+        async with self.governor.slot(priority):
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+            except httpx.HTTPError as e:
+                toolhub_request_errors.labels(operation, type(e).__name__).inc()
+                raise
+            finally:
+                toolhub_request_seconds.labels(operation).observe(
+                    time.perf_counter() - start
+                )
+        toolhub_response_bytes.labels(operation).inc(response.num_bytes_downloaded)
+        if response.is_error:
+            toolhub_request_errors.labels(operation, response.status_code).inc()
+        return response
+
+    async def get(self, tool_name, priority: Priority = Priority.BULK):
         """Get data on a single tool and return a list"""
         url = f"{self.base_url}/tools/{tool_name}"
         tool_data = []
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, headers=self.headers)
+            async with self._client() as client:
+                response = await self._request(
+                    client, "GET", url, priority, "get", headers=self.headers
+                )
                 response.raise_for_status()
                 api_response = response.json()
                 tool_data.append(api_response)
@@ -42,31 +230,55 @@ class ToolhubClient:
         except httpx.RequestError as e:
             raise HTTPException(status_code=500, detail=str(e))
 
-    async def get_all(self):
-        """Get data on all Toolhub tools."""
-        url = f"{self.base_url}/tools/"
+    async def _paginate(
+        self, path: str, operation: str, page_size: int | None = None
+    ) -> AsyncIterator[list]:
+        """Yield the results on each page of a paginated Toolhub list."""
+        url = f"{self.base_url}/{path}"
+        params = {"page_size": page_size} if page_size else None
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, headers=self.headers)
-                response.raise_for_status()
-                api_response = response.json()
-                tool_data = api_response["results"]
-                while api_response["next"]:
-                    response = await client.get(
-                        api_response["next"], headers=self.headers
+            async with self._client() as client:
+                while url:
+                    response = await self._request(
+                        client,
+                        "GET",
+                        url,
+                        Priority.BULK,
+                        operation,
+                        headers=self.headers,
+                        params=params,
                     )
+                    response.raise_for_status()
                     api_response = response.json()
-                    tool_data.extend(api_response["results"])
-                return tool_data
+                    yield api_response["results"]
+                    # The next link carries the query parameters.
+                    url, params = api_response["next"], None
         except httpx.RequestError as e:
             raise HTTPException(status_code=500, detail=str(e))
 
+    def iter_pages(self, page_size: int | None = None) -> AsyncIterator[list]:
+        """Yield the tools on each page of the Toolhub tool list as it arrives."""
+        return self._paginate("tools/", "get_all", page_size)
+
+    def iter_recent_changes(self, page_size: int | None = None) -> AsyncIterator[list]:
+        """Yield pages of the Toolhub recent changes feed, newest first."""
+        return self._paginate("recent/", "get_recent_changes", page_size)
+
+    async def get_all(self):
+        """Get data on all Toolhub tools."""
+        tool_data = []
+        async for page in self.iter_pages():
+            tool_data.extend(page)
+        return tool_data
+
     async def get_count(self):
         """Get number of tools on Toolhub."""
         url = f"{self.base_url}/tools/"
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, headers=self.headers)
+            async with self._client() as client:
+                response = await self._request(
+                    client, "GET", url, Priority.BULK, "get_count", headers=self.headers
+                )
                 response.raise_for_status()
                 api_response = response.json()
                 count = api_response["count"]
@@ -80,9 +292,15 @@ class ToolhubClient:
         headers = dict(self.headers)
         headers.update({"Authorization": f"Bearer {token}"})
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.put(
-                    url, json=data.model_dump(exclude_unset=True), headers=headers
+            async with self._client() as client:
+                response = await self._request(
+                    client,
+                    "PUT",
+                    url,
+                    Priority.BACKGROUND,
+                    "put_annotation",
+                    json=data.model_dump(exclude_unset=True),
+                    headers=headers,
                 )
                 response.raise_for_status()
                 return response.json()
@@ -96,6 +314,39 @@ class ToolhubClient:
                 status_code=500, detail=f"Error communicating with Toolhub: {str(e)}"
             )
 
+    async def get_schema(self) -> str:
+        """Get the Toolhub OpenAPI schema as YAML text."""
+        url = f"{self.base_url}/schema/"
+        async with self._client() as client:
+            response = await self._request(
+                client, "GET", url, Priority.BACKGROUND, "get_schema"
+            )
+        response.raise_for_status()
+        return response.text
+
+    async def get_user(self, access_token: str) -> dict:
+        """Get the Toolhub profile of the user owning the access token."""
+        url = f"{self.base_url}/user/"
+        async with self._client() as client:
+            response = await self._request(
+                client,
+                "GET",
+                url,
+                Priority.INTERACTIVE,
+                "get_user",
+                headers={"Authorization": f"Bearer {access_token}"},
+            )
+        return response.json()
+
+    async def post_token(self, token_url: str, data: dict) -> dict:
+        """Call the OAuth token endpoint. Raises httpx.HTTPError on failure."""
+        async with self._client() as client:
+            response = await self._request(
+                client, "POST", token_url, Priority.INTERACTIVE, "post_token", data=data
+            )
+        response.raise_for_status()
+        return response.json()
+
 
 def format_url_list(value):
     return [{"language": item["language"], "url": item["url"]} for item in value]
@@ -124,3 +375,28 @@ async def prepare_toolhub_submission(submission: TaskSubmission) -> ToolhubSubmi
         logger.warning(f"Unhandled field: {submission.field}")
 
     return toolhub_data
+
+
+def merge_toolhub_submissions(
+    submissions: list[ToolhubSubmission],
+) -> ToolhubSubmission:
+    """
+    Merge submissions for one tool into a single annotation update. When a
+    field appears more than once, the later submission wins.
+    """
+    if len(submissions) == 1:
+        return submissions[0]
+
+    merged = ToolhubSubmission()
+    fields = []
+    for submission in submissions:
+        for name in submission.model_fields_set - {"comment"}:
+            setattr(merged, name, getattr(submission, name))
+            if name not in fields:
+                fields.append(name)
+
+    if len(fields) == 1:
+        merged.comment = f"Updated {fields[0]} field using Toolhunt"
+    else:
+        merged.comment = f"Updated {', '.join(fields)} fields using Toolhunt"
+    return merged
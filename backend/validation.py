@@ -0,0 +1,275 @@
+"""
+Compiles the cleaned Toolhub schema into per-field validator functions.
+
+Only the JSON Schema keywords used by Toolhub's Annotations schema are
+enforced; unknown keywords are ignored and left for Toolhub to check.
+"""
+
+import re
+from typing import Any, Callable
+
+Validator = Callable[[Any], None]
+
+URI_PATTERN = re.compile(r"^[A-Za-z][A-Za-z0-9+.-]*://\S+$")
+
+TYPE_CHECKS: dict[str, Callable[[Any], bool]] = {
+    "string": lambda v: isinstance(v, str),
+    "integer": lambda v: isinstance(v, int) and not isinstance(v, bool),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "boolean": lambda v: isinstance(v, bool),
+    "array": lambda v: isinstance(v, list),
+    "object": lambda v: isinstance(v, dict),
+    "null": lambda v: v is None,
+}
+
+
+class SchemaValidationError(ValueError):
+    """Raised when a value does not match its compiled schema."""
+
+    def __init__(self, message: str, path: str = ""):
+        self.message = message
+        self.path = path
+        super().__init__(f"{path}: {message}" if path else message)
+
+    def at(self, segment: str) -> "SchemaValidationError":
+        """Return the same error with `segment` prepended to its path."""
+        if not self.path:
+            path = segment
+        elif self.path.startswith("["):
+            path = f"{segment}{self.path}"
+        else:
+            path = f"{segment}.{self.path}"
+        return SchemaValidationError(self.message, path)
+
+
+def _accept(value: Any) -> None:
+    return None
+
+
+class SchemaCompiler:
+    """
+    Compiles schema nodes into closures. Named schemas are compiled once and
+    looked up through a shared table, so cyclic references are safe.
+    """
+
+    def __init__(self, schemas: dict[str, dict]):
+        self.schemas = schemas
+        self.compiled: dict[str, Validator] = {}
+
+    def ref(self, ref: str) -> Validator:
+        name = ref.split("/")[-1]
+        if name not in self.compiled:
+            # Placeholder first, so a reference back to this schema while it
+            # is being compiled terminates instead of recursing.
+            self.compiled[name] = _accept
+            self.compiled[name] = self.compile(self.schemas.get(name, {}))
+        compiled = self.compiled
+        return lambda value: compiled[name](value)
+
+    def compile(self, node: dict) -> Validator:
+        if not isinstance(node, dict):
+            return _accept
+        if "$ref" in node:
+            return self.ref(node["$ref"])
+
+        checks: list[Validator] = []
+        nullable = node.get("nullable", False)
+
+        types = node.get("type")
+        if types is not None:
+            type_names = [types] if isinstance(types, str) else list(types)
+            type_checks = [TYPE_CHECKS[t] for t in type_names if t in TYPE_CHECKS]
+            if type_checks:
+
+                def check_type(value: Any) -> None:
+                    if not any(check(value) for check in type_checks):
+                        raise SchemaValidationError(
+                            f"expected {' or '.join(type_names)}, got {type(value).__name__}"
+                        )
+
+                checks.append(check_type)
+
+        if "enum" in node:
+            allowed = list(node["enum"])
+            allowed_set = {v for v in allowed if isinstance(v, (str, int, bool))}
+
+            def check_enum(value: Any) -> None:
+                hashable = isinstance(value, (str, int, bool))
+                if not (value in allowed_set if hashable else value in allowed):
+                    raise SchemaValidationError(f"{value!r} is not one of {allowed}")
+
+            checks.append(check_enum)
+
+        checks.extend(self._string_checks(node))
+        checks.extend(self._array_checks(node))
+        checks.extend(self._object_checks(node))
+        checks.extend(self._combinator_checks(node))
+
+        if not checks:
+            return _accept
+
+        def validate(value: Any) -> None:
+            if value is None and nullable:
+                return
+            for check in checks:
+                check(value)
+
+        return validate
+
+    def _string_checks(self, node: dict) -> list[Validator]:
+        checks = []
+        min_length = node.get("minLength")
+        max_length = node.get("maxLength")
+        if min_length is not None or max_length is not None:
+
+            def check_length(value: Any) -> None:
+                if not isinstance(value, str):
+                    return
+                if min_length is not None and len(value) < min_length:
+                    raise SchemaValidationError(f"shorter than {min_length} characters")
+                if max_length is not None and len(value) > max_length:
+                    raise SchemaValidationError(f"longer than {max_length} characters")
+
+            checks.append(check_length)
+
+        if "pattern" in node:
+            pattern = re.compile(node["pattern"])
+
+            def check_pattern(value: Any) -> None:
+                if isinstance(value, str) and not pattern.search(value):
+                    raise SchemaValidationError(
+                        f"{value!r} does not match {pattern.pattern!r}"
+                    )
+
+            checks.append(check_pattern)
+
+        if node.get("format") == "uri":
+
+            def check_uri(value: Any) -> None:
+                if isinstance(value, str) and value and not URI_PATTERN.match(value):
+                    raise SchemaValidationError(f"{value!r} is not a valid URI")
+
+            checks.append(check_uri)
+        return checks
+
+    def _array_checks(self, node: dict) -> list[Validator]:
+        checks = []
+        min_items = node.get("minItems")
+        max_items = node.get("maxItems")
+        if min_items is not None or max_items is not None:
+
+            def check_items_count(value: Any) -> None:
+                if not isinstance(value, list):
+                    return
+                if min_items is not None and len(value) < min_items:
+                    raise SchemaValidationError(f"fewer than {min_items} items")
+                if max_items is not None and len(value) > max_items:
+                    raise SchemaValidationError(f"more than {max_items} items")
+
+            checks.append(check_items_count)
+
+        if "items" in node:
+            item_validator = self.compile(node["items"])
+            if item_validator is not _accept:
+
+                def check_items(value: Any) -> None:
+                    if not isinstance(value, list):
+                        return
+                    for i, item in enumerate(value):
+                        try:
+                            item_validator(item)
+                        except SchemaValidationError as e:
+                            raise e.at(f"[{i}]")
+
+                checks.append(check_items)
+        return checks
+
+    def _object_checks(self, node: dict) -> list[Validator]:
+        checks = []
+        properties = {
+            name: self.compile(prop)
+            for name, prop in node.get("properties", {}).items()
+            if not (isinstance(prop, dict) and prop.get("readOnly"))
+        }
+        properties = {k: v for k, v in properties.items() if v is not _accept}
+        required = [
+            name
+            for name in node.get("required", [])
+            if not node.get("properties", {}).get(name, {}).get("readOnly")
+        ]
+        closed = node.get("additionalProperties") is False
+        known = set(node.get("properties", {}))
+
+        if properties or required or closed:
+
+            def check_object(value: Any) -> None:
+                if not isinstance(value, dict):
+                    return
+                for name in required:
+                    if name not in value:
+                        raise SchemaValidationError("is required", name)
+                if closed:
+                    extra = set(value) - known
+                    if extra:
+                        raise SchemaValidationError(
+                            f"unexpected properties {sorted(extra)}"
+                        )
+                for name, validator in properties.items():
+                    if name in value:
+                        try:
+                            validator(value[name])
+                        except SchemaValidationError as e:
+                            raise e.at(name)
+
+            checks.append(check_object)
+        return checks
+
+    def _combinator_checks(self, node: dict) -> list[Validator]:
+        checks = []
+        for sub in node.get("allOf", []):
+            validator = self.compile(sub)
+            if validator is not _accept:
+                checks.append(validator)
+
+        for keyword in ("oneOf", "anyOf"):
+            if keyword not in node:
+                continue
+            options = [self.compile(sub) for sub in node[keyword]]
+            if _accept in options:
+                continue
+
+            def check_any(value: Any, options=options) -> None:
+                errors = []
+                for option in options:
+                    try:
+                        option(value)
+                        return
+                    except SchemaValidationError as e:
+                        errors.append(str(e))
+                raise SchemaValidationError(
+                    f"does not match any allowed schema ({'; '.join(errors)})"
+                )
+
+            checks.append(check_any)
+        return checks
+
+
+def compile_field_validators(
+    schema: dict, root: str = "Annotations"
+) -> dict[str, Validator]:
+    """Compile one validator per property of the root schema."""
+    schemas = schema.get("schemas", {})
+    compiler = SchemaCompiler(schemas)
+    properties = schemas.get(root, {}).get("properties", {})
+    validators = {}
+    for field, node in properties.items():
+        validator = compiler.compile(node)
+
+        def validate_field(value: Any, field=field, validator=validator) -> None:
+            try:
+                validator(value)
+            except SchemaValidationError as e:
+                raise e.at(field)
+
+        validators[field] = validate_field
+    return validators
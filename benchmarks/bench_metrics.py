@@ -0,0 +1,94 @@
+"""
+Measures the cost of recording metrics on the request path.
+
+Times the metric primitives on their own, then calls a trivial ASGI app
+with and without RequestMetricsMiddleware and reports the difference per
+request.
+
+Usage: python -m benchmarks.bench_metrics [--iterations N]
+"""
+
+import argparse
+import asyncio
+import time
+
+from backend.instrumentation import RequestMetricsMiddleware
+from backend.metrics import Counter, Histogram, Registry
+
+
+class _Route:
+    path = "/api/v1/tasks"
+
+
+async def endpoint(scope, receive, send):
+    scope["route"] = _Route
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"[]"})
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message):
+    pass
+
+
+def time_primitives(iterations: int) -> None:
+    registry = Registry()
+    counter = Counter("bench_total", "", labelnames=("result",), registry=registry)
+    histogram = Histogram(
+        "bench_seconds", "", labelnames=("method", "route"), registry=registry
+    )
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        counter.labels("success").inc()
+    report("counter.inc", time.perf_counter() - start, iterations)
+
+    start = time.perf_counter()
+    for i in range(iterations):
+        histogram.labels("GET", "/api/v1/tasks").observe(i % 1000 / 1000)
+    report("histogram", time.perf_counter() - start, iterations)
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        registry.render()
+    report("render", time.perf_counter() - start, 1000)
+
+
+async def time_requests(app, iterations: int) -> float:
+    scope = {"type": "http", "method": "GET", "path": "/api/v1/tasks"}
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await app(dict(scope), receive, send)
+    return time.perf_counter() - start
+
+
+def report(name: str, elapsed: float, iterations: int) -> None:
+    print(f"{name:<12} {elapsed / iterations * 1e9:>10,.0f} ns/op")
+
+
+async def compare_middleware(iterations: int) -> None:
+    # Warm up both paths before measuring.
+    await time_requests(endpoint, 1000)
+    await time_requests(RequestMetricsMiddleware(endpoint), 1000)
+
+    bare = await time_requests(endpoint, iterations)
+    wrapped = await time_requests(RequestMetricsMiddleware(endpoint), iterations)
+    report("bare app", bare, iterations)
+    report("middleware", wrapped, iterations)
+    print(f"overhead     {(wrapped - bare) / iterations * 1e6:>10.2f} us/request")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200_000)
+    args = parser.parse_args()
+
+    time_primitives(args.iterations)
+    asyncio.run(compare_middleware(args.iterations))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Compares per-row upserts with the diffing bulk writes of the database update.
+
+Generates tools, cleans them like a sync does and writes them to a fresh
+sqlite database twice, once into empty tables and once as a re-sync over
+existing rows, with both the old update_or_create loops and
+backend.sync.load_tools.
+
+Usage: python -m benchmarks.bench_sync [--tools N]
+"""
+
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from tortoise import Tortoise
+
+from backend.models.tortoise import Task, Tool
+from backend.sync import clean_tool_data, load_tools
+from scripts.generate_data import generate_tools
+
+
+async def load_per_row(tools) -> None:
+    for tool in tools:
+        await Tool.update_or_create(
+            defaults={
+                "title": tool.title,
+                "description": tool.description,
+                "url": tool.url,
+            },
+            name=tool.name,
+        )
+    for tool in tools:
+        tool_instance = await Tool.get(name=tool.name)
+        for field_name in tool.missing_annotations:
+            await Task.update_or_create(tool=tool_instance, field=field_name)
+
+
+async def time_load(name: str, load, tools) -> dict:
+    results = {}
+    await Task.all().delete()
+    await Tool.all().delete()
+    for phase in ("insert", "resync"):
+        start = time.perf_counter()
+        await load(tools)
+        elapsed = time.perf_counter() - start
+        results[phase] = elapsed
+        print(f"{name:<10} {phase:<7} {elapsed:>8.2f}s")
+    return results
+
+
+async def run(args: argparse.Namespace) -> None:
+    tools = clean_tool_data(list(generate_tools(args.tools, args.seed)))
+    with tempfile.TemporaryDirectory() as tmp:
+        await Tortoise.init(
+            db_url=f"sqlite://{Path(tmp) / 'bench.sqlite3'}",
+            modules={"models": ["backend.models.tortoise"]},
+        )
+        await Tortoise.generate_schemas()
+        try:
+            per_row = await time_load("per-row", load_per_row, tools)
+            bulk = await time_load("bulk", load_tools, tools)
+        finally:
+            await Tortoise.close_connections()
+    tasks = sum(len(tool.missing_annotations) for tool in tools)
+    print(f"{len(tools):,} tools, {tasks:,} tasks")
+    for phase in per_row:
+        print(f"{phase:<7} speedup {per_row[phase] / bulk[phase]:>6.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tools", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
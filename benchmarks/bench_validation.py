@@ -0,0 +1,88 @@
+"""
+Measures validation throughput for task submission values.
+
+Compares the compiled field validators against validating the same values
+with the ToolhubSubmission pydantic model.
+
+Usage: python -m benchmarks.bench_validation [--iterations N]
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+from pydantic import ValidationError
+
+from backend.api.schema import parse_and_compile
+from backend.models.pydantic import ToolhubSubmission
+from backend.validation import SchemaValidationError
+
+SCHEMA_PATH = (
+    Path(__file__).resolve().parent.parent
+    / "tests"
+    / "fixtures"
+    / "toolhub_schema.yaml"
+)
+
+SAMPLES = [
+    ("audiences", ["admin", "editor", "reader"]),
+    ("tasks", ["analysis", "patrolling"]),
+    ("wikidata_qid", "Q42"),
+    ("tool_type", "web app"),
+    ("for_wikis", ["*", "en.wikipedia.org"]),
+    ("user_docs_url", [{"language": "en", "url": "https://example.org/docs"}]),
+    ("icon", "https://commons.wikimedia.org/wiki/File:Example.svg"),
+    ("audiences", ["nobody"]),
+    ("wikidata_qid", "not-a-qid"),
+    ("user_docs_url", [{"language": "en"}]),
+]
+
+
+def run_compiled(validators, iterations: int) -> tuple[float, int]:
+    rejected = 0
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for field, value in SAMPLES:
+            try:
+                validators[field](value)
+            except SchemaValidationError:
+                rejected += 1
+    return time.perf_counter() - start, rejected
+
+
+def run_pydantic(iterations: int) -> tuple[float, int]:
+    rejected = 0
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for field, value in SAMPLES:
+            try:
+                ToolhubSubmission.model_validate({field: value})
+            # The model's string constraints on list fields raise TypeError.
+            except (ValidationError, TypeError):
+                rejected += 1
+    return time.perf_counter() - start, rejected
+
+
+def report(name: str, elapsed: float, rejected: int, iterations: int) -> None:
+    total = iterations * len(SAMPLES)
+    print(
+        f"{name:<10} {total / elapsed:>12,.0f} values/s "
+        f"{elapsed / total * 1e6:>8.2f} us/value  rejected={rejected}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20_000)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    _, validators = parse_and_compile(SCHEMA_PATH.read_text())
+    print(f"compile    {(time.perf_counter() - start) * 1e3:.2f} ms")
+
+    report("compiled", *run_compiled(validators, args.iterations), args.iterations)
+    report("pydantic", *run_pydantic(args.iterations), args.iterations)
+
+
+if __name__ == "__main__":
+    main()
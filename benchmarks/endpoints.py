@@ -0,0 +1,326 @@
+"""
+Benchmarks the main API endpoints against a seeded local database.
+
+Boots backend.main:create_app in process on a fresh sqlite database, with
+Toolhub replaced by a local stub, and drives each endpoint at a fixed
+concurrency. Latency percentiles and throughput are written as JSON. With
+--check, the run fails when a metric regresses beyond --threshold compared
+to the baseline. Baselines are machine specific; record one with
+--save-baseline on the machine that runs the check.
+
+Usage: python -m benchmarks.endpoints [--save-baseline | --check] [options]
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+from typing import Callable
+
+from benchmarks.toolhub_stub import StubServer
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+LATENCY_METRICS = ("p50_ms", "p95_ms", "p99_ms")
+BENCH_USER_ID = "bench"
+
+# A request factory takes the request index and the seeded (task id, tool
+# name) pairs and returns the method, URL and httpx keyword arguments.
+TaskIds = list[tuple[int, str]]
+RequestFactory = Callable[[int, TaskIds], tuple[str, str, dict]]
+
+
+def submission_request(i: int, task_ids: TaskIds) -> tuple[str, str, dict]:
+    task_id, tool_name = task_ids[i]
+    body = {
+        "tool_name": tool_name,
+        "tool_title": tool_name,
+        "completed_date": datetime.now(UTC).isoformat(),
+        "value": "Q42",
+        "field": "wikidata_qid",
+    }
+    return "POST", f"/api/v1/tasks/{task_id}", {"json": body}
+
+
+ENDPOINTS: dict[str, RequestFactory] = {
+    "tasks": lambda i, _: ("GET", "/api/v1/tasks", {}),
+    "tasks_filtered": lambda i, _: (
+        "GET",
+        "/api/v1/tasks",
+        {"params": {"field_names": "audiences,tasks"}},
+    ),
+    "tools": lambda i, _: ("GET", "/api/v1/tools", {}),
+    "leaderboard": lambda i, _: (
+        "GET",
+        "/api/v1/user/contributions/leaderboard",
+        {"params": {"days": 30, "limit": 25}},
+    ),
+    "submit_task": submission_request,
+}
+
+
+def configure_environment(db_path: Path, stub: StubServer) -> str:
+    """Point the settings at the local database and stub before importing."""
+    from cryptography.fernet import Fernet
+
+    db_url = f"sqlite://{db_path}"
+    os.environ.update(
+        {
+            "DATABASE_URL": db_url,
+            "TOOLHUB_API_BASE_URL": f"{stub.base_url}/api",
+            "TOOLHUB_AUTH_URL": f"{stub.base_url}/oauth2/authorize/",
+            "TOOLHUB_TOKEN_URL": f"{stub.base_url}/oauth2/token/",
+            "SCHEMA_CACHE_PATH": str(db_path.with_name("schema_cache.json")),
+            "LOG_LEVEL": "ERROR",
+        }
+    )
+    for name, value in {
+        "CLIENT_ID": "bench",
+        "CLIENT_SECRET": "bench",
+        "REDIRECT_URI": "http://localhost/callback",
+        "ENCRYPTION_KEY": Fernet.generate_key().decode(),
+    }.items():
+        os.environ.setdefault(name, value)
+    return db_url
+
+
+async def seed(db_url: str, args: argparse.Namespace) -> None:
+    from tortoise import Tortoise
+
+    from backend.config import get_settings
+    from backend.models.pydantic import Token
+    from backend.models.tortoise import CompletedTask, Task, Tool, User
+    from backend.security import encrypt_token
+
+    rng = random.Random(args.seed)
+    fields = sorted(get_settings().active_annotations - {"wikidata_qid"})
+
+    await Tortoise.init(db_url=db_url, modules={"models": ["backend.models.tortoise"]})
+    await Tortoise.generate_schemas()
+
+    tools = [
+        Tool(
+            name=f"tool-{i}",
+            title=f"Tool {i % max(1, args.tools // 2)}",
+            description="Seeded for benchmarking",
+            url=f"https://example.org/tool-{i}",
+        )
+        for i in range(args.tools)
+    ]
+    await Tool.bulk_create(tools, batch_size=1000)
+    # Every tool gets a wikidata_qid task so submit_task has one per request.
+    tasks = [
+        Task(tool_id=tool.name, field=field)
+        for tool in tools
+        for field in ["wikidata_qid", *rng.sample(fields, rng.randint(1, 5))]
+    ]
+    await Task.bulk_create(tasks, batch_size=1000)
+
+    token = Token(
+        access_token="stub-access-token",
+        token_type="Bearer",
+        expires_in=3600,
+        refresh_token="stub-refresh-token",
+    )
+    users = [User(id=str(i), username=f"user-{i}", email="") for i in range(args.users)]
+    users.append(
+        User(
+            id=BENCH_USER_ID,
+            username="bench-user",
+            email="",
+            encrypted_token=await encrypt_token(token),
+            token_expires_at=datetime.now(UTC) + timedelta(days=365),
+        )
+    )
+    await User.bulk_create(users, batch_size=1000)
+
+    # A few users do most of the work, as on the real leaderboard.
+    weights = [1 / (rank + 1) for rank in range(args.users)]
+    now = datetime.now(UTC)
+    completed = [
+        CompletedTask(
+            tool_name=f"tool-{rng.randrange(args.tools)}",
+            tool_title="Seeded",
+            field=rng.choice(fields),
+            user=f"user-{user}",
+            completed_date=now - timedelta(seconds=i * 60 + rng.randrange(60)),
+        )
+        for i, user in enumerate(
+            rng.choices(range(args.users), weights=weights, k=args.completed)
+        )
+    ]
+    await CompletedTask.bulk_create(completed, batch_size=1000)
+    await Tortoise.close_connections()
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+async def drive(client, factory, task_ids, total: int, concurrency: int) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    counter = itertools.count()
+
+    async def worker():
+        nonlocal errors
+        while (i := next(counter)) < total:
+            method, url, kwargs = factory(i, task_ids)
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": round(total / wall, 1),
+        **{
+            f"p{pct}_ms": round(percentile(latencies, pct) * 1000, 2)
+            for pct in (50, 95, 99)
+        },
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    import httpx
+
+    from backend.config import get_settings
+    from backend.main import create_app
+    from backend.models.tortoise import Task
+    from backend.security import create_access_token
+
+    app = create_app(get_settings())
+    cookie = create_access_token(BENCH_USER_ID, timedelta(hours=1))
+    transport = httpx.ASGITransport(app=app)
+    results = {}
+    async with (
+        app.router.lifespan_context(app),
+        httpx.AsyncClient(
+            transport=transport,
+            base_url="http://bench",
+            cookies={"access_token": cookie},
+        ) as client,
+    ):
+        task_ids = await Task.filter(field="wikidata_qid").values_list("id", "tool_id")
+        for name in args.endpoints:
+            factory = ENDPOINTS[name]
+            if name == "submit_task":
+                # Submissions consume their task, so warm up on a separate slice.
+                warmup_ids = task_ids[args.requests :]
+                await drive(client, factory, warmup_ids, args.warmup, 1)
+            else:
+                await drive(client, factory, task_ids, args.warmup, 1)
+            results[name] = await drive(
+                client, factory, task_ids, args.requests, args.concurrency
+            )
+            print(format_row(name, results[name]))
+    return results
+
+
+def format_row(name: str, result: dict) -> str:
+    return (
+        f"{name:<16} p50 {result['p50_ms']:>8.2f}ms  p95 {result['p95_ms']:>8.2f}ms  "
+        f"p99 {result['p99_ms']:>8.2f}ms  {result['throughput_rps']:>8.1f} req/s  "
+        f"errors={result['errors']}"
+    )
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """Return a description of each metric that regressed past the threshold."""
+    regressions = []
+    for name, current in results["endpoints"].items():
+        base = baseline["endpoints"].get(name)
+        if current["errors"]:
+            regressions.append(f"{name}: {current['errors']} failed requests")
+        if base is None:
+            continue
+        for metric in LATENCY_METRICS:
+            if current[metric] > base[metric] * (1 + threshold):
+                regressions.append(
+                    f"{name}: {metric} {current[metric]} > baseline {base[metric]}"
+                )
+        if current["throughput_rps"] < base["throughput_rps"] * (1 - threshold):
+            regressions.append(
+                f"{name}: throughput {current['throughput_rps']} < "
+                f"baseline {base['throughput_rps']}"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--tools", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--completed", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument(
+        "--endpoints", nargs="+", choices=list(ENDPOINTS), default=list(ENDPOINTS)
+    )
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--output", type=Path, help="Also write results here")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--save-baseline", action="store_true")
+    mode.add_argument("--check", action="store_true")
+    args = parser.parse_args()
+    if "submit_task" in args.endpoints and args.tools < args.requests + args.warmup:
+        parser.error("--tools must cover --requests plus --warmup submissions")
+    if args.check and not args.baseline.exists():
+        parser.error(
+            f"no baseline at {args.baseline}; record one with `make bench-baseline`"
+        )
+
+    with tempfile.TemporaryDirectory() as tmp, StubServer() as stub:
+        db_url = configure_environment(Path(tmp) / "bench.sqlite3", stub)
+        asyncio.run(seed(db_url, args))
+        endpoints = asyncio.run(run(args))
+
+    results = {
+        "meta": {
+            "created": datetime.now(UTC).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.node(),
+            **{
+                name: getattr(args, name)
+                for name in ("requests", "concurrency", "tools", "users", "completed")
+            },
+        },
+        "endpoints": endpoints,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2) + "\n")
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"Baseline written to {args.baseline}")
+    elif args.check:
+        baseline = json.loads(args.baseline.read_text())
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} of {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+A minimal stand-in for the Toolhub API, served on localhost so benchmarks
+never touch the real service.
+"""
+
+import socket
+import threading
+import time
+from pathlib import Path
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Route
+
+SCHEMA_PATH = (
+    Path(__file__).resolve().parent.parent
+    / "tests"
+    / "fixtures"
+    / "toolhub_schema.yaml"
+)
+
+
+async def schema(request: Request):
+    return PlainTextResponse(SCHEMA_PATH.read_text(), media_type="application/yaml")
+
+
+async def put_annotation(request: Request):
+    return JSONResponse(await request.json())
+
+
+async def user(request: Request):
+    return JSONResponse({"id": 1, "username": "bench-user", "email": ""})
+
+
+async def token(request: Request):
+    return JSONResponse(
+        {
+            "access_token": "stub-access-token",
+            "token_type": "Bearer",
+            "expires_in": 3600,
+            "refresh_token": "stub-refresh-token",
+        }
+    )
+
+
+app = Starlette(
+    routes=[
+        Route("/api/schema/", schema),
+        Route("/api/tools/{name}/annotations/", put_annotation, methods=["PUT"]),
+        Route("/api/user/", user),
+        Route("/oauth2/token/", token, methods=["POST"]),
+    ]
+)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class StubServer:
+    """Runs the stub in a background thread with its own event loop."""
+
+    def __init__(self, port: int | None = None):
+        self.port = port or free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        self._server = uvicorn.Server(
+            uvicorn.Config(app, port=self.port, log_level="warning", lifespan="off")
+        )
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    def __enter__(self) -> "StubServer":
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("Toolhub stub did not start")
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.should_exit = True
+        self._thread.join()
@@ -0,0 +1,23 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS `toolhub_outbox` (
+    `id` INT NOT NULL PRIMARY KEY AUTO_INCREMENT,
+    `tool_name` VARCHAR(255) NOT NULL,
+    `user_id` VARCHAR(255) NOT NULL,
+    `payload` JSON NOT NULL,
+    `status` VARCHAR(7) NOT NULL  COMMENT 'PENDING: pending\nDONE: done\nDEAD: dead' DEFAULT 'pending',
+    `attempts` INT NOT NULL  DEFAULT 0,
+    `next_attempt_at` DATETIME(6) NOT NULL,
+    `last_error` LONGTEXT,
+    `created_at` DATETIME(6) NOT NULL  DEFAULT CURRENT_TIMESTAMP(6),
+    `updated_at` DATETIME(6) NOT NULL  DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
+    KEY `idx_toolhub_out_status_98fde7` (`status`, `next_attempt_at`)
+) CHARACTER SET utf8mb4;"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS `toolhub_outbox`;"""
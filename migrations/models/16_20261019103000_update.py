@@ -0,0 +1,11 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE `toolhub_outbox` ADD INDEX `idx_toolhub_out_tool_na_57e4bd` (`tool_name`, `user_id`, `status`);"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE `toolhub_outbox` DROP INDEX `idx_toolhub_out_tool_na_57e4bd`;"""
@@ -0,0 +1,343 @@
+"""
+This script serves a fake Toolhub API for offline performance work.
+It covers the endpoints Toolhunt uses:
+1. Paginated /api/tools/ and /api/tools/{name}, backed by generated tools.
+2. PUT /api/tools/{name}/annotations/, which updates the served tools and
+   records the edit in the paginated /api/recent/ feed, newest first.
+3. /api/user/, /api/schema/ and the OAuth /o/authorize/ and /o/token/ endpoints.
+
+Latency, error rate and rate limiting are configurable, globally or per
+route, so sync, login and submission throughput and tail latency can be
+measured locally. Request counts by route and status are served at
+/__stats__.
+
+Usage:
+    python -m scripts.fake_toolhub --tools 20000 --latency lognormal:80,0.6 \
+        --route-latency annotations=pareto:150,2.5 --error-rate 0.01 \
+        --rate-limit 10 --burst 20
+Then set TOOLHUB_API_BASE_URL=http://localhost:8090/api and the OAuth URLs
+to http://localhost:8090/o/authorize/ and http://localhost:8090/o/token/.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import secrets
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from pathlib import Path
+from urllib.parse import urlencode
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, RedirectResponse
+from starlette.routing import Route
+
+from scripts.generate_data import generate_tools
+
+SCHEMA_PATH = (
+    Path(__file__).resolve().parent.parent
+    / "tests"
+    / "fixtures"
+    / "toolhub_schema.yaml"
+)
+
+ROUTES = (
+    "list",
+    "detail",
+    "annotations",
+    "recent",
+    "user",
+    "schema",
+    "authorize",
+    "token",
+)
+
+
+class Latency:
+    """
+    A latency distribution in milliseconds, parsed from a spec:
+    "0", "fixed:MS", "uniform:LOW,HIGH", "lognormal:MEDIAN,SIGMA" or
+    "pareto:SCALE,ALPHA".
+    """
+
+    def __init__(self, spec: str):
+        self.spec = spec
+        kind, _, params = spec.partition(":")
+        values = [float(v) for v in params.split(",")] if params else []
+        if kind == "0":
+            self._sample = lambda rng: 0.0
+        elif kind == "fixed" and len(values) == 1:
+            self._sample = lambda rng: values[0]
+        elif kind == "uniform" and len(values) == 2:
+            self._sample = lambda rng: rng.uniform(*values)
+        elif kind == "lognormal" and len(values) == 2:
+            mu = math.log(values[0])
+            self._sample = lambda rng: rng.lognormvariate(mu, values[1])
+        elif kind == "pareto" and len(values) == 2:
+            self._sample = lambda rng: values[0] * rng.paretovariate(values[1])
+        else:
+            raise ValueError(f"Invalid latency spec: {spec}")
+
+    def sample(self, rng: random.Random) -> float:
+        """Return a delay in seconds."""
+        return self._sample(rng) / 1000
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Take a token. Returns 0, or the seconds until one is available."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+@dataclass
+class FakeToolhubConfig:
+    latency: dict[str, Latency] = field(default_factory=dict)
+    default_latency: Latency = field(default_factory=lambda: Latency("0"))
+    error_rate: float = 0.0
+    error_status: int = 503
+    rate_limit: float = 0.0
+    burst: int = 20
+    max_page_size: int = 100
+    seed: int = 0
+
+
+class FakeToolhub:
+    def __init__(self, tools: list[dict], config: FakeToolhubConfig):
+        self.config = config
+        self.tools = {tool["name"]: tool for tool in tools}
+        self.names = list(self.tools)
+        self.schema = SCHEMA_PATH.read_text()
+        self.rng = random.Random(config.seed)
+        self.buckets: dict[str, TokenBucket] = {}
+        self.stats: Counter = Counter()
+        # Recent changes, oldest first
+        self.changes: list[dict] = []
+
+    async def fault(self, route: str, request: Request) -> JSONResponse | None:
+        """Apply latency, rate limiting and errors. Returns a response to fail with."""
+        if self.config.rate_limit > 0:
+            # Toolhub throttles per user, or per client for anonymous calls.
+            client = request.headers.get("authorization") or request.client.host
+            bucket = self.buckets.get(client)
+            if bucket is None:
+                bucket = self.buckets[client] = TokenBucket(
+                    self.config.rate_limit, self.config.burst
+                )
+            retry_after = bucket.take()
+            if retry_after:
+                return JSONResponse(
+                    {"detail": "Request was throttled."},
+                    status_code=429,
+                    headers={"Retry-After": str(math.ceil(retry_after))},
+                )
+
+        latency = self.config.latency.get(route, self.config.default_latency)
+        delay = latency.sample(self.rng)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if self.rng.random() < self.config.error_rate:
+            return JSONResponse(
+                {"detail": "Injected failure"}, status_code=self.config.error_status
+            )
+        return None
+
+    def route(self, name: str, handler):
+        async def endpoint(request: Request):
+            response = await self.fault(name, request) or await handler(request)
+            self.stats[f"{name} {response.status_code}"] += 1
+            return response
+
+        return endpoint
+
+    def paginate(self, request: Request, items: list) -> JSONResponse:
+        page = max(1, int(request.query_params.get("page", 1)))
+        page_size = min(
+            self.config.max_page_size,
+            max(1, int(request.query_params.get("page_size", 20))),
+        )
+        start = (page - 1) * page_size
+        if start and start >= len(items):
+            return JSONResponse({"detail": "Invalid page."}, status_code=404)
+
+        def page_url(number: int) -> str:
+            query = urlencode({"page": number, "page_size": page_size})
+            return str(request.url.replace(query=query))
+
+        return JSONResponse(
+            {
+                "count": len(items),
+                "next": page_url(page + 1) if start + page_size < len(items) else None,
+                "previous": page_url(page - 1) if page > 1 else None,
+                "results": items[start : start + page_size],
+            }
+        )
+
+    async def list_tools(self, request: Request):
+        return self.paginate(request, [self.tools[name] for name in self.names])
+
+    async def list_recent(self, request: Request):
+        return self.paginate(request, self.changes[::-1])
+
+    async def get_tool(self, request: Request):
+        tool = self.tools.get(request.path_params["name"])
+        if tool is None:
+            return JSONResponse({"detail": "Not found."}, status_code=404)
+        return JSONResponse(tool)
+
+    async def put_annotations(self, request: Request):
+        if not self.authorized(request):
+            return self.unauthorized()
+        tool = self.tools.get(request.path_params["name"])
+        if tool is None:
+            return JSONResponse({"detail": "Not found."}, status_code=404)
+        data = await request.json()
+        data.pop("comment", None)
+        tool["annotations"].update(data)
+        self.changes.append(
+            {
+                "id": len(self.changes) + 1,
+                "timestamp": datetime.now(UTC).isoformat(),
+                "user": {"username": "fake-user"},
+                "target": {"type": "annotations", "name": tool["name"]},
+            }
+        )
+        return JSONResponse(tool["annotations"])
+
+    async def get_user(self, request: Request):
+        if not self.authorized(request):
+            return self.unauthorized()
+        return JSONResponse(
+            {"id": 1, "username": "Fake User", "email": "fake@example.org"}
+        )
+
+    async def get_schema(self, request: Request):
+        return PlainTextResponse(self.schema, media_type="application/yaml")
+
+    async def authorize(self, request: Request):
+        params = request.query_params
+        query = urlencode({"code": secrets.token_urlsafe(16), "state": params["state"]})
+        return RedirectResponse(f"{params['redirect_uri']}?{query}")
+
+    async def token(self, request: Request):
+        return JSONResponse(
+            {
+                "access_token": secrets.token_urlsafe(24),
+                "token_type": "Bearer",
+                "expires_in": 36000,
+                "refresh_token": secrets.token_urlsafe(24),
+                "scope": "read write",
+            }
+        )
+
+    async def get_stats(self, request: Request):
+        return JSONResponse(dict(sorted(self.stats.items())))
+
+    def authorized(self, request: Request) -> bool:
+        # Any bearer token is accepted, so tokens minted before a restart or
+        # seeded into the database still work.
+        return request.headers.get("authorization", "").startswith("Bearer ")
+
+    def unauthorized(self) -> JSONResponse:
+        return JSONResponse(
+            {"detail": "Authentication credentials were not provided."},
+            status_code=401,
+        )
+
+    def app(self) -> Starlette:
+        return Starlette(
+            routes=[
+                Route("/api/tools/", self.route("list", self.list_tools)),
+                Route("/api/tools/{name}/", self.route("detail", self.get_tool)),
+                Route("/api/tools/{name}", self.route("detail", self.get_tool)),
+                Route(
+                    "/api/tools/{name}/annotations/",
+                    self.route("annotations", self.put_annotations),
+                    methods=["PUT"],
+                ),
+                Route("/api/recent/", self.route("recent", self.list_recent)),
+                Route("/api/user/", self.route("user", self.get_user)),
+                Route("/api/schema/", self.route("schema", self.get_schema)),
+                Route("/o/authorize/", self.route("authorize", self.authorize)),
+                Route("/o/token/", self.route("token", self.token), methods=["POST"]),
+                Route("/__stats__", self.get_stats),
+            ]
+        )
+
+
+def load_tools(args: argparse.Namespace) -> list[dict]:
+    if args.pages_dir:
+        tools = []
+        for path in sorted(args.pages_dir.glob("tools-*.json")):
+            tools.extend(json.loads(path.read_text())["results"])
+        return tools
+    return list(generate_tools(args.tools, args.seed))
+
+
+def parse_route_latency(value: str) -> tuple[str, Latency]:
+    route, _, spec = value.partition("=")
+    if route not in ROUTES:
+        raise argparse.ArgumentTypeError(f"Unknown route {route}, expected {ROUTES}")
+    return route, Latency(spec)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--tools", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--pages-dir", type=Path, help="Serve pages from generate_data instead"
+    )
+    parser.add_argument("--latency", type=Latency, default=Latency("0"))
+    parser.add_argument(
+        "--route-latency",
+        type=parse_route_latency,
+        action="append",
+        default=[],
+        metavar="ROUTE=SPEC",
+        help=f"Latency for one route: {', '.join(ROUTES)}",
+    )
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument(
+        "--rate-limit", type=float, default=0.0, help="Requests/s per client, 0 = off"
+    )
+    parser.add_argument("--burst", type=int, default=20)
+    args = parser.parse_args()
+
+    config = FakeToolhubConfig(
+        latency=dict(args.route_latency),
+        default_latency=args.latency,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        rate_limit=args.rate_limit,
+        burst=args.burst,
+        seed=args.seed,
+    )
+    fake = FakeToolhub(load_tools(args), config)
+    print(f"Serving {len(fake.tools):,} tools on http://{args.host}:{args.port}/api")
+    uvicorn.run(fake.app(), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+"""
+This script generates synthetic Toolhunt data for scaling tests.
+It can:
+1. Generate Toolhub-shaped tool records with a skewed number of missing annotations.
+2. Bulk-load the tools, their tasks and completed tasks into the database.
+   Contributions per user follow a power law and span several years.
+3. Write the tools as Toolhub API list pages for sync testing.
+
+Generation is deterministic for a given --seed.
+
+Usage:
+    python -m scripts.generate_data --tools 100000 --completed 10000000
+    python -m scripts.generate_data --tools 5000 --no-db --pages-dir pages/
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import math
+import random
+import time
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+from typing import Iterator
+
+from tortoise import Tortoise, run_async
+
+from backend.bulk import BulkInserter
+from backend.config import get_settings
+from backend.db import TORTOISE_ORM
+from backend.models.tortoise import CompletedTask, Task, Tool
+from backend.sync import clean_tool_data
+
+settings = get_settings()
+
+logger = logging.getLogger(__name__)
+
+AUDIENCES = ["admin", "organizer", "editor", "reader", "researcher", "developer"]
+CONTENT_TYPES = ["article", "audio", "book", "data::bibliography", "image", "video"]
+SUBJECT_DOMAINS = ["biography", "cultural", "education", "geography", "glam"]
+TASKS = ["analysis", "annotating", "archiving", "categorizing", "citing", "editing"]
+TOOL_TYPES = ["web app", "desktop app", "bot", "gadget", "user script"]
+
+URL_LIST_FIELDS = {
+    "developer_docs_url",
+    "user_docs_url",
+    "feedback_url",
+    "privacy_policy_url",
+}
+# Annotations a tool can be missing. Deprecation and replacement are flags.
+ANNOTATION_FIELDS = [
+    "wikidata_qid",
+    "audiences",
+    "content_types",
+    "tasks",
+    "subject_domains",
+    "for_wikis",
+    "icon",
+    "available_ui_languages",
+    "tool_type",
+    "repository",
+    "api_url",
+    "developer_docs_url",
+    "user_docs_url",
+    "feedback_url",
+    "privacy_policy_url",
+    "translate_url",
+    "bugtracker_url",
+]
+LIST_FIELDS = {
+    "audiences",
+    "content_types",
+    "tasks",
+    "subject_domains",
+    "for_wikis",
+    "available_ui_languages",
+} | URL_LIST_FIELDS
+
+DEPRECATED_RATE = 0.03
+EXPERIMENTAL_RATE = 0.05
+
+
+def annotation_value(field: str, name: str, rng: random.Random):
+    """Return a plausible non-empty value for an annotation."""
+    if field == "wikidata_qid":
+        return f"Q{rng.randrange(1, 10**8)}"
+    if field == "audiences":
+        return rng.sample(AUDIENCES, rng.randint(1, 3))
+    if field == "content_types":
+        return rng.sample(CONTENT_TYPES, rng.randint(1, 3))
+    if field == "tasks":
+        return rng.sample(TASKS, rng.randint(1, 3))
+    if field == "subject_domains":
+        return rng.sample(SUBJECT_DOMAINS, rng.randint(1, 2))
+    if field == "for_wikis":
+        return ["*"]
+    if field == "available_ui_languages":
+        return ["en"]
+    if field == "tool_type":
+        return rng.choice(TOOL_TYPES)
+    if field == "icon":
+        return f"https://commons.wikimedia.org/wiki/File:{name}.svg"
+    if field in URL_LIST_FIELDS:
+        return [{"language": "en", "url": f"https://example.org/{name}/{field}"}]
+    return f"https://example.org/{name}/{field}"
+
+
+def missing_count(rng: random.Random) -> int:
+    """Skewed towards a few missing annotations, with a long tail of sparse tools."""
+    return round(rng.betavariate(0.8, 2.5) * len(ANNOTATION_FIELDS))
+
+
+def generate_tool(index: int, rng: random.Random, created: datetime) -> dict:
+    """Return one tool in the shape of a Toolhub /tools/ list entry."""
+    name = f"generated-tool-{index}"
+    missing = set(rng.sample(ANNOTATION_FIELDS, missing_count(rng)))
+    tool = {
+        "name": name,
+        "title": f"Generated Tool {index}",
+        "description": f"Synthetic tool {index} for scaling tests.",
+        "url": f"https://example.org/{name}",
+        "deprecated": rng.random() < DEPRECATED_RATE,
+        "replaced_by": None,
+        "experimental": rng.random() < EXPERIMENTAL_RATE,
+        "annotations": {
+            "deprecated": False,
+            "experimental": False,
+            "replaced_by": None,
+        },
+        "_language": "en",
+        "origin": "api",
+        "created_date": created.isoformat(),
+        "modified_date": created.isoformat(),
+    }
+    for field in ANNOTATION_FIELDS:
+        empty = [] if field in LIST_FIELDS else None
+        tool[field] = empty
+        tool["annotations"][field] = empty
+        if field not in missing:
+            # Present values live either on the core record or in annotations.
+            target = tool if rng.random() < 0.5 else tool["annotations"]
+            target[field] = annotation_value(field, name, rng)
+    return tool
+
+
+def generate_tools(count: int, seed: int = 0, years: float = 5) -> Iterator[dict]:
+    rng = random.Random(seed)
+    now = datetime.now(UTC)
+    for index in range(count):
+        created = now - timedelta(days=rng.random() * 365 * years)
+        yield generate_tool(index, rng, created)
+
+
+def contribution_weights(users: int, exponent: float) -> list[float]:
+    """Cumulative Zipf weights, so user rank r contributes about 1/r**exponent."""
+    return list(
+        itertools.accumulate(1 / rank**exponent for rank in range(1, users + 1))
+    )
+
+
+def recent_biased_age(rng: random.Random, span_seconds: float) -> float:
+    """Activity grows over time, so recent timestamps are more likely."""
+    return span_seconds * (1 - math.sqrt(rng.random()))
+
+
+def generate_completed_tasks(
+    tools: list[tuple[str, str]],
+    count: int,
+    users: int,
+    exponent: float,
+    years: float,
+    seed: int = 0,
+) -> Iterator[tuple[str, str, str, str, datetime]]:
+    """Yield (tool_name, tool_title, field, user, completed_date) rows."""
+    rng = random.Random(seed + 1)
+    cum_weights = contribution_weights(users, exponent)
+    ranks = range(1, users + 1)
+    fields = sorted(settings.active_annotations)
+    now = datetime.now(UTC)
+    span = 365 * 24 * 3600 * years
+    chunk = 10_000
+    for start in range(0, count, chunk):
+        size = min(chunk, count - start)
+        for rank in rng.choices(ranks, cum_weights=cum_weights, k=size):
+            tool_name, tool_title = rng.choice(tools)
+            yield (
+                tool_name,
+                tool_title,
+                rng.choice(fields),
+                f"Contributor {rank}",
+                now - timedelta(seconds=recent_biased_age(rng, span)),
+            )
+
+
+def write_pages(
+    tools: list[dict], directory: Path, page_size: int, base_url: str
+) -> int:
+    """Write tools as Toolhub /tools/ list pages. Returns the number of pages."""
+    directory.mkdir(parents=True, exist_ok=True)
+    pages = max(1, math.ceil(len(tools) / page_size))
+    for page in range(1, pages + 1):
+        url = f"{base_url}/tools/?page={{}}&page_size={page_size}"
+        body = {
+            "count": len(tools),
+            "next": url.format(page + 1) if page < pages else None,
+            "previous": url.format(page - 1) if page > 1 else None,
+            "results": tools[(page - 1) * page_size : page * page_size],
+        }
+        (directory / f"tools-{page:05d}.json").write_text(json.dumps(body))
+    return pages
+
+
+async def load(tools: list[dict], args: argparse.Namespace) -> None:
+    await Tortoise.init(config=TORTOISE_ORM)
+    if args.create_schema:
+        await Tortoise.generate_schemas(safe=True)
+    try:
+        now = datetime.now(UTC)
+        clean = clean_tool_data(tools)
+        await BulkInserter(
+            Tool,
+            [
+                "name",
+                "title",
+                "description",
+                "url",
+                "last_updated",
+                "deprecated",
+                "experimental",
+            ],
+            args.batch_size,
+        ).insert(
+            (t.name, t.title, t.description, t.url, now, False, False) for t in clean
+        )
+        await BulkInserter(
+            Task,
+            ["tool_id", "field", "times_attempted", "last_updated"],
+            args.batch_size,
+        ).insert(
+            (t.name, field, 0, now)
+            for t in clean
+            for field in sorted(t.missing_annotations)
+        )
+
+        await BulkInserter(
+            CompletedTask,
+            ["tool_name", "tool_title", "field", "user", "completed_date"],
+            args.batch_size,
+        ).insert(
+            generate_completed_tasks(
+                [(tool["name"], tool["title"]) for tool in tools],
+                args.completed,
+                args.users,
+                args.exponent,
+                args.years,
+                args.seed,
+            )
+        )
+    finally:
+        await Tortoise.close_connections()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tools", type=int, default=100_000)
+    parser.add_argument("--completed", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=20_000)
+    parser.add_argument(
+        "--exponent", type=float, default=1.1, help="Zipf exponent of contributions"
+    )
+    parser.add_argument("--years", type=float, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument(
+        "--create-schema",
+        action="store_true",
+        help="Create missing tables first, for databases not managed by aerich",
+    )
+    parser.add_argument("--no-db", action="store_true", help="Skip the database load")
+    parser.add_argument("--pages-dir", type=Path, help="Write Toolhub JSON pages here")
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--base-url", default=settings.TOOLHUB_API_BASE_URL)
+    args = parser.parse_args()
+
+    logger.setLevel(logging.INFO)
+    logger.addHandler(logging.StreamHandler())
+
+    start = time.perf_counter()
+    tools = list(generate_tools(args.tools, args.seed, args.years))
+    logger.info(f"Generated {len(tools):,} tools in {time.perf_counter() - start:.1f}s")
+
+    if args.pages_dir:
+        pages = write_pages(tools, args.pages_dir, args.page_size, args.base_url)
+        logger.info(f"Wrote {pages:,} pages to {args.pages_dir}")
+    if not args.no_db:
+        run_async(load(tools, args))
+
+
+if __name__ == "__main__":
+    main()
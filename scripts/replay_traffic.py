@@ -0,0 +1,293 @@
+"""
+This script replays captured traffic against a local Toolhunt instance.
+It performs the following steps:
+1. Reads a log written with TRAFFIC_CAPTURE_PATH set.
+2. Fetches tasks and usernames from the target to fill in path parameters
+   and submissions, since the log contains neither.
+3. Sends each request at its original offset divided by --speed, without
+   waiting for earlier responses. With --speed 0 requests are sent back to
+   back by --concurrency workers instead.
+4. Reports latency percentiles per route next to the captured ones.
+
+Authenticated routes need a session cookie for a user on the target, either
+given with --access-token or minted for --user-id with the local SECRET_KEY.
+
+Usage:
+    python -m scripts.replay_traffic traffic.ndjson --target http://localhost:8000 \
+        --user-id 12345 --speed 2
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+from collections import defaultdict
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+import httpx
+
+from backend.security import create_access_token
+from scripts.generate_data import annotation_value
+
+# Routes that need a browser flow or a Toolhub login and can't be replayed.
+SKIPPED_ROUTE_PREFIXES = ("/api/v1/auth",)
+TASKS_ROUTE = "/api/v1/tasks"
+SUBMIT_ROUTE = "/api/v1/tasks/{task_id}"
+BATCH_ROUTE = "/api/v1/tasks/batch"
+CONTRIBUTIONS_ROUTE = "/api/v1/user/contributions/{username}"
+
+
+def load_records(path: Path, limit: int | None) -> list[dict]:
+    with path.open(encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    records.sort(key=lambda record: record["t"])
+    return records[:limit] if limit else records
+
+
+class RequestBuilder:
+    """Turns captured request shapes into requests valid on the target."""
+
+    def __init__(self, client: httpx.AsyncClient, seed: int):
+        self.client = client
+        self.rng = random.Random(seed)
+        self.tasks: dict[str, list[dict]] = defaultdict(list)
+        self.usernames: list[str] = []
+
+    async def prepare(self, records: list[dict], max_fetches: int) -> None:
+        """Fetch enough tasks for the submissions in the log, and usernames."""
+        needed: dict[str, int] = defaultdict(int)
+        for record in records:
+            body = record.get("b", {})
+            for field in body.get("fields", [body.get("field")]):
+                if field:
+                    needed[field] += 1
+
+        for field, count in needed.items():
+            seen: set[int] = set()
+            for _ in range(max_fetches):
+                if len(seen) >= count:
+                    break
+                response = await self.client.get(
+                    TASKS_ROUTE, params={"field_names": field, "limit": 20}
+                )
+                if response.status_code != 200:
+                    break
+                new = [task for task in response.json() if task["id"] not in seen]
+                if not new:
+                    break
+                seen.update(task["id"] for task in new)
+                self.tasks[field].extend(new)
+            if len(seen) < count:
+                print(f"Only {len(seen)} of {count} {field} tasks available")
+
+        response = await self.client.get("/api/v1/user/contributions/leaderboard")
+        if response.status_code == 200:
+            self.usernames = [
+                row["username"] for row in response.json()["contributions"]
+            ]
+
+    def submission(self, field: str) -> dict | None:
+        if not self.tasks[field]:
+            return None
+        task = self.tasks[field].pop()
+        tool = task["tool"]
+        return {
+            "task_id": task["id"],
+            "tool_name": tool["name"],
+            "tool_title": tool["title"],
+            "completed_date": datetime.now(UTC).isoformat(),
+            "value": annotation_value(field, tool["name"], self.rng),
+            "field": field,
+        }
+
+    def build(self, record: dict) -> tuple[str, str, dict] | None:
+        """Return the method, URL and httpx arguments, or None to skip."""
+        route = record["r"]
+        if route.startswith(SKIPPED_ROUTE_PREFIXES):
+            return None
+        query = "&".join(f"{k}={v}" for k, v in record.get("q", {}).items())
+        kwargs = {}
+        if route == SUBMIT_ROUTE:
+            submission = self.submission(record.get("b", {}).get("field"))
+            if submission is None:
+                return None
+            path = f"{TASKS_ROUTE}/{submission.pop('task_id')}"
+            kwargs["json"] = submission
+        elif route == BATCH_ROUTE:
+            fields = record.get("b", {}).get("fields", [])
+            submissions = [s for s in map(self.submission, fields) if s is not None]
+            if not submissions:
+                return None
+            path = route
+            kwargs["json"] = {"submissions": submissions}
+        elif route == CONTRIBUTIONS_ROUTE:
+            if not self.usernames:
+                return None
+            path = f"/api/v1/user/contributions/{self.rng.choice(self.usernames)}"
+        elif "{" in route:
+            return None
+        else:
+            path = route
+        return record["m"], f"{path}?{query}" if query else path, kwargs
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class Results:
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.captured: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+        self.skipped = 0
+        self.lag = 0.0
+
+    def summary(self) -> dict:
+        summary = {}
+        for route in sorted(self.latencies):
+            replayed = sorted(self.latencies[route])
+            captured = sorted(self.captured[route])
+            summary[route] = {
+                "requests": len(replayed),
+                "errors": self.errors[route],
+                **{
+                    f"p{pct}_ms": round(percentile(replayed, pct), 2)
+                    for pct in (50, 90, 99)
+                },
+                "max_ms": round(replayed[-1], 2),
+                "captured_p50_ms": percentile(captured, 50),
+                "captured_p99_ms": percentile(captured, 99),
+            }
+        return summary
+
+
+async def send(client, builder, record, results, semaphore) -> None:
+    request = builder.build(record)
+    if request is None:
+        results.skipped += 1
+        return
+    method, url, kwargs = request
+    async with semaphore:
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            failed = response.status_code >= 500
+        except httpx.HTTPError:
+            failed = True
+        elapsed = (time.perf_counter() - start) * 1000
+    route = record["r"]
+    results.latencies[route].append(elapsed)
+    results.captured[route].append(record["d"])
+    if failed:
+        results.errors[route] += 1
+
+
+async def replay(records: list[dict], args: argparse.Namespace) -> Results:
+    cookies = {}
+    if args.access_token:
+        cookies["access_token"] = args.access_token
+    elif args.user_id:
+        cookies["access_token"] = create_access_token(args.user_id, timedelta(days=1))
+
+    results = Results()
+    limits = httpx.Limits(max_connections=args.max_in_flight)
+    async with httpx.AsyncClient(
+        base_url=args.target, cookies=cookies, timeout=args.timeout, limits=limits
+    ) as client:
+        builder = RequestBuilder(client, args.seed)
+        await builder.prepare(records, args.max_task_fetches)
+
+        if args.speed == 0:
+            queue = iter(records)
+            semaphore = asyncio.Semaphore(args.concurrency)
+
+            async def worker():
+                for record in queue:
+                    await send(client, builder, record, results, semaphore)
+
+            await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+            return results
+
+        semaphore = asyncio.Semaphore(args.max_in_flight)
+        first = records[0]["t"]
+        start = time.monotonic()
+        pending = set()
+        for record in records:
+            due = start + (record["t"] - first) / args.speed
+            delay = due - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                results.lag = max(results.lag, -delay)
+            task = asyncio.create_task(
+                send(client, builder, record, results, semaphore)
+            )
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        if pending:
+            await asyncio.wait(pending)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("log", type=Path)
+    parser.add_argument("--target", default="http://localhost:8000")
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=1.0,
+        help="Replay speed relative to capture; 0 sends back to back",
+    )
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--max-in-flight", type=int, default=200)
+    parser.add_argument("--limit", type=int, help="Replay only the first N requests")
+    parser.add_argument("--user-id", help="Mint a session cookie for this user")
+    parser.add_argument("--access-token", help="Session cookie value to send")
+    parser.add_argument("--max-task-fetches", type=int, default=200)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="Write the report as JSON")
+    args = parser.parse_args()
+
+    records = load_records(args.log, args.limit)
+    if not records:
+        parser.error(f"No requests in {args.log}")
+    span = records[-1]["t"] - records[0]["t"]
+    print(f"Replaying {len(records):,} requests captured over {span:.0f}s")
+
+    start = time.perf_counter()
+    results = asyncio.run(replay(records, args))
+    elapsed = time.perf_counter() - start
+
+    summary = results.summary()
+    for route, row in summary.items():
+        print(
+            f"{row['requests']:>7} {route:<42} p50 {row['p50_ms']:>8.1f}ms "
+            f"p90 {row['p90_ms']:>8.1f}ms p99 {row['p99_ms']:>8.1f}ms "
+            f"(captured p50 {row['captured_p50_ms']:.1f}ms "
+            f"p99 {row['captured_p99_ms']:.1f}ms) errors={row['errors']}"
+        )
+    sent = sum(len(latencies) for latencies in results.latencies.values())
+    print(
+        f"Sent {sent:,} requests in {elapsed:.1f}s, skipped {results.skipped:,}, "
+        f"max schedule lag {results.lag * 1000:.0f}ms"
+    )
+    if args.output:
+        report = {
+            "log": str(args.log),
+            "speed": args.speed,
+            "elapsed_s": round(elapsed, 2),
+            "skipped": results.skipped,
+            "routes": summary,
+        }
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
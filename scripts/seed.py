@@ -1,13 +1,18 @@
-import json
+import argparse
 import logging
-from datetime import datetime
+from collections import Counter
+from datetime import UTC, datetime
 from pathlib import Path
+from typing import Iterator
 
 from tortoise import Tortoise, run_async
-from tortoise.exceptions import IntegrityError
 
+from backend.bulk import BulkInserter, batched
+from backend.config import get_settings
 from backend.db import TORTOISE_ORM
+from backend.instrumentation import instrument_tortoise, track_queries
 from backend.models.tortoise import CompletedTask
+from scripts.snapshot import iter_records
 from scripts.update_db import run_pipeline
 
 logging.basicConfig(
@@ -25,77 +30,127 @@ DATA_DIR = BASE_DIR / "tests" / "fixtures"
 
 TOOL_DATA_PATH = DATA_DIR / "tool_data.json"
 COMPLETED_TASK_DATA_PATH = DATA_DIR / "completed_task_data.json"
+COMPLETED_TASK_BATCH_SIZE = 5000
 
 
 async def init():
     """Initialize the Tortoise ORM with the given configuration."""
     await Tortoise.init(config=TORTOISE_ORM)
+    instrument_tortoise(get_settings().SLOW_QUERY_THRESHOLD_MS)
 
 
-async def insert_tools():
-    """Insert tool data from a JSON file and create tasks."""
-    with TOOL_DATA_PATH.open("r") as f:
-        tool_data = json.load(f)
+async def insert_tools(path=TOOL_DATA_PATH):
+    """Insert tool data from an NDJSON or JSON array file and create tasks."""
+    await run_pipeline(snapshot=path)
 
-    await run_pipeline(test_data=tool_data)
 
-
-async def insert_completed_tasks():
-    """Insert completed task data from a JSON file into the database."""
-    await init()
-
-    with COMPLETED_TASK_DATA_PATH.open("r") as f:
-        completed_task_data = json.load(f)
-
-    inserted_count = 0
-    skipped_count = 0
-
-    for task_data in completed_task_data:
+def completed_task_rows(records, skipped: Counter) -> Iterator[tuple]:
+    """Turn completed task records into rows, counting the invalid ones."""
+    for task_data in records:
         try:
             completed_date = datetime.fromisoformat(
                 task_data["completed_date"].replace("Z", "+00:00")
             )
-
-            _, created = await CompletedTask.get_or_create(
-                tool_name=task_data["tool_name"],
-                tool_title=task_data["tool_title"],
-                field=task_data["field"],
-                user=task_data["user"],
-                completed_date=completed_date,
+            # Stored dates are UTC; match them so the unique key catches repeats.
+            if completed_date.tzinfo is None:
+                completed_date = completed_date.replace(tzinfo=UTC)
+            yield (
+                task_data["tool_name"],
+                task_data["tool_title"],
+                task_data["field"],
+                task_data["user"],
+                completed_date,
             )
+        except (KeyError, TypeError, AttributeError, ValueError) as e:
+            skipped["invalid"] += 1
+            logger.debug(f"Skipping invalid completed task {task_data}: {e!r}")
+
+
+def unique_per_batch(rows, batch_size: int, skipped: Counter) -> Iterator[tuple]:
+    """Drop rows repeating the unique key of an earlier row in their batch."""
+    for batch in batched(rows, batch_size):
+        seen = set()
+        for row in batch:
+            tool_name, _, field, user, completed_date = row
+            key = (tool_name, field, user, completed_date)
+            if key in seen:
+                skipped["duplicate"] += 1
+                continue
+            seen.add(key)
+            yield row
+
+
+async def insert_completed_tasks(
+    path=COMPLETED_TASK_DATA_PATH, batch_size=COMPLETED_TASK_BATCH_SIZE
+):
+    """
+    Insert completed task data from an NDJSON or JSON array file in batches.
+    Rows repeating the unique key within a batch are dropped before sending,
+    and rows already stored are ignored by the database.
+    """
+    await init()
 
-            if created:
-                inserted_count += 1
-                logger.info(
-                    f"Inserted task: {task_data['tool_name']} - {task_data['field']} by {task_data['user']}"
-                )
-            else:
-                skipped_count += 1
-                logger.info(
-                    f"Skipped existing task: {task_data['tool_name']} - {task_data['field']} by {task_data['user']}"
-                )
-
-        except IntegrityError as e:
-            logger.error(f"IntegrityError inserting task: {str(e)}")
-            logger.error(f"Task data: {task_data}")
-        except Exception as e:
-            logger.error(f"Error inserting completed task: {str(e)}")
-            logger.error(f"Task data: {task_data}")
+    skipped: Counter = Counter()
+    inserter = BulkInserter(
+        CompletedTask,
+        ["tool_name", "tool_title", "field", "user", "completed_date"],
+        batch_size,
+    )
+    sent = await inserter.insert(
+        unique_per_batch(
+            completed_task_rows(iter_records(path), skipped), batch_size, skipped
+        )
+    )
+    inserted = inserter.inserted
+    skipped["already stored"] = sent - inserted
 
+    summary = ", ".join(f"{count:,} {reason}" for reason, count in skipped.items())
     logger.info(
-        f"Insertion complete. Inserted: {inserted_count}, Skipped: {skipped_count}"
+        f"Insertion complete. Inserted: {inserted:,}, "
+        f"Skipped: {sum(skipped.values()):,} ({summary})"
     )
 
 
-async def seed():
+async def seed(
+    tools_path=TOOL_DATA_PATH,
+    completed_path=COMPLETED_TASK_DATA_PATH,
+    batch_size=COMPLETED_TASK_BATCH_SIZE,
+):
     """Run the seeding process to insert tools and completed tasks."""
     await init()
-    await insert_tools()
+    await insert_tools(tools_path)
     await Tortoise.close_connections()
 
-    await insert_completed_tasks()
+    with track_queries("seed completed tasks"):
+        await insert_completed_tasks(completed_path, batch_size)
     await Tortoise.close_connections()
 
 
+def main():
+    parser = argparse.ArgumentParser(
+        description="Seed the database with tools and completed tasks."
+    )
+    parser.add_argument(
+        "--tools",
+        type=Path,
+        default=TOOL_DATA_PATH,
+        help="Tool snapshot, as NDJSON or a JSON array",
+    )
+    parser.add_argument(
+        "--completed",
+        type=Path,
+        default=COMPLETED_TASK_DATA_PATH,
+        help="Completed task snapshot, as NDJSON or a JSON array",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=COMPLETED_TASK_BATCH_SIZE,
+        help="Completed tasks per INSERT and transaction",
+    )
+    args = parser.parse_args()
+    run_async(seed(args.tools, args.completed, args.batch_size))
+
+
 if __name__ == "__main__":
-    run_async(seed())
+    main()
@@ -0,0 +1,128 @@
+"""
+Streams records out of tool and contribution snapshots without loading the
+whole file.
+
+Two formats are read:
+1. NDJSON, one record per line.
+2. A JSON array, such as the fixtures in tests/fixtures. The file is
+   memory-mapped and the array parsed one element at a time.
+The format is picked from the first non-blank byte, so either can be passed
+wherever a snapshot is expected. Memory use stays at about one read chunk
+plus one page of records, whatever the size of the file.
+"""
+
+import asyncio
+import codecs
+import json
+import mmap
+from pathlib import Path
+from typing import Any, AsyncIterator, Iterator
+
+from backend.bulk import batched
+
+CHUNK_SIZE = 1 << 20
+WHITESPACE = " \t\r\n"
+
+
+def _first_byte(path: Path) -> bytes:
+    with path.open("rb") as f:
+        while chunk := f.read(4096):
+            stripped = chunk.lstrip()
+            if stripped:
+                return stripped[:1]
+    return b""
+
+
+def iter_ndjson(path: Path) -> Iterator[Any]:
+    with path.open("r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    raise ValueError(f"{path}:{line_number}: {e}") from e
+
+
+def iter_json_array(path: Path, chunk_size: int = CHUNK_SIZE) -> Iterator[Any]:
+    """Yield the elements of a top-level JSON array one at a time."""
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    with path.open("rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        offset = 0
+        buffer = ""
+        position = 0
+
+        def read_more() -> bool:
+            """Append the next chunk, dropping what was parsed. False at EOF."""
+            nonlocal buffer, position, offset
+            if offset >= len(m):
+                return False
+            chunk = m[offset : offset + chunk_size]
+            offset += len(chunk)
+            buffer = buffer[position:] + utf8.decode(chunk, final=offset >= len(m))
+            position = 0
+            return True
+
+        def next_char() -> str:
+            """The next non-blank character, without consuming it."""
+            nonlocal position
+            while True:
+                while position < len(buffer) and buffer[position] in WHITESPACE:
+                    position += 1
+                if position < len(buffer):
+                    return buffer[position]
+                if not read_more():
+                    raise ValueError(f"{path}: unexpected end of JSON array")
+
+        if next_char() != "[":
+            raise ValueError(f"{path}: expected a JSON array")
+        position += 1
+        if next_char() == "]":
+            return
+        while True:
+            next_char()
+            # An element cut short by the end of the buffer can still parse,
+            # like a number, so only trust a parse followed by a separator.
+            while True:
+                try:
+                    element, end = decoder.raw_decode(buffer, position)
+                    following = end
+                    while following < len(buffer) and buffer[following] in WHITESPACE:
+                        following += 1
+                    if following < len(buffer) and buffer[following] in ",]":
+                        break
+                except ValueError:
+                    if offset >= len(m):
+                        raise
+                if not read_more():
+                    break
+            yield element
+            position = end
+            separator = next_char()
+            position += 1
+            if separator == "]":
+                return
+            if separator != ",":
+                raise ValueError(f"{path}: expected ',' or ']' after an element")
+
+
+def iter_records(path: Path) -> Iterator[Any]:
+    """Yield the records of an NDJSON file or a JSON array file."""
+    path = Path(path)
+    first = _first_byte(path)
+    if not first:
+        return iter(())
+    if first == b"[":
+        return iter_json_array(path)
+    return iter_ndjson(path)
+
+
+async def iter_pages(path: Path, page_size: int) -> AsyncIterator[list]:
+    """
+    Yields the records of a snapshot in lists of `page_size`, like
+    ToolhubClient.iter_pages, parsing each page in a thread so the stages
+    reading them keep running.
+    """
+    pages = batched(iter_records(path), page_size)
+    while page := await asyncio.to_thread(next, pages, None):
+        yield page
@@ -1,23 +1,36 @@
 """
 This script updates the database with tool and task information from the Toolhub API.
 It performs the following steps:
-1. Extracts raw tool data from the Toolhub API.
-2. Cleans and transforms the raw data.
-3. Inserts or updates tool records and removes stale tools.
-4. Inserts or updates task records and removes stale tasks.
+1. Extracts raw tool data from the Toolhub API, page by page, or streams it
+   from a snapshot file given with --snapshot (NDJSON or a JSON array).
+2. Cleans and transforms each page.
+3. Writes new and changed tools and their new tasks in batches.
+4. Removes the tools and tasks that are no longer in the data.
+The three stages run concurrently, connected by bounded queues. A run report
+with the time, statements and rows of each phase is logged at the end.
+With --incremental, only the tools in Toolhub's recent changes since the
+last incremental run are re-evaluated instead.
+The pipeline itself lives in backend.sync, which the app can also run on a
+schedule.
+
+Usage:
+    python -m scripts.update_db [--incremental] [--dry-run] [--report report.json]
+    python -m scripts.update_db --snapshot tools.ndjson
 """
 
-import datetime
+import argparse
+import json
 import logging
-from dataclasses import dataclass
+from pathlib import Path
 
 from tortoise import Tortoise, run_async
-from tortoise.exceptions import DoesNotExist
 
 from backend.config import get_settings
-from backend.db import TORTOISE_ORM
-from backend.models.tortoise import Task, Tool
+from backend.db import TORTOISE_ORM, advisory_lock
+from backend.instrumentation import instrument_tortoise
+from backend.sync import SyncReport, list_pages, run_incremental_sync, run_sync
 from backend.utils import ToolhubClient
+from scripts.snapshot import iter_pages
 
 settings = get_settings()
 
@@ -37,159 +50,71 @@ logger = logging.getLogger()
 async def init():
     """Initialize the Tortoise ORM with the given configuration."""
     await Tortoise.init(config=TORTOISE_ORM)
-
-
-# Functions
-@dataclass
-class ToolhuntTool:
-    name: str
-    title: str
-    description: str
-    url: str
-    missing_annotations: set[str]
-    deprecated: bool
-    experimental: bool
-
-    @property
-    def is_completed(self):
-        return len(self.missing_annotations) == 0
-
-
-def is_deprecated(tool):
-    return tool["annotations"]["deprecated"] is True or tool["deprecated"] is True
-
-
-def is_experimental(tool):
-    return tool["annotations"]["experimental"] is True or tool["experimental"] is True
-
-
-def get_missing_annotations(tool_info, filter_by=settings.active_annotations):
-    missing = set()
-
-    for k, v in tool_info["annotations"].items():
-        value = v or tool_info.get(k, v)
-        if value in (None, [], "") and k in filter_by:
-            missing.add(k)
-
-    return missing
-
-
-def clean_tool_data(tool_data):
-    tools = []
-    for tool in tool_data:
-        missing_annotations = get_missing_annotations(tool)
-        t = ToolhuntTool(
-            name=tool["name"],
-            title=tool["title"],
-            description=tool["description"],
-            url=tool["url"],
-            missing_annotations=missing_annotations,
-            deprecated=is_deprecated(tool),
-            experimental=is_experimental(tool),
-        )
-        if not t.deprecated and not t.experimental and missing_annotations:
-            tools.append(t)
-        else:
-            logger.info(
-                f"Tool {t.name} is deprecated:{t.deprecated}, experimental:{t.experimental}, has {len(t.missing_annotations)} missing annotations. It will not be added to the database."
-            )
-    return tools
-
-
-async def upsert_tool(tool):
-    """Inserts a tool in the Tool table if it doesn't exist, and updates it if it does."""
-    await Tool.update_or_create(
-        defaults={
-            "title": tool.title,
-            "description": tool.description,
-            "url": tool.url,
-        },
-        name=tool.name,
-    )
-
-
-async def remove_stale_tools(timestamp):
-    """Removes expired tools from the Tool table."""
-    logger.info(f"Removing stale tools with last_updated < {timestamp}")
-    stale_tools = await Tool.filter(last_updated__lt=timestamp)
-    for tool in stale_tools:
-        logger.info(
-            f"Removing tool: name={tool.name}, last_updated={tool.last_updated}"
-        )
-    await Tool.filter(last_updated__lt=timestamp).delete()
-
-
-async def update_tool_table(tools, timestamp):
-    """Upserts tool records and removes stale tools"""
-    for tool in tools:
-        await upsert_tool(tool)
-    await remove_stale_tools(timestamp)
-
-
-async def upsert_task(tool, field):
-    """Inserts a task in the Task table if it doesn't exist or updates a timestamp."""
-    await Task.update_or_create(
-        tool=tool,
-        field=field,
-    )
-    logger.info(f"Task created or already exists: tool_name={tool.name}, field={field}")
-
-
-async def remove_stale_tasks(timestamp):
-    """Removes expired tasks from the Task table."""
-    logger.info(f"Removing stale tasks with last_updated < {timestamp}")
-    stale_tasks = await Task.filter(last_updated__lt=timestamp).prefetch_related("tool")
-    for task in stale_tasks:
-        logger.info(
-            f"Removing task: tool_name={task.tool.name}, field={task.field}, last_updated={task.last_updated}"
-        )
-    await Task.filter(last_updated__lt=timestamp).delete()
-
-
-async def update_task_table(tools, timestamp):
-    """Inserts task records"""
-    for tool in tools:
-        try:
-            tool_instance = await Tool.get(name=tool.name)
-            for field_name in tool.missing_annotations:
-                await Task.update_or_create(
-                    tool=tool_instance,
-                    field=field_name,
-                )
-                logger.info(
-                    f"Task created or updated: tool={tool.name}, field={field_name}"
-                )
-        except DoesNotExist:
-            logger.warning(f"Tool does not exist for tasks with tool {tool.name}.")
-
-    await remove_stale_tasks(timestamp)
+    instrument_tortoise(settings.SLOW_QUERY_THRESHOLD_MS)
 
 
 # Pipeline
 # This will populate the db if empty, or update all tool and task records if not.
-async def run_pipeline(test_data=None):
+async def run_pipeline(
+    test_data=None, dry_run=False, report_path=None, incremental=False, snapshot=None
+):
+    report = SyncReport(dry_run=dry_run)
     try:
-        # Extract
         logger.info("Starting database update...")
         await init()
-        tools_raw_data = test_data if test_data else await toolhub_client.get_all()
-        logger.info("Raw data received. Cleaning...")
-        # Transform
-        tools_clean_data = clean_tool_data(tools_raw_data)
-        logger.info("Raw data cleaned. Updating tools..")
-        # Load
-        timestamp = datetime.datetime.now(datetime.timezone.utc).strftime(
-            "%Y-%m-%d %H:%M:%S"
-        )
-        await update_tool_table(tools_clean_data, timestamp)
-        logger.info("Tools updated. Updating tasks...")
-        await update_task_table(tools_clean_data, timestamp)
-        logger.info("Tasks updated. Database update completed.")
+        if snapshot:
+            pages = iter_pages(snapshot, settings.SYNC_BATCH_SIZE)
+        elif test_data:
+            pages = list_pages(test_data)
+        else:
+            pages = toolhub_client.iter_pages(settings.SYNC_PAGE_SIZE)
+        async with advisory_lock(settings.SYNC_LOCK_NAME) as acquired:
+            if not acquired:
+                logger.warning("Another process is updating the database, skipping.")
+                return report
+            if incremental:
+                await run_incremental_sync(toolhub_client, report)
+            else:
+                await run_sync(pages, report)
+        if report_path:
+            with open(report_path, "w", encoding="utf-8") as f:
+                json.dump(report.as_dict(), f, indent=2)
+        logger.info("Database update completed.")
     except Exception as err:
         logger.error(f"{err.args}")
     finally:
         await Tortoise.close_connections()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Compute and report the changes without writing them",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only re-evaluate the tools changed since the last incremental run",
+    )
+    parser.add_argument(
+        "--snapshot",
+        type=Path,
+        help="Read the tools from this NDJSON or JSON array file, not Toolhub",
+    )
+    parser.add_argument("--report", help="Also write the run report to this file")
+    args = parser.parse_args()
+    run_async(
+        run_pipeline(
+            dry_run=args.dry_run,
+            report_path=args.report,
+            incremental=args.incremental,
+            snapshot=args.snapshot,
+        )
+    )
 
 
 if __name__ == "__main__":
-    run_async(run_pipeline())
+    main()
@@ -0,0 +1,150 @@
+import asyncio
+from datetime import UTC, datetime
+
+import pytest
+from tortoise import Tortoise
+
+from backend.bulk import (
+    BulkInserter,
+    batched,
+    bulk_insert,
+    bulk_upsert,
+    insert_sql,
+    to_db,
+)
+from backend.instrumentation import track_queries
+from backend.models.tortoise import CompletedTask, Tool
+
+TOOL_COLUMNS = ["name", "title", "description", "url"]
+COMPLETED_COLUMNS = ["tool_name", "tool_title", "field", "user", "completed_date"]
+
+
+def test_insert_mysql():
+    assert insert_sql(Tool, ["name", "title"], "mysql") == (
+        "INSERT INTO `tool` (`name`,`title`) VALUES (%s,%s)"
+    )
+
+
+def test_insert_sqlite():
+    assert insert_sql(Tool, ["name", "title"], "sqlite") == (
+        'INSERT INTO "tool" ("name","title") VALUES (?,?)'
+    )
+
+
+@pytest.mark.parametrize(
+    "dialect, verb", [("mysql", "INSERT IGNORE"), ("sqlite", "INSERT OR IGNORE")]
+)
+def test_insert_ignoring_conflicts(dialect, verb):
+    sql = insert_sql(CompletedTask, COMPLETED_COLUMNS, dialect, ignore_conflicts=True)
+    assert sql.startswith(f"{verb} INTO ")
+
+
+def test_upsert_mysql():
+    sql = insert_sql(
+        Tool, TOOL_COLUMNS, "mysql", conflict=["name"], update=["title", "url"]
+    )
+    assert sql == (
+        "INSERT INTO `tool` (`name`,`title`,`description`,`url`) "
+        "VALUES (%s,%s,%s,%s) "
+        "ON DUPLICATE KEY UPDATE `title`=VALUES(`title`),`url`=VALUES(`url`)"
+    )
+
+
+def test_upsert_sqlite():
+    sql = insert_sql(
+        Tool, TOOL_COLUMNS, "sqlite", conflict=["name"], update=["title", "url"]
+    )
+    assert sql == (
+        'INSERT INTO "tool" ("name","title","description","url") '
+        "VALUES (?,?,?,?) "
+        'ON CONFLICT ("name") DO UPDATE SET '
+        '"title"=excluded."title","url"=excluded."url"'
+    )
+
+
+def test_to_db():
+    date = datetime(2024, 1, 2, 3, 4, 5, tzinfo=UTC)
+    assert to_db(date, "sqlite") == "2024-01-02 03:04:05+00:00"
+    assert to_db(date, "mysql") is date
+    assert to_db("text", "sqlite") == "text"
+
+
+def test_batched():
+    rows = ((i,) for i in range(5))
+    assert list(batched(rows, 2)) == [[(0,), (1,)], [(2,), (3,)], [(4,)]]
+    assert list(batched([], 2)) == []
+
+
+def with_database(scenario):
+    async def run():
+        await Tortoise.init(
+            db_url="sqlite://:memory:",
+            modules={"models": ["backend.models.tortoise"]},
+        )
+        await Tortoise.generate_schemas()
+        try:
+            return await scenario()
+        finally:
+            await Tortoise.close_connections()
+
+    return asyncio.run(run())
+
+
+def test_bulk_upsert_on_sqlite():
+    async def scenario():
+        await bulk_insert(Tool, TOOL_COLUMNS, [("a", "A", "d", "u")])
+        sent = await bulk_upsert(
+            Tool,
+            TOOL_COLUMNS,
+            [("a", "A2", "d2", "u2"), ("b", "B", "d", "u")],
+            conflict=["name"],
+            update=["title", "url"],
+            batch_size=1,
+        )
+        tools = (
+            await Tool.all()
+            .order_by("name")
+            .values_list("name", "title", "description", "url")
+        )
+        return sent, tools
+
+    sent, tools = with_database(scenario)
+    assert sent == 2
+    assert tools == [("a", "A2", "d", "u2"), ("b", "B", "d", "u")]
+
+
+def test_bulk_insert_ignores_conflicts_on_sqlite():
+    async def scenario():
+        date = datetime(2024, 1, 1, tzinfo=UTC)
+        row = ("a", "A", "audiences", "user", date)
+        sent = await bulk_insert(
+            CompletedTask,
+            COMPLETED_COLUMNS,
+            [row, row, ("a", "A", "tasks", "user", date)],
+            ignore_conflicts=True,
+        )
+        return sent, await CompletedTask.all().count()
+
+    assert with_database(scenario) == (3, 2)
+
+
+def test_bulk_inserter_counts_inserted_rows():
+    async def scenario():
+        date = datetime(2024, 1, 1, tzinfo=UTC)
+        rows = [("a", "A", field, "user", date) for field in ("x", "y", "z")]
+        await bulk_insert(CompletedTask, COMPLETED_COLUMNS, rows[:1])
+        inserter = BulkInserter(CompletedTask, COMPLETED_COLUMNS, batch_size=2)
+        sent = await inserter.insert(rows + rows[1:2])
+        return sent, inserter.inserted
+
+    assert with_database(scenario) == (4, 2)
+
+
+def test_bulk_statements_are_counted():
+    async def scenario():
+        rows = [(name, name, "d", "u") for name in "abcde"]
+        with track_queries("test") as stats:
+            await bulk_insert(Tool, TOOL_COLUMNS, rows, batch_size=2)
+        return stats.count
+
+    assert with_database(scenario) == 3
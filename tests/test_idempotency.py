@@ -0,0 +1,144 @@
+import asyncio
+
+import pytest
+
+from backend.exceptions import IdempotencyKeyError
+from backend.idempotency import IdempotencyStore, request_fingerprint
+
+
+class Handler:
+    """Counts its calls, optionally waiting for a release or failing."""
+
+    def __init__(self, result="done", fail=False):
+        self.result = result
+        self.fail = fail
+        self.calls = 0
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        if self.fail:
+            raise RuntimeError("handler failed")
+        return self.result
+
+
+def test_fingerprint_depends_on_every_part():
+    assert request_fingerprint(1, "a") == request_fingerprint(1, "a")
+    assert request_fingerprint(1, "a") != request_fingerprint(1, "b")
+    assert request_fingerprint("1a") != request_fingerprint("1", "a")
+
+
+def test_replays_stored_result():
+    async def scenario():
+        store = IdempotencyStore()
+        handler = Handler()
+        first = await store.run("key", "fp", handler)
+        second = await store.run("key", "fp", handler)
+        return first, second, handler.calls
+
+    assert asyncio.run(scenario()) == (("done", False), ("done", True), 1)
+
+
+def test_keys_are_independent():
+    async def scenario():
+        store = IdempotencyStore()
+        handler = Handler()
+        await store.run("a", "fp", handler)
+        await store.run("b", "fp", handler)
+        return handler.calls
+
+    assert asyncio.run(scenario()) == 2
+
+
+def test_key_reused_for_different_request():
+    async def scenario():
+        store = IdempotencyStore()
+        await store.run("key", "fp", Handler())
+        await store.run("key", "other", Handler())
+
+    with pytest.raises(IdempotencyKeyError):
+        asyncio.run(scenario())
+
+
+def test_concurrent_duplicate_waits_for_first():
+    async def scenario():
+        store = IdempotencyStore()
+        handler = Handler()
+        handler.release.clear()
+        first = asyncio.create_task(store.run("key", "fp", handler))
+        second = asyncio.create_task(store.run("key", "fp", handler))
+        await asyncio.sleep(0)
+        handler.release.set()
+        return await first, await second, handler.calls
+
+    assert asyncio.run(scenario()) == (("done", False), ("done", True), 1)
+
+
+def test_failure_is_not_stored():
+    async def scenario():
+        store = IdempotencyStore()
+        with pytest.raises(RuntimeError):
+            await store.run("key", "fp", Handler(fail=True))
+        handler = Handler()
+        return await store.run("key", "fp", handler), handler.calls
+
+    assert asyncio.run(scenario()) == (("done", False), 1)
+
+
+def test_duplicate_of_failed_request_runs_again():
+    async def scenario():
+        store = IdempotencyStore()
+        failing = Handler(fail=True)
+        failing.release.clear()
+        first = asyncio.create_task(store.run("key", "fp", failing))
+        retry = Handler("retried")
+        second = asyncio.create_task(store.run("key", "fp", retry))
+        await asyncio.sleep(0)
+        failing.release.set()
+        with pytest.raises(RuntimeError):
+            await first
+        return await second, retry.calls
+
+    assert asyncio.run(scenario()) == (("retried", False), 1)
+
+
+def test_expired_entries_run_again():
+    async def scenario():
+        store = IdempotencyStore(ttl=0)
+        handler = Handler()
+        await store.run("key", "fp", handler)
+        await asyncio.sleep(0.01)
+        return await store.run("key", "fp", handler), handler.calls
+
+    assert asyncio.run(scenario()) == (("done", False), 2)
+
+
+def test_evicts_least_recently_used():
+    async def scenario():
+        store = IdempotencyStore(max_entries=2)
+        handler = Handler()
+        await store.run("a", "fp", handler)
+        await store.run("b", "fp", handler)
+        await store.run("a", "fp", handler)  # a is now the most recent
+        await store.run("c", "fp", handler)
+        return list(store._entries)
+
+    assert asyncio.run(scenario()) == ["a", "c"]
+
+
+def test_running_entries_are_not_evicted():
+    async def scenario():
+        store = IdempotencyStore(max_entries=1)
+        slow = Handler()
+        slow.release.clear()
+        running = asyncio.create_task(store.run("a", "fp", slow))
+        await asyncio.sleep(0)
+        await store.run("b", "fp", Handler())
+        keys = list(store._entries)
+        slow.release.set()
+        await running
+        return keys
+
+    assert asyncio.run(scenario()) == ["a", "b"]
@@ -0,0 +1,114 @@
+import asyncio
+
+from fastapi import HTTPException
+from tortoise import Tortoise
+
+from backend.models.pydantic import ToolhubSubmission
+from backend.models.tortoise import OutboxStatus, ToolhubOutbox
+from backend.outbox import OutboxWorker, enqueue_submissions
+
+
+def with_database(scenario):
+    async def run():
+        await Tortoise.init(
+            db_url="sqlite://:memory:",
+            modules={"models": ["backend.models.tortoise"]},
+        )
+        await Tortoise.generate_schemas()
+        try:
+            return await scenario()
+        finally:
+            await Tortoise.close_connections()
+
+    return asyncio.run(run())
+
+
+class Toolhub:
+    """Records each PUT and rejects any carrying Q0."""
+
+    def __init__(self):
+        self.puts = []
+
+    async def deliver(self, entries):
+        qids = [entry.payload.get("wikidata_qid") for entry in entries]
+        self.puts.append(qids)
+        if "Q0" in qids:
+            raise HTTPException(status_code=400, detail="Invalid wikidata_qid")
+
+
+async def queue(*qids):
+    await enqueue_submissions(
+        [("tool", ToolhubSubmission(wikidata_qid=qid)) for qid in qids], "1"
+    )
+
+
+async def deliver_due(worker):
+    while batches := await worker._claim(worker.concurrency):
+        for batch in batches:
+            await worker._process(batch)
+
+
+async def statuses():
+    return await ToolhubOutbox.all().order_by("id").values_list("status", flat=True)
+
+
+def test_coalesced_submissions_share_one_put():
+    async def scenario():
+        toolhub = Toolhub()
+        await queue("Q1", "Q2", "Q3")
+        await deliver_due(OutboxWorker(toolhub.deliver))
+        return toolhub.puts, set(await statuses())
+
+    puts, result = with_database(scenario)
+    assert puts == [["Q1", "Q2", "Q3"]]
+    assert result == {OutboxStatus.DONE}
+
+
+def test_rejected_merged_put_is_retried_row_by_row():
+    async def scenario():
+        toolhub = Toolhub()
+        await queue("Q1", "Q0", "Q3")
+        await deliver_due(OutboxWorker(toolhub.deliver))
+        return toolhub.puts, await ToolhubOutbox.all().order_by("id")
+
+    puts, entries = with_database(scenario)
+    assert puts == [["Q1", "Q0", "Q3"], ["Q1"], ["Q0"], ["Q3"]]
+    assert [entry.status for entry in entries] == [
+        OutboxStatus.DONE,
+        OutboxStatus.DEAD,
+        OutboxStatus.DONE,
+    ]
+    assert entries[1].last_error == "Invalid wikidata_qid"
+
+
+def test_rejected_single_row_goes_to_dead_letter():
+    async def scenario():
+        toolhub = Toolhub()
+        await queue("Q0")
+        await deliver_due(OutboxWorker(toolhub.deliver))
+        return toolhub.puts, await ToolhubOutbox.get()
+
+    puts, entry = with_database(scenario)
+    assert puts == [["Q0"]]
+    assert entry.status == OutboxStatus.DEAD
+    assert not entry.isolated
+
+
+def test_stop_abandons_stuck_deliveries():
+    async def scenario():
+        started = asyncio.Event()
+
+        async def stuck(entries):
+            started.set()
+            await asyncio.Event().wait()
+
+        await queue("Q1")
+        worker = OutboxWorker(stuck, poll_interval=0.01, shutdown_timeout=0.1)
+        worker.start()
+        await asyncio.wait_for(started.wait(), 5)
+        await asyncio.wait_for(worker.stop(), 5)
+        return await ToolhubOutbox.get()
+
+    entry = with_database(scenario)
+    assert entry.status == OutboxStatus.PENDING
+    assert entry.attempts == 1
@@ -0,0 +1,69 @@
+import asyncio
+
+from backend.sync import SyncReport, read_recent_changes, recent_changes_unnamed
+
+
+class RecentChangesClient:
+    """Serves fixed pages of the recent changes feed."""
+
+    def __init__(self, *pages):
+        self.pages = pages
+
+    async def iter_recent_changes(self, page_size=None):
+        for page in self.pages:
+            yield page
+
+
+def change(id, type="tool", name=None):
+    target = {"type": type}
+    if name is not None:
+        target["name"] = name
+    return {"id": id, "target": target}
+
+
+def read(client, high_water_mark):
+    return asyncio.run(read_recent_changes(client, high_water_mark, SyncReport()))
+
+
+def test_reads_down_to_the_mark():
+    client = RecentChangesClient(
+        [change(9, name="a"), change(8, "annotations", "b"), change(7, "list")],
+        [change(6, name="a"), change(5, name="c"), change(4, name="d")],
+        [change(3, name="e")],
+    )
+    assert read(client, 5) == ({"a", "b"}, 9)
+
+
+def test_first_run_only_records_the_newest_change():
+    client = RecentChangesClient([change(9, name="a")], [change(8, name="b")])
+    assert read(client, None) == (set(), 9)
+
+
+def test_empty_feed():
+    assert read(RecentChangesClient(), None) == (set(), 0)
+    assert read(RecentChangesClient([]), 4) == (set(), 4)
+
+
+def test_unnamed_tool_edits_keep_the_mark():
+    before = recent_changes_unnamed.labels().value
+    client = RecentChangesClient([change(9), change(8, "annotations"), change(7)])
+    assert read(client, 5) == (set(), 5)
+    assert recent_changes_unnamed.labels().value == before + 3
+
+
+def test_unnamed_tool_edits_on_first_run_record_no_mark():
+    client = RecentChangesClient([change(9), change(8)])
+    assert read(client, None) == (set(), None)
+
+
+def test_some_named_edits_move_the_mark():
+    client = RecentChangesClient([change(9), change(8, name="a")])
+    assert read(client, 5) == ({"a"}, 9)
+
+
+def test_mark_is_kept_if_any_page_has_only_unnamed_edits():
+    client = RecentChangesClient(
+        [change(9, name="a"), change(8, name="b")],
+        [change(7), change(6, "list")],
+    )
+    assert read(client, 5) == ({"a", "b"}, 5)
@@ -0,0 +1,118 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from scripts.snapshot import iter_json_array, iter_records
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def write(tmp_path, content: str | bytes, name="snapshot.json"):
+    path = tmp_path / name
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    path.write_bytes(content)
+    return path
+
+
+def parse(path, chunk_size=7):
+    return list(iter_json_array(path, chunk_size=chunk_size))
+
+
+def test_elements_split_across_chunks(tmp_path):
+    records = [
+        {"name": f"tool-{i}", "keywords": ["a", "b"], "nested": {"x": [i, None]}}
+        for i in range(20)
+    ]
+    path = write(tmp_path, json.dumps(records, indent=2))
+    assert parse(path) == records
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7])
+def test_numbers_cut_at_chunk_end(tmp_path, chunk_size):
+    path = write(tmp_path, "[12345, 2.5, -0.125, 1e10, 678]")
+    assert parse(path, chunk_size) == [12345, 2.5, -0.125, 1e10, 678]
+
+
+def test_number_as_last_element(tmp_path):
+    path = write(tmp_path, "[1, 23456789]")
+    assert parse(path) == [1, 23456789]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 5, 7])
+def test_multibyte_utf8_split_across_chunks(tmp_path, chunk_size):
+    values = ["Ünïcödé", "日本語のツール", "emoji 🛠️🧰", "Ελληνικά"]
+    path = write(tmp_path, json.dumps(values, ensure_ascii=False))
+    assert parse(path, chunk_size) == values
+
+
+@pytest.mark.parametrize("content", ["[]", "  [ \n ]  ", "\n[\n]\n"])
+def test_empty_array(tmp_path, content):
+    assert parse(write(tmp_path, content)) == []
+
+
+def test_whitespace_around_elements(tmp_path):
+    path = write(tmp_path, '\n  [ \n {"a": 1} \n ,\n\t"b" ,  3\n]\n')
+    assert parse(path) == [{"a": 1}, "b", 3]
+
+
+def test_trailing_garbage_after_element(tmp_path):
+    path = write(tmp_path, '[{"a": 1} {"b": 2}]')
+    with pytest.raises(ValueError, match="expected ',' or ']'"):
+        parse(path)
+
+
+def test_truncated_array(tmp_path):
+    path = write(tmp_path, '[{"a": 1}, {"b": 2}')
+    with pytest.raises(ValueError, match="unexpected end of JSON array"):
+        parse(path)
+
+
+def test_truncated_element(tmp_path):
+    path = write(tmp_path, '[{"a": 1}, {"b": ')
+    with pytest.raises(ValueError):
+        parse(path)
+
+
+def test_not_an_array(tmp_path):
+    with pytest.raises(ValueError, match="expected a JSON array"):
+        parse(write(tmp_path, '{"a": 1}'))
+
+
+def test_elements_are_yielded_lazily(tmp_path):
+    path = write(tmp_path, '[1, 2, {"broken": ]')
+    elements = iter_json_array(path, chunk_size=7)
+    assert next(elements) == 1
+    assert next(elements) == 2
+    with pytest.raises(ValueError):
+        next(elements)
+
+
+def test_records_from_json_array(tmp_path):
+    path = write(tmp_path, '  [{"name": "a"}, {"name": "b"}]')
+    assert list(iter_records(path)) == [{"name": "a"}, {"name": "b"}]
+
+
+def test_records_from_ndjson(tmp_path):
+    path = write(tmp_path, '{"name": "a"}\n\n{"name": "b"}\n', "snapshot.ndjson")
+    assert list(iter_records(path)) == [{"name": "a"}, {"name": "b"}]
+
+
+def test_ndjson_error_names_the_line(tmp_path):
+    path = write(tmp_path, '{"name": "a"}\n{"name": \n', "snapshot.ndjson")
+    with pytest.raises(ValueError, match=r"snapshot\.ndjson:2:"):
+        list(iter_records(path))
+
+
+@pytest.mark.parametrize("content", ["", "  \n\t\n"])
+def test_records_from_blank_file(tmp_path, content):
+    assert list(iter_records(write(tmp_path, content))) == []
+
+
+@pytest.mark.parametrize("name", ["tool_data.json", "completed_task_data.json"])
+def test_fixtures_match_json_load(name):
+    path = FIXTURES / name
+    expected = json.loads(path.read_text(encoding="utf-8"))
+    assert parse(path, chunk_size=64) == expected
+    assert list(iter_records(path)) == expected
@@ -0,0 +1,217 @@
+import asyncio
+
+from tortoise import Tortoise
+
+from backend.instrumentation import instrument_tortoise
+from backend.models.pydantic import ToolhubSubmission
+from backend.models.tortoise import OutboxStatus, Task, Tool, ToolhubOutbox
+from backend.outbox import enqueue_submission
+from backend.sync import (
+    SyncReport,
+    ToolhuntTool,
+    list_pages,
+    reconcile_tools,
+    run_sync,
+)
+
+
+def raw_tool(name, missing=(), **fields):
+    """A Toolhub tool record with every annotation but `missing` filled in."""
+    return {
+        "name": name,
+        "title": fields.get("title", name.title()),
+        "description": fields.get("description", f"{name} description"),
+        "url": f"https://example.org/{name}",
+        "deprecated": fields.get("deprecated", False),
+        "experimental": False,
+        "annotations": {
+            "deprecated": False,
+            "experimental": False,
+            **{field_name: None for field_name in missing},
+        },
+    }
+
+
+def with_database(scenario):
+    async def run():
+        await Tortoise.init(
+            db_url="sqlite://:memory:",
+            modules={"models": ["backend.models.tortoise"]},
+        )
+        await Tortoise.generate_schemas()
+        instrument_tortoise()
+        try:
+            return await scenario()
+        finally:
+            await Tortoise.close_connections()
+
+    return asyncio.run(run())
+
+
+async def submit(tool_name, field_name, status=OutboxStatus.PENDING):
+    """Queue a submission to the outbox and move it to `status`."""
+    toolhub_data = ToolhubSubmission(comment=f"Updated {field_name} field")
+    setattr(toolhub_data, field_name, "x")
+    await enqueue_submission(tool_name, toolhub_data, "1")
+    entry = await ToolhubOutbox.filter(tool_name=tool_name).order_by("-id").first()
+    entry.status = status
+    await entry.save()
+
+
+async def stored_tasks():
+    return set(await Task.all().values_list("tool_id", "field"))
+
+
+def test_resync_skips_fields_with_pending_submissions():
+    async def scenario():
+        await submit("a", "icon", OutboxStatus.DONE)
+        await submit("b", "icon", OutboxStatus.DEAD)
+        await submit("a", "wikidata_qid")
+        report = await reconcile_tools(
+            ["a", "b"],
+            [
+                raw_tool("a", missing={"wikidata_qid", "icon"}),
+                raw_tool("b", missing={"icon"}),
+            ],
+        )
+        return report.tasks.inserted, await stored_tasks()
+
+    inserted, tasks = with_database(scenario)
+    assert tasks == {("a", "icon"), ("b", "icon")}
+    assert inserted == 2
+
+
+def test_pending_submissions_keep_existing_tasks():
+    async def scenario():
+        await reconcile_tools(["a"], [raw_tool("a", missing={"wikidata_qid"})])
+        await submit("a", "wikidata_qid")
+        await reconcile_tools(["a"], [raw_tool("a", missing={"wikidata_qid"})])
+        return await stored_tasks()
+
+    assert with_database(scenario) == {("a", "wikidata_qid")}
+
+
+def toolhunt_tool(**fields):
+    values = {
+        "name": "a",
+        "title": "A",
+        "description": "d",
+        "url": "u",
+        "missing_annotations": {"icon", "wikidata_qid"},
+        "deprecated": False,
+        "experimental": False,
+        **fields,
+    }
+    return ToolhuntTool(**values)
+
+
+def test_fingerprint_covers_what_a_sync_writes():
+    tool = toolhunt_tool()
+    assert tool.fingerprint == toolhunt_tool().fingerprint
+    assert (
+        tool.fingerprint
+        == toolhunt_tool(missing_annotations={"wikidata_qid", "icon"}).fingerprint
+    )
+    for changed in [
+        {"title": "B"},
+        {"description": "e"},
+        {"url": "v"},
+        {"missing_annotations": {"icon"}},
+    ]:
+        assert toolhunt_tool(**changed).fingerprint != tool.fingerprint
+
+
+def sync(tools, dry_run=False):
+    return run_sync(list_pages(tools), SyncReport(dry_run=dry_run))
+
+
+async def stored_tools():
+    return dict(await Tool.all().values_list("name", "title"))
+
+
+TOOLS = [
+    raw_tool("a", missing={"icon", "wikidata_qid"}),
+    raw_tool("b", missing={"tool_type"}),
+]
+
+
+def test_first_sync_inserts_tools_and_tasks():
+    async def scenario():
+        report = await sync(TOOLS)
+        return report, await stored_tools(), await stored_tasks()
+
+    report, tools, tasks = with_database(scenario)
+    assert (report.tools.inserted, report.tasks.inserted) == (2, 3)
+    assert report.phases["tools"].statements > 0
+    assert tools == {"a": "A", "b": "B"}
+    assert tasks == {("a", "icon"), ("a", "wikidata_qid"), ("b", "tool_type")}
+
+
+def test_resync_without_changes_writes_nothing():
+    async def scenario():
+        await sync(TOOLS)
+        updated_before = await Tool.all().values_list("name", "last_updated")
+        report = await sync(TOOLS)
+        updated_after = await Tool.all().values_list("name", "last_updated")
+        return report, updated_before == updated_after
+
+    report, unchanged = with_database(scenario)
+    assert str(report.tools) == "0 inserted, 0 updated, 0 deleted, 2 unchanged"
+    assert str(report.tasks) == "0 inserted, 0 updated, 0 deleted, 3 unchanged"
+    for phase in ("tools", "tasks", "delete"):
+        assert report.phases[phase].statements == 0
+    assert unchanged
+
+
+def test_changed_tool_is_updated():
+    async def scenario():
+        await sync(TOOLS)
+        report = await sync(
+            [raw_tool("a", missing={"icon"}, title="Renamed"), TOOLS[1]]
+        )
+        return report, await stored_tools(), await stored_tasks()
+
+    report, tools, tasks = with_database(scenario)
+    assert (report.tools.updated, report.tools.unchanged) == (1, 1)
+    assert (report.tasks.deleted, report.tasks.unchanged) == (1, 2)
+    assert tools == {"a": "Renamed", "b": "B"}
+    assert tasks == {("a", "icon"), ("b", "tool_type")}
+
+
+def test_dropped_tool_is_deleted_with_its_tasks():
+    async def scenario():
+        await sync(TOOLS)
+        report = await sync(TOOLS[1:])
+        return report, await stored_tools(), await stored_tasks()
+
+    report, tools, tasks = with_database(scenario)
+    assert (report.tools.deleted, report.tasks.deleted) == (1, 2)
+    assert tools == {"b": "B"}
+    assert tasks == {("b", "tool_type")}
+
+
+def test_completed_tool_is_deleted():
+    async def scenario():
+        await sync(TOOLS)
+        report = await sync([raw_tool("a"), TOOLS[1]])
+        return report, await stored_tools()
+
+    report, tools = with_database(scenario)
+    assert report.tools.deleted == 1
+    assert tools == {"b": "B"}
+
+
+def test_dry_run_writes_nothing():
+    async def scenario():
+        await sync(TOOLS)
+        before = await stored_tools(), await stored_tasks()
+        report = await sync(
+            [raw_tool("a", missing={"icon"}, title="Renamed"), raw_tool("c", {"icon"})],
+            dry_run=True,
+        )
+        return report, before, (await stored_tools(), await stored_tasks())
+
+    report, before, after = with_database(scenario)
+    assert str(report.tools) == "1 inserted, 1 updated, 1 deleted, 0 unchanged"
+    assert str(report.tasks) == "1 inserted, 0 updated, 2 deleted, 1 unchanged"
+    assert after == before
@@ -0,0 +1,88 @@
+import asyncio
+
+from backend.models.pydantic import TaskSubmission, ToolhubSubmission
+from backend.utils import merge_toolhub_submissions, prepare_toolhub_submission
+
+
+def prepared(field, value) -> ToolhubSubmission:
+    submission = TaskSubmission(
+        tool_name="tool",
+        tool_title="Tool",
+        completed_date="2024-01-01T00:00:00Z",
+        field=field,
+        value=value,
+    )
+    toolhub_data = asyncio.run(prepare_toolhub_submission(submission))
+    # As stored in and read back from the outbox.
+    return ToolhubSubmission(**toolhub_data.model_dump(exclude_unset=True))
+
+
+def test_prepare_sets_only_the_submitted_field():
+    toolhub_data = prepared("wikidata_qid", "Q42")
+    assert toolhub_data.model_dump(exclude_unset=True) == {
+        "comment": "Updated wikidata_qid field using Toolhunt",
+        "wikidata_qid": "Q42",
+    }
+
+
+def test_prepare_formats_url_lists():
+    toolhub_data = prepared(
+        "user_docs_url",
+        [{"language": "en", "url": "https://example.org", "extra": True}],
+    )
+    assert toolhub_data.user_docs_url == [
+        {"language": "en", "url": "https://example.org"}
+    ]
+
+
+def test_prepare_ignores_unknown_fields():
+    toolhub_data = prepared("not_a_field", "x")
+    assert toolhub_data.model_fields_set == {"comment"}
+
+
+def test_merge_single_submission_is_unchanged():
+    toolhub_data = prepared("audiences", ["admin"])
+    assert merge_toolhub_submissions([toolhub_data]) is toolhub_data
+
+
+def test_merge_combines_fields():
+    merged = merge_toolhub_submissions(
+        [
+            prepared("wikidata_qid", "Q42"),
+            prepared("audiences", ["admin"]),
+            prepared("deprecated", True),
+        ]
+    )
+    assert merged.model_dump(exclude_unset=True) == {
+        "wikidata_qid": "Q42",
+        "audiences": ["admin"],
+        "deprecated": True,
+        "comment": "Updated wikidata_qid, audiences, deprecated fields using Toolhunt",
+    }
+
+
+def test_merge_later_submission_wins():
+    merged = merge_toolhub_submissions(
+        [
+            prepared("wikidata_qid", "Q1"),
+            prepared("audiences", ["admin"]),
+            prepared("wikidata_qid", "Q2"),
+        ]
+    )
+    assert merged.wikidata_qid == "Q2"
+    assert merged.comment == "Updated wikidata_qid, audiences fields using Toolhunt"
+
+
+def test_merge_repeated_field_keeps_singular_comment():
+    merged = merge_toolhub_submissions(
+        [prepared("deprecated", True), prepared("deprecated", False)]
+    )
+    assert merged.deprecated is False
+    assert merged.comment == "Updated deprecated field using Toolhunt"
+
+
+def test_merge_keeps_explicit_nulls():
+    merged = merge_toolhub_submissions(
+        [prepared("wikidata_qid", "Q42"), prepared("wikidata_qid", None)]
+    )
+    assert merged.model_dump(exclude_unset=True)["wikidata_qid"] is None
@@ -0,0 +1,130 @@
+from pathlib import Path
+
+import pytest
+
+from backend.api.schema import parse_and_compile
+from backend.validation import SchemaCompiler, SchemaValidationError
+
+SCHEMA_PATH = Path(__file__).parent / "fixtures" / "toolhub_schema.yaml"
+
+
+@pytest.fixture(scope="module")
+def validators():
+    _, validators = parse_and_compile(SCHEMA_PATH.read_text(encoding="utf-8"))
+    return validators
+
+
+def compile_node(node, schemas=None):
+    return SchemaCompiler(schemas or {}).compile(node)
+
+
+@pytest.mark.parametrize(
+    "field, value",
+    [
+        ("wikidata_qid", "Q42"),
+        ("wikidata_qid", None),
+        ("audiences", ["admin", "reader"]),
+        ("audiences", []),
+        ("deprecated", False),
+        ("for_wikis", ["*", "en.wikipedia.org"]),
+        ("tool_type", None),
+        ("tool_type", ""),
+        ("user_docs_url", [{"language": "en", "url": "https://example.org"}]),
+        ("replaced_by", "https://example.org/tool"),
+    ],
+)
+def test_valid_values(validators, field, value):
+    validators[field](value)
+
+
+@pytest.mark.parametrize(
+    "field, value, message",
+    [
+        ("wikidata_qid", "42", "wikidata_qid: '42' does not match"),
+        ("wikidata_qid", "Q" + "1" * 40, "wikidata_qid: longer than 32 characters"),
+        ("audiences", "admin", "audiences: expected array, got str"),
+        ("audiences", ["admin", "nobody"], "audiences[1]: 'nobody' is not one of"),
+        ("deprecated", "true", "deprecated: expected boolean, got str"),
+        ("replaced_by", "not a url", "replaced_by: 'not a url' is not a valid URI"),
+        ("for_wikis", ["example.com"], "for_wikis[0]: 'example.com' does not match"),
+        ("tool_type", "robot", "tool_type: does not match any allowed schema"),
+        ("user_docs_url", [{"language": "en"}], "user_docs_url[0].url: is required"),
+    ],
+)
+def test_invalid_values(validators, field, value, message):
+    with pytest.raises(SchemaValidationError) as excinfo:
+        validators[field](value)
+    assert str(excinfo.value).startswith(message)
+
+
+def test_booleans_are_not_numbers():
+    validate = compile_node({"type": "integer"})
+    validate(3)
+    with pytest.raises(SchemaValidationError, match="expected integer, got bool"):
+        validate(True)
+
+
+def test_nullable():
+    validate = compile_node({"type": "string", "nullable": True, "maxLength": 2})
+    validate(None)
+    with pytest.raises(SchemaValidationError):
+        compile_node({"type": "string"})(None)
+
+
+def test_enum_with_unhashable_values():
+    validate = compile_node({"enum": [[1, 2], "a"]})
+    validate([1, 2])
+    validate("a")
+    with pytest.raises(SchemaValidationError, match="is not one of"):
+        validate({"b": 1})
+
+
+def test_additional_properties_closed():
+    validate = compile_node(
+        {"type": "object", "properties": {"a": {}}, "additionalProperties": False}
+    )
+    validate({"a": 1})
+    with pytest.raises(SchemaValidationError, match=r"unexpected properties \['b'\]"):
+        validate({"a": 1, "b": 2})
+
+
+def test_read_only_properties_are_not_required():
+    validate = compile_node(
+        {
+            "type": "object",
+            "properties": {"id": {"type": "integer", "readOnly": True}},
+            "required": ["id"],
+        }
+    )
+    validate({})
+
+
+def test_all_of():
+    validate = compile_node(
+        {"allOf": [{"type": "string"}, {"type": "string", "minLength": 2}]}
+    )
+    validate("ab")
+    with pytest.raises(SchemaValidationError, match="shorter than 2 characters"):
+        validate("a")
+
+
+def test_cyclic_references_terminate():
+    schemas = {
+        "Node": {
+            "type": "object",
+            "properties": {
+                "name": {"type": "string"},
+                "children": {"type": "array", "items": {"$ref": "#/schemas/Node"}},
+            },
+        }
+    }
+    validate = compile_node({"$ref": "#/schemas/Node"}, schemas)
+    validate({"name": "root", "children": [{"name": "leaf", "children": []}]})
+    with pytest.raises(SchemaValidationError) as excinfo:
+        validate({"name": "root", "children": [{"name": 1}]})
+    assert excinfo.value.path == "children[0].name"
+
+
+def test_unknown_keywords_are_ignored():
+    validate = compile_node({"x-custom": True, "format": "email"})
+    validate(object())